@@ -0,0 +1,46 @@
+"""split_merged_pos_search_index
+
+The merged PO searches match different fields: the lists and the export
+po_id / item_description (plus project names), remaining-to-accept po_no /
+site_code / item_description. MATCH needs a FULLTEXT index over exactly its
+column list, so ft_merged_pos_search is rebuilt for the first set and
+ft_merged_pos_remaining_search added for the second. Stopwords disabled as in
+d1f3a9c5e7b2.
+
+Revision ID: a5d7f9b1c3e6
+Revises: f3b5c1e7a9d4
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5d7f9b1c3e6'
+down_revision: Union[str, Sequence[str], None] = 'f3b5c1e7a9d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _fulltext(name: str, columns) -> None:
+    op.create_index(name, 'merged_pos', columns, unique=False, mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'mysql':
+        op.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+    op.drop_index('ft_merged_pos_search', table_name='merged_pos')
+    _fulltext('ft_merged_pos_search', ['po_id', 'item_description'])
+    _fulltext('ft_merged_pos_remaining_search', ['po_no', 'site_code', 'item_description'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'mysql':
+        op.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+    op.drop_index('ft_merged_pos_remaining_search', table_name='merged_pos')
+    op.drop_index('ft_merged_pos_search', table_name='merged_pos')
+    _fulltext('ft_merged_pos_search', ['po_id', 'site_code', 'item_description'])
@@ -0,0 +1,51 @@
+"""add_import_content_hashes
+
+File SHA-256 + duplicate link on upload_history, per-line row_hash on the raw
+import tables, so identical re-uploads and unchanged lines are skipped.
+
+Revision ID: a7c1e9d2b3f4
+Revises: f1a2b3c4d5e6
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c1e9d2b3f4'
+down_revision: Union[str, Sequence[str], None] = 'f1a2b3c4d5e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('upload_history', sa.Column('file_sha256', sa.String(length=64), nullable=True))
+    op.add_column('upload_history', sa.Column('duplicate_of_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_upload_history_file_sha256'), 'upload_history', ['file_sha256'], unique=False)
+    op.create_foreign_key(
+        'fk_upload_history_duplicate_of_id', 'upload_history', 'upload_history',
+        ['duplicate_of_id'], ['id'],
+    )
+
+    op.add_column('raw_purchase_orders', sa.Column('row_hash', sa.String(length=32), nullable=True))
+    op.create_index(op.f('ix_raw_purchase_orders_row_hash'), 'raw_purchase_orders', ['row_hash'], unique=False)
+
+    op.add_column('raw_acceptances', sa.Column('row_hash', sa.String(length=32), nullable=True))
+    op.create_index(op.f('ix_raw_acceptances_row_hash'), 'raw_acceptances', ['row_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_raw_acceptances_row_hash'), table_name='raw_acceptances')
+    op.drop_column('raw_acceptances', 'row_hash')
+
+    op.drop_index(op.f('ix_raw_purchase_orders_row_hash'), table_name='raw_purchase_orders')
+    op.drop_column('raw_purchase_orders', 'row_hash')
+
+    op.drop_constraint('fk_upload_history_duplicate_of_id', 'upload_history', type_='foreignkey')
+    op.drop_index(op.f('ix_upload_history_file_sha256'), table_name='upload_history')
+    op.drop_column('upload_history', 'duplicate_of_id')
+    op.drop_column('upload_history', 'file_sha256')
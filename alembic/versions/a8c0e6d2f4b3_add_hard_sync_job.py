@@ -0,0 +1,41 @@
+"""add_hard_sync_job
+
+HARD_SYNC_ACCEPTANCES job type and per-job progress for maintenance jobs.
+
+Revision ID: a8c0e6d2f4b3
+Revises: f6b8d4c0e3a2
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c0e6d2f4b3'
+down_revision: Union[str, Sequence[str], None] = 'f6b8d4c0e3a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column(
+        'import_jobs', 'job_type',
+        existing_type=sa.Enum('PO_IMPORT', 'ACCEPTANCE_IMPORT', name='jobtype'),
+        type_=sa.Enum('PO_IMPORT', 'ACCEPTANCE_IMPORT', 'HARD_SYNC_ACCEPTANCES', name='jobtype'),
+        existing_nullable=False,
+    )
+    op.add_column('import_jobs', sa.Column('progress', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('import_jobs', 'progress')
+    op.alter_column(
+        'import_jobs', 'job_type',
+        existing_type=sa.Enum('PO_IMPORT', 'ACCEPTANCE_IMPORT', 'HARD_SYNC_ACCEPTANCES', name='jobtype'),
+        type_=sa.Enum('PO_IMPORT', 'ACCEPTANCE_IMPORT', name='jobtype'),
+        existing_nullable=False,
+    )
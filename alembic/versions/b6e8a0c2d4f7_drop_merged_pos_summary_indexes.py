@@ -0,0 +1,39 @@
+"""drop_merged_pos_summary_indexes
+
+The summaries now read financial_rollup, so the covering indexes added for
+them in c0e2a8f4b6d5 are no longer used by any query and only slow down the
+acceptance bulk updates and merge upserts. The pending-approval lookups (PM
+review, auto-approval) keep a narrow (assignment_status, assignment_date)
+index.
+
+Revision ID: b6e8a0c2d4f7
+Revises: a5d7f9b1c3e6
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e8a0c2d4f7'
+down_revision: Union[str, Sequence[str], None] = 'a5d7f9b1c3e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_merged_pos_status_assigned', 'merged_pos', ['assignment_status', 'assignment_date'], unique=False)
+    op.drop_index('ix_merged_pos_project_status_amounts', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_status_amounts', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_control_amount', table_name='merged_pos')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_merged_pos_control_amount', 'merged_pos', ['internal_control', 'line_amount_hw'], unique=False)
+    op.create_index('ix_merged_pos_status_amounts', 'merged_pos', ['assignment_status', 'line_amount_hw', 'accepted_ac_amount', 'accepted_pac_amount'], unique=False)
+    op.create_index('ix_merged_pos_project_status_amounts', 'merged_pos', ['internal_project_id', 'assignment_status', 'line_amount_hw', 'accepted_ac_amount', 'accepted_pac_amount'], unique=False)
+    op.drop_index('ix_merged_pos_status_assigned', table_name='merged_pos')
@@ -0,0 +1,39 @@
+"""add_db_maintenance_job
+
+DB_MAINTENANCE job type (set-based heal of merged_pos, app/services/maintenance.py).
+
+Revision ID: b9d1f7e3a5c4
+Revises: a8c0e6d2f4b3
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d1f7e3a5c4'
+down_revision: Union[str, Sequence[str], None] = 'a8c0e6d2f4b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column(
+        'import_jobs', 'job_type',
+        existing_type=sa.Enum('PO_IMPORT', 'ACCEPTANCE_IMPORT', 'HARD_SYNC_ACCEPTANCES', name='jobtype'),
+        type_=sa.Enum('PO_IMPORT', 'ACCEPTANCE_IMPORT', 'HARD_SYNC_ACCEPTANCES', 'DB_MAINTENANCE', name='jobtype'),
+        existing_nullable=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column(
+        'import_jobs', 'job_type',
+        existing_type=sa.Enum('PO_IMPORT', 'ACCEPTANCE_IMPORT', 'HARD_SYNC_ACCEPTANCES', 'DB_MAINTENANCE', name='jobtype'),
+        type_=sa.Enum('PO_IMPORT', 'ACCEPTANCE_IMPORT', 'HARD_SYNC_ACCEPTANCES', name='jobtype'),
+        existing_nullable=False,
+    )
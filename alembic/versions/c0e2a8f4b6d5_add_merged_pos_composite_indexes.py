@@ -0,0 +1,50 @@
+"""add_merged_pos_composite_indexes
+
+Composite / covering indexes for the merged_pos dashboard and list queries.
+Guarded by test_merged_po_indexes.py (EXPLAIN, no full scans).
+
+Revision ID: c0e2a8f4b6d5
+Revises: b9d1f7e3a5c4
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c0e2a8f4b6d5'
+down_revision: Union[str, Sequence[str], None] = 'b9d1f7e3a5c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_merged_pos_project_status_amounts', 'merged_pos', ['internal_project_id', 'assignment_status', 'line_amount_hw', 'accepted_ac_amount', 'accepted_pac_amount'], unique=False)
+    op.create_index('ix_merged_pos_status_amounts', 'merged_pos', ['assignment_status', 'line_amount_hw', 'accepted_ac_amount', 'accepted_pac_amount'], unique=False)
+    op.create_index('ix_merged_pos_project_publish', 'merged_pos', ['internal_project_id', 'internal_control', 'publish_date'], unique=False)
+    op.create_index('ix_merged_pos_project_ac', 'merged_pos', ['internal_project_id', 'internal_control', 'date_ac_ok'], unique=False)
+    op.create_index('ix_merged_pos_project_pac', 'merged_pos', ['internal_project_id', 'internal_control', 'date_pac_ok'], unique=False)
+    op.create_index('ix_merged_pos_publish_date', 'merged_pos', ['publish_date'], unique=False)
+    op.create_index('ix_merged_pos_date_ac_ok', 'merged_pos', ['date_ac_ok', 'internal_control'], unique=False)
+    op.create_index('ix_merged_pos_date_pac_ok', 'merged_pos', ['date_pac_ok', 'internal_control'], unique=False)
+    op.create_index('ix_merged_pos_category', 'merged_pos', ['category'], unique=False)
+    op.create_index('ix_merged_pos_site_code_project', 'merged_pos', ['site_code', 'internal_project_id'], unique=False)
+    op.create_index('ix_merged_pos_control_amount', 'merged_pos', ['internal_control', 'line_amount_hw'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_merged_pos_control_amount', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_site_code_project', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_category', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_date_pac_ok', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_date_ac_ok', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_publish_date', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_project_pac', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_project_ac', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_project_publish', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_status_amounts', table_name='merged_pos')
+    op.drop_index('ix_merged_pos_project_status_amounts', table_name='merged_pos')
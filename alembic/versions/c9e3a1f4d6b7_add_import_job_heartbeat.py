@@ -0,0 +1,29 @@
+"""add_import_job_heartbeat
+
+Heartbeat timestamp for lease-based ownership of import jobs.
+
+Revision ID: c9e3a1f4d6b7
+Revises: b8d2f0e3c4a5
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e3a1f4d6b7'
+down_revision: Union[str, Sequence[str], None] = 'b8d2f0e3c4a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('import_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('import_jobs', 'heartbeat_at')
@@ -0,0 +1,45 @@
+"""add_search_fulltext_indexes
+
+FULLTEXT (ngram parser) indexes for the search boxes (services/text_search.py).
+Built with stopwords disabled: with the ngram parser a stopword such as "a"
+would otherwise drop every token containing it. The first FULLTEXT index on a
+table rebuilds it (hidden FTS_DOC_ID column).
+
+Revision ID: d1f3a9c5e7b2
+Revises: c0e2a8f4b6d5
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1f3a9c5e7b2'
+down_revision: Union[str, Sequence[str], None] = 'c0e2a8f4b6d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FULLTEXT_INDEXES = [
+    ('ft_merged_pos_search', 'merged_pos', ['po_id', 'site_code', 'item_description']),
+    ('ft_internal_projects_name', 'internal_projects', ['name']),
+    ('ft_customer_projects_name', 'customer_projects', ['name']),
+    ('ft_sbcs_names', 'sbcs', ['short_name', 'name']),
+    ('ft_bon_de_commandes_number', 'bon_de_commandes', ['bc_number']),
+    ('ft_transactions_description', 'transactions', ['description']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'mysql':
+        op.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+    for name, table, columns in FULLTEXT_INDEXES:
+        op.create_index(name, table, columns, unique=False, mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(FULLTEXT_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,29 @@
+"""add_upload_history_progress
+
+Live progress and per-phase timings of an import, stored as JSON on upload_history.
+
+Revision ID: d4f6b2a8c1e9
+Revises: c9e3a1f4d6b7
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f6b2a8c1e9'
+down_revision: Union[str, Sequence[str], None] = 'c9e3a1f4d6b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('upload_history', sa.Column('progress', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('upload_history', 'progress')
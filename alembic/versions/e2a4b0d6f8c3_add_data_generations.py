@@ -0,0 +1,37 @@
+"""add_data_generations
+
+Change counters per table (services/data_generation.py); merged_pos is tracked
+for the cached list totals.
+
+Revision ID: e2a4b0d6f8c3
+Revises: d1f3a9c5e7b2
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a4b0d6f8c3'
+down_revision: Union[str, Sequence[str], None] = 'd1f3a9c5e7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    data_generations = op.create_table(
+        'data_generations',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('generation', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(data_generations, [{'name': 'merged_pos', 'generation': 0}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('data_generations')
@@ -0,0 +1,34 @@
+"""add_raw_acceptance_shipment_index
+
+Composite index for fetching the latest acceptance per (po_no, po_line_no, shipment_no).
+
+Revision ID: e5a7c3b9d2f1
+Revises: d4f6b2a8c1e9
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c3b9d2f1'
+down_revision: Union[str, Sequence[str], None] = 'd4f6b2a8c1e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_raw_acceptances_shipment_latest',
+        'raw_acceptances',
+        ['po_no', 'po_line_no', 'shipment_no', 'application_processed_date', 'id'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_raw_acceptances_shipment_latest', table_name='raw_acceptances')
@@ -0,0 +1,64 @@
+"""add_financial_rollup
+
+Pre-aggregated merged_pos measures for the summary dashboards
+(services/financial_rollup.py) and their dirty-partition markers. A full-rebuild
+marker is seeded, so the first refresh backfills the rollup.
+
+Revision ID: f3b5c1e7a9d4
+Revises: e2a4b0d6f8c3
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b5c1e7a9d4'
+down_revision: Union[str, Sequence[str], None] = 'e2a4b0d6f8c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'financial_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('internal_project_id', sa.Integer(), nullable=True),
+        sa.Column('customer_project_id', sa.Integer(), nullable=True),
+        sa.Column('category', sa.String(length=100), nullable=True),
+        sa.Column('assignment_status', sa.Enum('APPROVED', 'PENDING_APPROVAL', 'REJECTED', name='assignmentstatus'), nullable=True),
+        sa.Column('internal_control', sa.Integer(), nullable=True),
+        sa.Column('stage', sa.String(length=20), nullable=True),
+        sa.Column('period_year', sa.Integer(), nullable=True),
+        sa.Column('period_month', sa.Integer(), nullable=True),
+        sa.Column('po_value', sa.Float(), nullable=True),
+        sa.Column('ac_value', sa.Float(), nullable=True),
+        sa.Column('pac_value', sa.Float(), nullable=True),
+        sa.Column('open_lines', sa.Integer(), nullable=True),
+        sa.Column('open_remaining', sa.Float(), nullable=True),
+        sa.Column('positive_gap', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_financial_rollup_project', 'financial_rollup', ['internal_project_id'], unique=False)
+    op.create_index('ix_financial_rollup_customer_project', 'financial_rollup', ['customer_project_id'], unique=False)
+
+    financial_rollup_dirty = op.create_table(
+        'financial_rollup_dirty',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('internal_project_id', sa.Integer(), nullable=True),
+        sa.Column('full_rebuild', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(financial_rollup_dirty, [{'internal_project_id': None, 'full_rebuild': True}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('financial_rollup_dirty')
+    op.drop_index('ix_financial_rollup_customer_project', table_name='financial_rollup')
+    op.drop_index('ix_financial_rollup_project', table_name='financial_rollup')
+    op.drop_table('financial_rollup')
@@ -0,0 +1,59 @@
+"""add_acceptance_latest
+
+Latest acceptance per (po_no, po_line_no, shipment_no), maintained on ingestion.
+Back-filled from raw_acceptances.
+
+Revision ID: f6b8d4c0e3a2
+Revises: e5a7c3b9d2f1
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b8d4c0e3a2'
+down_revision: Union[str, Sequence[str], None] = 'e5a7c3b9d2f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'acceptance_latest',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('po_no', sa.String(length=100), nullable=False),
+        sa.Column('po_line_no', sa.Integer(), nullable=False),
+        sa.Column('shipment_no', sa.Integer(), nullable=False),
+        sa.Column('acceptance_qty', sa.Float(), nullable=True),
+        sa.Column('application_processed_date', sa.DateTime(), nullable=True),
+        sa.Column('raw_acceptance_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['raw_acceptance_id'], ['raw_acceptances.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('po_no', 'po_line_no', 'shipment_no', name='uix_acceptance_latest_shipment'),
+    )
+    op.create_index(op.f('ix_acceptance_latest_id'), 'acceptance_latest', ['id'], unique=False)
+
+    op.execute("""
+        INSERT INTO acceptance_latest
+            (po_no, po_line_no, shipment_no, acceptance_qty, application_processed_date, raw_acceptance_id)
+        SELECT po_no, po_line_no, shipment_no, acceptance_qty, application_processed_date, id
+        FROM (
+            SELECT ra.*, ROW_NUMBER() OVER (
+                PARTITION BY po_no, po_line_no, shipment_no
+                ORDER BY application_processed_date IS NULL DESC, application_processed_date DESC, id DESC
+            ) AS rn
+            FROM raw_acceptances ra
+            WHERE po_no IS NOT NULL AND po_line_no IS NOT NULL AND shipment_no IS NOT NULL
+        ) ranked
+        WHERE rn = 1
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_acceptance_latest_id'), table_name='acceptance_latest')
+    op.drop_table('acceptance_latest')
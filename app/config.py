@@ -14,6 +14,20 @@ class Settings(BaseSettings):
     huawei_app_key: str = ""
     huawei_env: str = "test"  # "test" or "prod"
 
+    # Import job queue (python -m app.worker)
+    import_worker_concurrency: int = 2        # worker processes claiming jobs in parallel
+    import_worker_poll_seconds: float = 2.0   # idle wait between claim attempts
+    import_job_lease_seconds: int = 120       # a RUNNING job without heartbeat for this long is claimed again
+    import_job_heartbeat_seconds: int = 30    # lease renewal interval while a job runs
+    import_job_max_attempts: int = 3
+    import_upload_grace_seconds: int = 300    # time for a new upload to get its job before recovery fails it
+
+    # Dashboard response cache (app/services/response_cache.py)
+    response_cache_backend: str = "memory"    # "memory" (per process) or "redis" (shared by all workers)
+    response_cache_redis_url: str = ""        # redis://host:6379/0 when the backend is "redis"
+    response_cache_max_entries: int = 512     # in-process LRU size
+    response_cache_ttl_seconds: int = 3600    # upper bound on an entry's age, whatever the data generation
+
     # This tells pydantic to load the variables from a .env file
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -4,13 +4,14 @@ from select import select
 from fastapi import BackgroundTasks
 from pytz import timezone
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from . import auth
 from . import models, schemas
 import pandas as pd
 from sqlalchemy.orm import joinedload,Query
 import sqlalchemy as sa
 from sqlalchemy import func, case, extract, and_,distinct,union_all
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.sql.functions import coalesce # More explicit import
 from sqlalchemy.orm import aliased,contains_eager
 from .enum import ProjectType, UserRole, SBCStatus, BCStatus, NotificationType, BCType,AssignmentStatus, ValidationState, ItemGlobalStatus, SBCType,TransactionType,TransactionStatus,NotificationModule
@@ -31,6 +32,14 @@ from fastapi import UploadFile, File, Form,HTTPException
 from fastapi.responses import FileResponse
 from .utils.email import send_bc_status_email, send_email_background, LOGOS,send_notification_email_detailled
 from .utils.whatsapp import send_whatsapp_notification
+from .utils.excel_stream import estimate_excel_rows, iter_excel_chunks
+from .utils.content_hash import canonical_value, row_fingerprints
+from .utils.category_classifier import deduce_category, deduce_categories
+from .utils.period_filters import period_filter
+from .services.site_assignment import SiteAssignmentEngine
+from .services.import_progress import ImportProgress
+from .services import data_generation, financial_rollup, maintenance, pagination, text_search
+from .services.acceptance_amounts import AMOUNT_COLUMNS as ACCEPTANCE_AMOUNT_COLUMNS, compute_acceptance_updates
 import json
 from collections import defaultdict
 
@@ -40,6 +49,23 @@ logger = logging.getLogger(__name__)
 
 UPLOAD_DIR = "uploads/sbc_docs"
 
+# Rows per insert/commit when streaming a PO export into raw_purchase_orders
+PO_IMPORT_CHUNK_SIZE = 5000
+# Merged lines per INSERT ... ON DUPLICATE KEY UPDATE in process_and_merge_pos
+MERGE_CHUNK_SIZE = 2000
+# Keys per IN (...) lookup / INSERT IGNORE in bulk_hydrate
+HYDRATE_CHUNK_SIZE = 2000
+
+# Business columns fingerprinted into row_hash (after the Excel -> DB renames)
+RAW_PO_FINGERPRINT_COLUMNS = [
+    'po_no', 'po_line_no', 'po_status', 'project_code', 'site_code', 'customer',
+    'item_description', 'payment_terms_raw', 'unit_price', 'requested_qty',
+    'line_amount', 'publish_date',
+]
+RAW_ACCEPTANCE_FINGERPRINT_COLUMNS = [
+    'po_no', 'po_line_no', 'shipment_no', 'acceptance_qty', 'application_processed_date',
+]
+
 PAYMENT_TERM_MAP = {
     "【TT】▍AC1 (80.00%, INV AC -15D, Complete 80%) / AC2 (20.00%, INV AC -15D, Complete 100%) ▍": "AC1 80 | PAC 20",
     "AC1 (80%, Invoice AC -15D, Complete 80%) / AC2 (20%, Invoice AC -15D, Complete 100%) ▍": "AC1 80 | PAC 20",
@@ -365,6 +391,122 @@ def get_or_create(db: Session, model, **kwargs):
         db.flush() # Use flush to get the ID without committing
         return instance, True # Returns instance and "was created" flag
 
+def bulk_hydrate(db: Session, model, key: str, values: Iterable[Any], create_missing: bool = True) -> Dict[Any, int]:
+    """
+    Set-based get_or_create for lookup tables keyed by a unique column
+    (Customer.name, Site.site_code, CustomerProject.name, ...).
+    - One chunked IN (...) query fetches the rows that already exist
+    - The missing keys go in with one multi-row INSERT IGNORE per chunk, so a
+      concurrent import creating the same key is not an error
+    Returns {incoming value: id}. With create_missing=False it is a pure lookup.
+    """
+    column = getattr(model, key)
+    wanted = list({v for v in values if v is not None and not (isinstance(v, str) and not v.strip())})
+    if not wanted:
+        return {}
+
+    def fetch(keys):
+        found = {}
+        for start in range(0, len(keys), HYDRATE_CHUNK_SIZE):
+            chunk = keys[start:start + HYDRATE_CHUNK_SIZE]
+            found.update(db.query(column, model.id).filter(column.in_(chunk)).all())
+        return found
+
+    found = fetch(wanted)
+    missing = [v for v in wanted if v not in found]
+    if missing and create_missing:
+        insert_ignore = mysql_insert(model.__table__).prefix_with("IGNORE")
+        for start in range(0, len(missing), HYDRATE_CHUNK_SIZE):
+            db.execute(insert_ignore, [{key: v} for v in missing[start:start + HYDRATE_CHUNK_SIZE]])
+        db.commit()
+        found.update(fetch(missing))
+
+    # MySQL compares case-insensitively (and Excel hands us 1234 for site code "1234"),
+    # so an existing "ABC" satisfies an incoming "abc"
+    if len(found) < len(wanted):
+        folded = {k.lower(): v for k, v in found.items() if isinstance(k, str)}
+        for v in wanted:
+            if v not in found and str(v).lower() in folded:
+                found[v] = folded[str(v).lower()]
+    return {v: found[v] for v in wanted if v in found}
+
+
+def _raw_key(key) -> tuple:
+    # Keys compared as text: Excel may hand us 10.0 for line 10 or a numeric PO No.
+    return tuple(canonical_value(v) for v in key)
+
+
+def latest_raw_rows(db: Session, model, df: pd.DataFrame, key_columns: List[str]) -> Dict[tuple, Tuple[str, int]]:
+    """
+    (row_hash, id) of the LATEST stored raw row for the business keys of `df` whose
+    content may be unchanged (some stored row carries one of df's hashes).
+    Keyed by the canonical business key.
+    """
+    if df.empty:
+        return {}
+
+    hashes = list(df['row_hash'].unique())
+    keys = [getattr(model, c) for c in key_columns]
+    candidate_keys = set()
+    for start in range(0, len(hashes), HYDRATE_CHUNK_SIZE):
+        candidate_keys.update(
+            tuple(row) for row in db.query(*keys).filter(
+                model.row_hash.in_(hashes[start:start + HYDRATE_CHUNK_SIZE])
+            ).distinct()
+        )
+    if not candidate_keys:
+        return {}
+
+    # Latest raw row per candidate key (po_no is indexed on both raw tables)
+    latest_rows = {}
+    po_nos = list({k[0] for k in candidate_keys})
+    for start in range(0, len(po_nos), HYDRATE_CHUNK_SIZE):
+        latest = sa.select(*keys, func.max(model.id).label("latest_id")).where(
+            model.po_no.in_(po_nos[start:start + HYDRATE_CHUNK_SIZE])
+        ).group_by(*keys).subquery()
+        rows = db.execute(
+            sa.select(*[latest.c[c] for c in key_columns], model.row_hash, model.id)
+            .join(model, model.id == latest.c.latest_id)
+        )
+        for *key, row_hash, row_id in rows:
+            if tuple(key) in candidate_keys:
+                latest_rows[_raw_key(key)] = (row_hash, row_id)
+    return latest_rows
+
+
+def unchanged_raw_ids(df: pd.DataFrame, key_columns: List[str], latest_rows: Dict[tuple, Tuple[str, int]]) -> List[int]:
+    """Ids of the stored rows that the lines of `df` repeat unchanged."""
+    ids = []
+    for key, row_hash in zip(df[key_columns].itertuples(index=False, name=None), df['row_hash']):
+        stored = latest_rows.get(_raw_key(key))
+        if stored and stored[0] == row_hash:
+            ids.append(stored[1])
+    return ids
+
+
+def drop_unchanged_raw_rows(
+    db: Session, model, df: pd.DataFrame, key_columns: List[str],
+    latest_rows: Optional[Dict[tuple, Tuple[str, int]]] = None,
+) -> pd.DataFrame:
+    """
+    Removes the lines of `df` (which must carry a row_hash column) whose content is
+    identical to the LATEST stored raw row for the same business key.
+    Comparing against the latest row only keeps A -> B -> A corrections: the second A
+    differs from B, so it is staged again.
+    `latest_rows` reuses a latest_raw_rows lookup already made for `df`.
+    """
+    if df.empty:
+        return df
+    if latest_rows is None:
+        latest_rows = latest_raw_rows(db, model, df, key_columns)
+
+    changed = [
+        latest_rows.get(_raw_key(key), (None,))[0] != row_hash
+        for key, row_hash in zip(df[key_columns].itertuples(index=False, name=None), df['row_hash'])
+    ]
+    return df[changed].copy()
+
+
 def create_raw_purchase_orders_from_dataframe(db: Session, df: pd.DataFrame, user_id: int):
     # Standardize column names from the Excel file
     df.rename(columns={
@@ -390,14 +532,20 @@ def create_raw_purchase_orders_from_dataframe(db: Session, df: pd.DataFrame, use
         df.loc[mask, 'publish_date'] = df.loc[mask, 'publish_date'] - pd.Timedelta(days=1)
 
     df['uploader_id'] = user_id
-    
+
+    # Lines identical to what is already staged never reach the merge step
+    df['row_hash'] = row_fingerprints(df, RAW_PO_FINGERPRINT_COLUMNS)
+    if 'po_no' in df.columns and 'po_line_no' in df.columns:
+        df = drop_unchanged_raw_rows(db, models.RawPurchaseOrder, df, ['po_no', 'po_line_no'])
+    if df.empty:
+        return 0
+
     # Hydrate Customers and Sites ONLY
-    customer_map = {name: get_or_create(db, models.Customer, name=name)[0] for name in df['customer'].dropna().unique()} if 'customer' in df.columns else {}
-    site_map = {code: get_or_create(db, models.Site, site_code=code)[0] for code in df['site_code'].dropna().unique()} if 'site_code' in df.columns else {}
-    db.commit()
+    customer_map = bulk_hydrate(db, models.Customer, "name", df['customer'].dropna().unique()) if 'customer' in df.columns else {}
+    site_map = bulk_hydrate(db, models.Site, "site_code", df['site_code'].dropna().unique()) if 'site_code' in df.columns else {}
 
-    df['customer_id'] = df['customer'].map({c.name: c.id for c in customer_map.values()}) if customer_map else None
-    df['site_id'] = df['site_code'].map({s.site_code: s.id for s in site_map.values()}) if site_map else None
+    df['customer_id'] = df['customer'].map(customer_map) if customer_map else None
+    df['site_id'] = df['site_code'].map(site_map) if site_map else None
     
     model_columns =[c.key for c in models.RawPurchaseOrder.__table__.columns if c.key != 'id']
     df_to_insert = df[[col for col in model_columns if col in df.columns]]
@@ -437,259 +585,219 @@ def resolve_internal_project(
     site_code: str, 
     publish_date: datetime, 
     customer_project_id: int,
-    tbd_project_id: int
+    tbd_project_id: int,
+    engine: Optional[SiteAssignmentEngine] = None,
 ):
     """
     Advanced Matching Logic:
     1. Manual Override (Global Site Allocation)
-    2. Rules (Ordered by Priority DESC) -> First full match wins
+    2. Rules (Highest id first) -> First full match wins
     3. Default (TBD)
-    """
-    
-    # 1. Manual Override (Highest Priority)
-    if site_id:
-        allocation = db.query(models.SiteProjectAllocation).filter(
-            models.SiteProjectAllocation.site_id == site_id
-        ).first()
-        if allocation:
-            return allocation.internal_project_id
-
-    if not site_code:
-        return tbd_project_id
 
-    # 2. Fetch Rules ordered by Priority (Highest first)
-    # Optimization: In a huge system, cache this list in Redis or memory
-    rules = db.query(models.SiteAssignmentRule).order_by(
-        models.SiteAssignmentRule.id.desc()
-    ).all()
-
-    # 3. Iterate and Check Conditions
-    for rule in rules:
-        # A. String Checks
-        if rule.starts_with and not site_code.startswith(rule.starts_with):
-            continue # Fail
-        if rule.ends_with and not site_code.endswith(rule.ends_with):
-            continue # Fail
-        if rule.contains_str and rule.contains_str not in site_code:
-            continue # Fail
-            
-        # B. Context Checks
-        if rule.customer_project_id and rule.customer_project_id != customer_project_id:
-            continue # Fail
-            
-        # C. Date Checks (Comparing Date vs DateTime, strictly need .date())
-        p_date = publish_date.date() if isinstance(publish_date, datetime) else publish_date
-        
-        if rule.min_publish_date and p_date and p_date < rule.min_publish_date:
-            continue
-        if rule.max_publish_date and p_date and p_date > rule.max_publish_date:
-            continue
-
-        # If we survived all checks, this is the winner!
-        return rule.internal_project_id
-
-    # 4. No rule matched -> TBD
-    return tbd_project_id
+    Pass a prebuilt `engine` when resolving many POs; without one, the allocations
+    and rules are loaded for this single call.
+    """
+    if engine is None:
+        engine = SiteAssignmentEngine.from_db(db, tbd_project_id)
+    return engine.resolve(site_id, site_code, publish_date, customer_project_id)
 def apply_rule_retrospective(db: Session, rule: models.SiteAssignmentRule):
     """
     Re-evaluates TBD items against the SPECIFIC new rule.
+    Runs as chunked UPDATE statements (services/maintenance.apply_site_rule).
     """
     tbd_project = db.query(models.InternalProject).filter_by(name="To Be Determined").first()
     if not tbd_project: return 0
 
-    # 1. Get candidate POs (Only TBD ones to save performance)
-    candidates = db.query(models.MergedPO).filter(
-        models.MergedPO.internal_project_id == tbd_project.id
-    ).all()
+    return maintenance.apply_site_rule(db, rule, tbd_project.id)
 
-    updates = []
-    
-    # 2. Python-side Check
-    for po in candidates:
-        # Check String patterns
-        if rule.starts_with and not (po.site_code and po.site_code.startswith(rule.starts_with)): continue
-        if rule.ends_with and not (po.site_code and po.site_code.endswith(rule.ends_with)): continue
-        if rule.contains_str and not (po.site_code and rule.contains_str in po.site_code): continue
-        
-        # Check Context
-        if rule.customer_project_id and po.customer_project_id != rule.customer_project_id: continue
-        
-        # Check Dates
-        p_date = po.publish_date.date() if po.publish_date else None
-        if rule.min_publish_date and (not p_date or p_date < rule.min_publish_date): continue
-        if rule.max_publish_date and (not p_date or p_date > rule.max_publish_date): continue
-        
-        # Match Found!
-        updates.append(po.id)
-
-    # 3. Bulk Update
-    if updates:
-        db.query(models.MergedPO).filter(models.MergedPO.id.in_(updates)).update(
-            {models.MergedPO.internal_project_id: rule.internal_project_id},
-            synchronize_session=False
-        )
-        db.commit()
-    
-    return len(updates)
 
+def _merged_po_upsert_statement(tbd_project_id: int):
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE (keyed on merged_pos.po_id) carrying the
+    same rules the old per-object merge applied in Python.
 
-def process_and_merge_pos(db: Session):
-    # 1. Ensure "To Be Determined" Project exists
-    tbd_project = db.query(models.InternalProject).filter_by(name="To Be Determined").first()
-    if not tbd_project:
-        # Assuming you updated InternalProject to handle Enum or string for project_type
-        tbd_project = models.InternalProject(name="To Be Determined", project_type=ProjectType.TBD) 
-        db.add(tbd_project)
-        db.commit()
-    tbd_project_id = tbd_project.id
+    MySQL evaluates the UPDATE assignments left to right and later ones see the
+    values written by earlier ones, so the AC/PAC caps are listed BEFORE unit_price
+    and requested_qty and spell out the post-update values themselves.
+    """
+    stmt = mysql_insert(models.MergedPO.__table__)
+    new = stmt.inserted
+    current = models.MergedPO.__table__.c
 
-    # 2. Fetch Unprocessed Data
-    unprocessed_pos = db.query(models.RawPurchaseOrder).filter(
-        models.RawPurchaseOrder.is_processed == False
-    ).options(joinedload(models.RawPurchaseOrder.site)).all()
-    
-    if not unprocessed_pos:
-        return 0
+    # A zero quantity from Huawei keeps the stored unit price (the line is cancelled, not repriced)
+    qty_zeroed = new.requested_qty == 0
+    effective_unit_price = case((qty_zeroed, current.unit_price), else_=new.unit_price)
+    cap_applies = and_(effective_unit_price != 0, new.requested_qty.isnot(None))
 
-    # 3. Hydrate Customer Projects (Just creating labels now)
-    customer_project_names = {po.project_code for po in unprocessed_pos if po.project_code}
-    existing_cust_projs = {p.name: p for p in db.query(models.CustomerProject).filter(models.CustomerProject.name.in_(customer_project_names)).all()}
-    
-    for name in customer_project_names:
-        if name not in existing_cust_projs:
-            # Note: No internal_project_id passed here anymore
-            new_cust_proj = models.CustomerProject(name=name)
-            db.add(new_cust_proj)
-    
-    db.commit()
-    all_cust_projs_map = {p.name: p for p in db.query(models.CustomerProject).filter(models.CustomerProject.name.in_(customer_project_names)).all()}
-
-    # 4. De-duplicate logic (Same as before)
-    unique_pos_map = {}
-    for po in unprocessed_pos:
-        key = (po.po_no, po.po_line_no)
-        if key not in unique_pos_map or po.publish_date > unique_pos_map[key].publish_date:
-            unique_pos_map[key] = po
-    clean_pos_list = list(unique_pos_map.values())
-
-    # 5. Process Merge
-    po_ids_to_check = [f"{po.po_no}-{po.po_line_no}" for po in clean_pos_list]
-    existing_merged_map = {mp.po_id: mp for mp in db.query(models.MergedPO).filter(models.MergedPO.po_id.in_(po_ids_to_check)).all()}
-
-    for po in clean_pos_list:
-        po_id = f"{po.po_no}-{po.po_line_no}"
-        customer_project = all_cust_projs_map.get(po.project_code)
-        if not customer_project: continue
-
-        final_internal_project_id = resolve_internal_project(
-            db, 
-            site_id=po.site_id, 
-            site_code=po.site.site_code if po.site else None,
-            # NEW ARGUMENTS PASSED HERE:
-            publish_date=po.publish_date,
-            customer_project_id=customer_project.id,
-            tbd_project_id=tbd_project_id
+    def capped(accepted_col, share):
+        max_amount = effective_unit_price * new.requested_qty * share
+        return case(
+            (and_(cap_applies, accepted_col != 0, accepted_col > max_amount), max_amount),
+            else_=accepted_col,
         )
 
+    # Keep the current assignment unless the PO is still unassigned / TBD
+    keeps_assignment = and_(
+        current.internal_project_id.isnot(None),
+        current.internal_project_id != tbd_project_id,
+    )
+    category_is_open = or_(
+        current.category.is_(None),
+        current.category == "",
+        current.category == "TBD",
+    )
 
-        if po_id in existing_merged_map:
-            # UPDATE
-            merged_po = existing_merged_map[po_id]
-
-            if po.requested_qty == 0:
-                merged_po.requested_qty = 0
-                merged_po.line_amount_hw = 0
-            else:
-                merged_po.requested_qty = po.requested_qty
-                merged_po.unit_price = po.unit_price
-                merged_po.line_amount_hw = (po.unit_price or 0) * (po.requested_qty or 0)
-            
-            # =======================================================
-            # 🚨 NEW REFINEMENT: DYNAMIC CAPPING
-            # If Huawei reduced the requested_qty, we must cap the existing 
-            # acceptances instantly to prevent dashboard inflation.
-            # =======================================================
-            if merged_po.unit_price and merged_po.requested_qty is not None:
-                max_ac_amount = merged_po.unit_price * merged_po.requested_qty * 0.80
-                max_pac_amount = merged_po.unit_price * merged_po.requested_qty * 0.20
-
-                if merged_po.accepted_ac_amount and merged_po.accepted_ac_amount > max_ac_amount:
-                    merged_po.accepted_ac_amount = max_ac_amount
-                
-                if merged_po.accepted_pac_amount and merged_po.accepted_pac_amount > max_pac_amount:
-                    merged_po.accepted_pac_amount = max_pac_amount
-            # =======================================================
-
-            merged_po.publish_date = po.publish_date
-            merged_po.site_id = po.site_id
-            merged_po.site_code = po.site.site_code if po.site else None
-            
-            # --- ASSIGNMENT PRESERVATION LOGIC (THE FIX) ---
-            current_is_tbd = (merged_po.internal_project_id is None) or \
-                             (merged_po.internal_project_id == tbd_project_id)
-            
-            if current_is_tbd:
-                merged_po.internal_project_id = final_internal_project_id
-            
-            if not merged_po.category or merged_po.category == "TBD":
-                merged_po.category = deduce_category(po.item_description)
-
-
-
-        else:
-            
-            # INSERT (New PO)
-            # We deduce the category RIGHT HERE at birth
-            deduced_cat = deduce_category(po.item_description)
-            
-            # For new POs, we always apply the resolved project (Rule or TBD)
-            new_merged_po = models.MergedPO(
-                po_id=po_id,
-                raw_po_id=po.id,
-                customer_project_id=customer_project.id,
-                internal_project_id=final_internal_project_id, 
-                site_id=po.site_id,
-                site_code=po.site.site_code if po.site else None,
-                po_no=po.po_no,
-                po_line_no=po.po_line_no,
-                item_description=po.item_description,
-                payment_term=PAYMENT_TERM_MAP.get(po.payment_terms_raw, "UNKNOWN"),
-                unit_price=po.unit_price,
-                requested_qty=po.requested_qty,
-                line_amount_hw=(po.unit_price or 0) * (po.requested_qty or 0),
-                publish_date=po.publish_date,
-                category=deduced_cat if deduced_cat else "TBD"
-
-            )
-            db.add(new_merged_po)
+    return stmt.on_duplicate_key_update([
+        ("accepted_ac_amount", capped(current.accepted_ac_amount, 0.80)),
+        ("accepted_pac_amount", capped(current.accepted_pac_amount, 0.20)),
+        ("unit_price", effective_unit_price),
+        ("requested_qty", new.requested_qty),
+        ("line_amount_hw", new.line_amount_hw),
+        ("publish_date", new.publish_date),
+        ("site_id", new.site_id),
+        ("site_code", new.site_code),
+        ("internal_project_id", case((keeps_assignment, current.internal_project_id), else_=new.internal_project_id)),
+        ("category", case((category_is_open, new.category), else_=current.category)),
+    ])
+
+
+def process_and_merge_pos(db: Session, progress: Optional[ImportProgress] = None):
+    progress = progress or ImportProgress(None)
+    with progress.phase("prepare_merge"):
+        # 1. Ensure "To Be Determined" Project exists
+        tbd_project = db.query(models.InternalProject).filter_by(name="To Be Determined").first()
+        if not tbd_project:
+            # Assuming you updated InternalProject to handle Enum or string for project_type
+            tbd_project = models.InternalProject(name="To Be Determined", project_type=ProjectType.TBD) 
+            db.add(tbd_project)
+            db.commit()
+        tbd_project_id = tbd_project.id
+
+        # 2. Snapshot the unprocessed batch (rows landing after this point wait for the next run)
+        raw = models.RawPurchaseOrder
+        max_raw_id = db.query(func.max(raw.id)).filter(raw.is_processed == False).scalar()
+        if max_raw_id is None:
+            return 0
+        in_batch = and_(raw.is_processed == False, raw.id <= max_raw_id)
+
+        # 3. Hydrate Customer Projects (Just creating labels now)
+        customer_project_names = {
+            name for (name,) in db.query(distinct(raw.project_code)).filter(in_batch, raw.project_code.isnot(None))
+        }
+        cust_proj_ids = bulk_hydrate(db, models.CustomerProject, "name", customer_project_names)
+
+        # 4. Stage the de-duplicated lines: latest publish_date per (po_no, po_line_no),
+        #    lowest id on ties. Only the ids are held in memory.
+        ranked = sa.select(
+            raw.id,
+            func.row_number().over(
+                partition_by=(raw.po_no, raw.po_line_no),
+                order_by=(raw.publish_date.desc(), raw.id.asc()),
+            ).label("rn"),
+        ).where(in_batch).subquery()
+        staged_ids = [row.id for row in db.execute(
+            sa.select(ranked.c.id).where(ranked.c.rn == 1).order_by(ranked.c.id)
+        )]
+
+    with progress.phase("merge", total=len(staged_ids)):
+        # 5. Set-based merge, one upsert per chunk
+        upsert = _merged_po_upsert_statement(tbd_project_id)
+        assignment_engine = SiteAssignmentEngine.from_db(db, tbd_project_id)
+        for start in range(0, len(staged_ids), MERGE_CHUNK_SIZE):
+            chunk_ids = staged_ids[start:start + MERGE_CHUNK_SIZE]
+            rows = db.query(
+                raw.id, raw.po_no, raw.po_line_no, raw.project_code, raw.site_id,
+                models.Site.site_code, raw.publish_date, raw.unit_price, raw.requested_qty,
+                raw.item_description, raw.payment_terms_raw,
+            ).outerjoin(models.Site, raw.site_id == models.Site.id).filter(raw.id.in_(chunk_ids)).all()
+
+            chunk_categories = deduce_categories([po.item_description for po in rows])
+
+            records = []
+            for po, category in zip(rows, chunk_categories):
+                customer_project_id = cust_proj_ids.get(po.project_code)
+                if not customer_project_id:
+                    continue
+
+                final_internal_project_id = resolve_internal_project(
+                    db,
+                    site_id=po.site_id,
+                    site_code=po.site_code,
+                    publish_date=po.publish_date,
+                    customer_project_id=customer_project_id,
+                    tbd_project_id=tbd_project_id,
+                    engine=assignment_engine,
+                )
+                # deduce_categories never returns an empty value ("TBD" is its catch-all)
+                records.append({
+                    "po_id": f"{po.po_no}-{po.po_line_no}",
+                    "raw_po_id": po.id,
+                    "customer_project_id": customer_project_id,
+                    "internal_project_id": final_internal_project_id,
+                    "site_id": po.site_id,
+                    "site_code": po.site_code,
+                    "po_no": po.po_no,
+                    "po_line_no": po.po_line_no,
+                    "item_description": po.item_description,
+                    "payment_term": PAYMENT_TERM_MAP.get(po.payment_terms_raw, "UNKNOWN"),
+                    "unit_price": po.unit_price,
+                    "requested_qty": po.requested_qty,
+                    "line_amount_hw": (po.unit_price or 0) * (po.requested_qty or 0),
+                    "publish_date": po.publish_date,
+                    "category": category,
+                })
 
+            if records:
+                # The upsert moves lines between their current project and the resolved one
+                chunk_po_ids = [r["po_id"] for r in records]
+                touched_projects = {r["internal_project_id"] for r in records}
+                touched_projects |= financial_rollup.projects_of(db, models.MergedPO.po_id.in_(chunk_po_ids))
+                with financial_rollup.scope(db, touched_projects):
+                    db.execute(upsert, records)
+                # Category rules are authoritative; apply them to the lines this chunk wrote
+                apply_category_rules(db, po_ids=chunk_po_ids, progress=progress)
+            db.commit()
+            progress.advance(len(chunk_ids))
 
     # 6. Cleanup
-    unprocessed_ids = [po.id for po in unprocessed_pos]
-    if unprocessed_ids:
-        db.query(models.RawPurchaseOrder).filter(models.RawPurchaseOrder.id.in_(unprocessed_ids)).update({"is_processed": True})
-    
+    db.query(raw).filter(in_batch).update({"is_processed": True}, synchronize_session=False)
     db.commit()
-    return len(clean_pos_list)
+    return len(staged_ids)
     
 def process_po_file_background(file_path: str, history_id: int, user_id: int, chained_ac_info: dict = None):
     """
     Enhanced PO Background task that can trigger an AC task upon success.
+    Progress and per-phase timings are recorded on the history record as it runs.
+    Runs as a queued job: errors propagate so the queue retries it, and the queue
+    fails the histories and deletes the files once the job is settled.
     """
     db = SessionLocal()
+    progress = ImportProgress(history_id)
     try:
-        df = pd.read_excel(file_path)
-        # 1. Process POs
-        new_record_ids = create_raw_purchase_orders_from_dataframe(db, df, user_id)
-        processed_count = process_and_merge_pos(db)
-        apply_category_rules(db)  # Re-apply all rules after every import
-        
-        # 2. Update PO History to SUCCESS
         history = db.query(models.UploadHistory).get(history_id)
-        if history:
-            history.status = "SUCCESS"
-            history.total_rows = processed_count
-            db.commit()
+        if history and history.status == "SUCCESS":
+            # A previous attempt merged the POs and failed in the chained acceptance import
+            logger.info(f"PO import {history_id}: already merged, resuming at the chained acceptance import.")
+            processed_count = history.total_rows
+        else:
+            # 1. Stream the workbook into raw_purchase_orders, one commit per chunk,
+            #    so memory stays flat no matter how many lines Huawei exported.
+            inserted_rows = 0
+            with progress.phase("stage_raw", total=estimate_excel_rows(file_path)):
+                for chunk_df in iter_excel_chunks(file_path, PO_IMPORT_CHUNK_SIZE):
+                    inserted_rows += create_raw_purchase_orders_from_dataframe(db, chunk_df, user_id)
+                    progress.advance(len(chunk_df))
+            logger.info(f"PO import {history_id}: staged {inserted_rows} raw lines.")
+
+            processed_count = process_and_merge_pos(db, progress=progress)  # also applies category rules to the merged lines
+
+            # 2. Update PO History to SUCCESS
+            history = db.query(models.UploadHistory).get(history_id)
+            if history:
+                history.status = "SUCCESS"
+                history.total_rows = processed_count
+                db.commit()
+            progress.finish()
 
         # 3. CHAINED LOGIC: Trigger Acceptance processing if AC file was also uploaded
         if chained_ac_info:
@@ -718,39 +826,23 @@ def process_po_file_background(file_path: str, history_id: int, user_id: int, ch
             )
             db.commit()
 
-    except Exception as e:
-        logger.error(f"PO Background Task Failed: {e}", exc_info=True)
-        db.rollback()
-        
-        # 1. Update PO History to FAILED
-        history = db.query(models.UploadHistory).get(history_id)
-        if history:
-            history.status = "FAILED"
-            history.error_message = str(e)[:500]
-            db.commit()
-        
-        # 2. ALSO mark the chained AC as FAILED if it exists
-        if chained_ac_info:
-            ac_hist = db.query(models.UploadHistory).get(chained_ac_info["history_id"])
-            if ac_hist:
-                ac_hist.status = "FAILED"
-                ac_hist.error_message = "Cancelled because the prerequisite PO import failed."
-                db.commit()
-            
     finally:
         db.close()
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
 def process_acceptance_file_background(file_path: str, history_id: int, user_id: int):
     """
     Background task: Reads file, filters for 'Approved' status, 
     saves raw data, triggers processing, updates history.
+    Progress and per-phase timings are recorded on the history record as it runs.
+    Runs as a queued job (directly or chained behind a PO import): errors propagate
+    so the queue retries it; the queue fails the history and deletes the file.
     """
     db = SessionLocal()
+    progress = ImportProgress(history_id)
     try:
         # 1. Read the Excel File
-        acceptance_df = pd.read_excel(file_path)
+        with progress.phase("read_file"):
+            acceptance_df = pd.read_excel(file_path)
         
         # Standardize Headers (Excel -> DB Column Names)
         # Added 'Status' mapping
@@ -806,10 +898,12 @@ def process_acceptance_file_background(file_path: str, history_id: int, user_id:
             raise ValueError("No valid 'Approved' rows found in the file.")
 
         # 3. Save Raw Data and GET THE IDs
-        new_record_ids = create_raw_acceptances_from_dataframe(db, acceptance_df, user_id)
+        with progress.phase("stage_raw", total=len(acceptance_df)):
+            new_record_ids = create_raw_acceptances_from_dataframe(db, acceptance_df, user_id)
+            progress.advance(len(acceptance_df))
 
         # 4. Process Only These Specific Records
-        updated_count = process_acceptances_by_ids(db, new_record_ids)
+        updated_count = process_acceptances_by_ids(db, new_record_ids, progress=progress)
 
         # 5. Success: Update History & Notify
         history_record = db.query(models.UploadHistory).get(history_id)
@@ -823,6 +917,7 @@ def process_acceptance_file_background(file_path: str, history_id: int, user_id:
                     f"Skipped {status_skipped} non-approved rows and {duplicate_skipped} duplicates."
                 )
             db.commit()
+        progress.finish()
 
         create_notification(
             db, 
@@ -837,49 +932,23 @@ def process_acceptance_file_background(file_path: str, history_id: int, user_id:
         )
         db.commit()
 
-    except Exception as e:
-        # 5. Error Handling
-        logger.error(f"Background Task Failed: {e}", exc_info=True)
-        db.rollback()
-        history = db.query(models.UploadHistory).get(history_id)
-        if history:
-            history.status = "FAILED"
-            history.error_message = str(e)[:500] 
-            db.commit()
-            
     finally:
-        # 6. Cleanup
         db.close()
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
 def get_all_po_data(db: Session):
     """
     Retourne les MergedPO avec le nom du projet interne dans le champ project_name
     pour que le frontend puisse l'utiliser directement.
-    """
-    rows = (
-        db.query(models.MergedPO)
-        .options(
-            joinedload(models.MergedPO.internal_project)  # charge la relation
-        )
-        .all()
+    Projection SQL directe : ni objets ORM ni copie de __dict__.
+    """
+    # project_name est aussi une colonne de merged_pos : le nom du projet interne la remplace
+    columns = [c for c in models.MergedPO.__table__.columns if c.name != "project_name"]
+    query = (
+        sa.select(*columns, models.InternalProject.name.label("project_name"))
+        .select_from(models.MergedPO)
+        .outerjoin(models.InternalProject, models.MergedPO.internal_project_id == models.InternalProject.id)
     )
-
-    result = []
-    for po in rows:
-        d = po.__dict__.copy()
-        # On enlève l’état SQLAlchemy qui casse la serialisation JSON
-        d.pop("_sa_instance_state", None)
-
-        # 👉 ICI : on injecte le nom du projet
-        d["project_name"] = (
-            po.internal_project.name if po.internal_project else None
-        )
-
-        result.append(d)
-
-    return result
+    return [dict(row) for row in db.execute(query).mappings()]
 
 
 def create_po_data_from_dataframe(db: Session, df: pd.DataFrame, user_id: int):
@@ -891,10 +960,26 @@ def create_po_data_from_dataframe(db: Session, df: pd.DataFrame, user_id: int):
 
 def create_raw_acceptances_from_dataframe(db: Session, df: pd.DataFrame, user_id: int) -> List[int]:
     """
-    Saves DataFrame to RawAcceptance table and returns the list of new IDs.
+    Saves DataFrame to RawAcceptance table and returns the list of new IDs,
+    plus the still-unprocessed rows the file repeats unchanged.
     """
     df['uploader_id'] = user_id
-    
+
+    # Shipments identical to the latest staged version are not stored again
+    df['row_hash'] = row_fingerprints(df, RAW_ACCEPTANCE_FINGERPRINT_COLUMNS)
+    key_columns = ['po_no', 'po_line_no', 'shipment_no']
+    latest_rows = latest_raw_rows(db, models.RawAcceptance, df, key_columns)
+    # Lines already staged unchanged by an attempt that never applied them (job retried
+    # after a crash) are not stored again, but still have to reach merged_pos
+    unchanged_ids = unchanged_raw_ids(df, key_columns, latest_rows)
+    pending_ids = []
+    for start in range(0, len(unchanged_ids), HYDRATE_CHUNK_SIZE):
+        pending_ids += [row_id for (row_id,) in db.query(models.RawAcceptance.id).filter(
+            models.RawAcceptance.id.in_(unchanged_ids[start:start + HYDRATE_CHUNK_SIZE]),
+            models.RawAcceptance.is_processed == False,
+        )]
+    df = drop_unchanged_raw_rows(db, models.RawAcceptance, df, key_columns, latest_rows)
+
     # Filter to ensure we only try to save columns that exist in the model
     valid_columns = [c.key for c in models.RawAcceptance.__table__.columns if c.key != 'id']
     df_final = df[[c for c in df.columns if c in valid_columns]]
@@ -907,9 +992,100 @@ def create_raw_acceptances_from_dataframe(db: Session, df: pd.DataFrame, user_id
     # Add and Commit to generate IDs
     db.add_all(new_instances)
     db.commit()
-    
-    # Return the IDs
-    return [instance.id for instance in new_instances]
+
+    new_ids = [instance.id for instance in new_instances]
+    # Pending rows are folded again too: the interrupted attempt may have died before this commit
+    upsert_acceptance_latest(db, new_ids + pending_ids)
+    db.commit()
+
+    # Return the IDs to process: the new rows and the pending ones
+    return new_ids + pending_ids
+
+
+ACCEPTANCE_LATEST_COLUMNS = [
+    'po_no', 'po_line_no', 'shipment_no', 'acceptance_qty', 'application_processed_date', 'raw_acceptance_id',
+]
+
+
+def _acceptance_is_newer(new_date, new_id, current_date, current_id):
+    """
+    Orders acceptances by (date IS NULL, date, id): newest application date wins,
+    the higher raw id breaks ties, and an undated row counts as the newest
+    (the historical pandas sort put NaT last).
+    """
+    return or_(
+        and_(new_date.is_(None), current_date.isnot(None)),
+        and_(new_date.is_(None), current_date.is_(None), new_id > current_id),
+        and_(
+            new_date.isnot(None), current_date.isnot(None),
+            or_(new_date > current_date, and_(new_date == current_date, new_id > current_id)),
+        ),
+    )
+
+
+def _raw_acceptance_latest_source():
+    raw = models.RawAcceptance
+    return sa.select(
+        raw.po_no, raw.po_line_no, raw.shipment_no, raw.acceptance_qty, raw.application_processed_date, raw.id,
+    ).where(raw.po_no.isnot(None), raw.po_line_no.isnot(None), raw.shipment_no.isnot(None))
+
+
+def upsert_acceptance_latest(db: Session, raw_acceptance_ids: List[int]) -> None:
+    """
+    Folds newly staged RawAcceptance rows into acceptance_latest (one row per
+    shipment), keeping whichever of stored / new is newer. Does not commit.
+
+    MySQL evaluates the UPDATE assignments left to right: raw_acceptance_id is
+    decided first, and the other columns follow it when it was taken over.
+    """
+    table = models.AcceptanceLatest.__table__
+    current = table.c
+    for start in range(0, len(raw_acceptance_ids), MERGE_CHUNK_SIZE):
+        chunk = raw_acceptance_ids[start:start + MERGE_CHUNK_SIZE]
+        stmt = mysql_insert(table).from_select(
+            ACCEPTANCE_LATEST_COLUMNS,
+            _raw_acceptance_latest_source()
+            .where(models.RawAcceptance.id.in_(chunk))
+            .order_by(models.RawAcceptance.id),
+        )
+        new = stmt.inserted
+        newer = _acceptance_is_newer(
+            new.application_processed_date, new.raw_acceptance_id,
+            current.application_processed_date, current.raw_acceptance_id,
+        )
+        taken_over = current.raw_acceptance_id == new.raw_acceptance_id
+        db.execute(stmt.on_duplicate_key_update([
+            ("raw_acceptance_id", case((newer, new.raw_acceptance_id), else_=current.raw_acceptance_id)),
+            ("acceptance_qty", case((taken_over, new.acceptance_qty), else_=current.acceptance_qty)),
+            ("application_processed_date", case(
+                (taken_over, new.application_processed_date), else_=current.application_processed_date
+            )),
+        ]))
+
+
+def rebuild_acceptance_latest(db: Session) -> int:
+    """Recomputes acceptance_latest from the whole raw history. Returns the row count."""
+    raw = models.RawAcceptance
+    ranked = _raw_acceptance_latest_source().add_columns(
+        func.row_number().over(
+            partition_by=(raw.po_no, raw.po_line_no, raw.shipment_no),
+            order_by=(
+                raw.application_processed_date.is_(None).desc(),
+                raw.application_processed_date.desc(),
+                raw.id.desc(),
+            ),
+        ).label("rn"),
+    ).subquery()
+
+    db.query(models.AcceptanceLatest).delete(synchronize_session=False)
+    db.execute(
+        sa.insert(models.AcceptanceLatest.__table__).from_select(
+            ACCEPTANCE_LATEST_COLUMNS,
+            sa.select(*[c for c in ranked.c if c.name != "rn"]).where(ranked.c.rn == 1),
+        )
+    )
+    db.commit()
+    return db.query(func.count(models.AcceptanceLatest.id)).scalar()
 
 
 
@@ -936,6 +1112,36 @@ def create_upload_history_record(
     return history_record
 
 
+def record_upload_file_hash(db: Session, history_id: int, file_sha256: str) -> Optional[models.UploadHistory]:
+    """
+    Stores the uploaded file's SHA-256 on its history record.
+    If the exact same file was already imported (or is being imported), the new
+    record is closed as DUPLICATE with a link to that import, and the earlier
+    record is returned so the caller can skip processing. Returns None otherwise.
+    """
+    history = db.query(models.UploadHistory).get(history_id)
+    history.file_sha256 = file_sha256
+
+    earlier = (
+        db.query(models.UploadHistory)
+        .filter(
+            models.UploadHistory.file_sha256 == file_sha256,
+            models.UploadHistory.id != history_id,
+            models.UploadHistory.status.in_(["SUCCESS", "PROCESSING", "WAITING"]),
+        )
+        .order_by(models.UploadHistory.id)
+        .first()
+    )
+    if earlier:
+        history.status = "DUPLICATE"
+        history.duplicate_of_id = earlier.id
+        history.error_message = (
+            f"Identical to import #{earlier.id} ({earlier.original_filename}); not imported again."
+        )
+    db.commit()
+    return earlier
+
+
 def get_upload_history_paginated(
     db: Session, 
     page: int = 1, 
@@ -1007,10 +1213,8 @@ def get_eligible_pos_for_bc(
         clean_codes = [c.strip() for c in site_codes if c.strip()]
         if clean_codes:
             query = query.filter(models.MergedPO.site_code.in_(clean_codes))
-    if start_date:
-        query = query.filter(func.date(models.MergedPO.publish_date) >= start_date)
-    if end_date:
-        query = query.filter(func.date(models.MergedPO.publish_date) <= end_date)
+    if start_date or end_date:
+        query = query.filter(period_filter(models.MergedPO.publish_date, start_date=start_date, end_date=end_date))
         
     return query.all()
 
@@ -1085,82 +1289,74 @@ def get_merged_po_data_as_dataframe(
 
 import re
 
-def deduce_category(description: str) -> str:
-    """
-    Guaranteed to return a non-null category string.
-    Priority: Transport -> Survey -> Civil Work -> Material -> Service -> TBD
-    """
-    if not description or not isinstance(description, str) or not description.strip():
-        return "TBD"
-
-    desc = description.lower()
-
-    # Standardized Keyword Mapping
-    mapping = {
-        "Transport": [
-            "transport", "distance<", "km<", "vehicle", "tractor", "driver", 
-            "delivery", "logistics", "shipping", "mobilization"
-        ],
-        "Survey": [
-            "survey", "tssr", "tss", "site report", "los ", "level a", "level b"
-        ],
-        "Civil Work": [
-            "civil work", "concrete", "masonry", "painting", "wall opening", 
-            "excavation", "foundation", "steel structure", "fencing", "shelter"
-        ],
-        "Material": [
-            "connector", "jumper", "pvc", "bolt", "screw", "packaging", 
-            "battery", "cabinet", "rack", "antenna", "cable", "feeder"
-        ],
-        "Service": [
-            "install", "swap", "dismantle", "commissioning", "integration", 
-            "reconfiguration", "expansion", "upgrade", "maintenance", 
-            "site engineer", "fsc", "rigger", "technical", "work order",
-            "acceptance", "testing", "alignment", "configuration"
-        ]
-    }
-
-    # 1. Primary Keyword Check
-    for category, keywords in mapping.items():
-        if any(k in desc for k in keywords):
-            # Exception: Material + Install = Service
-            if category == "Material" and "install" in desc:
-                return "Service"
-            return category
-
-    # 2. Equipment-only descriptions usually imply Service
-    equipment_keywords = ["rru", "bbu", "aau", "bts", "msan", "olt", "wdm", "microwave", "mw "]
-    if any(k in desc for k in equipment_keywords):
-        return "Service"
-
-    # 3. Final Catch-all
-    return "TBD"
 # app/crud.py
 
 def bulk_update_po_categories(db: Session, po_ids: List[int], new_category: str):
     """
     Updates the category for a list of MergedPO IDs.
     """
-    updated_count = db.query(models.MergedPO).filter(
-        models.MergedPO.id.in_(po_ids)
-    ).update({"category": new_category}, synchronize_session=False)
+    with financial_rollup.scope(db, financial_rollup.projects_of(db, models.MergedPO.id.in_(po_ids))):
+        updated_count = db.query(models.MergedPO).filter(
+            models.MergedPO.id.in_(po_ids)
+        ).update({"category": new_category}, synchronize_session=False)
 
     db.commit()
     return updated_count
 
 
-def apply_category_rules(db: Session):
+def apply_category_rules(
+    db: Session,
+    descriptions: Optional[List[str]] = None,
+    po_ids: Optional[List[str]] = None,
+    progress: Optional[ImportProgress] = None,
+) -> int:
     """
-    Applies all category rules to merged_pos using a single JOIN UPDATE.
+    Applies category rules to merged_pos using a JOIN UPDATE.
     Overwrites any existing category value — rules are authoritative.
+
+    Scope it to what actually changed:
+    - descriptions: rows whose item_description equals one of these (rule created/edited)
+    - po_ids: these merged rows only (lines written by an import)
+    With neither, every rule is re-applied to the whole table (explicit maintenance only).
+    Returns the number of rows whose category changed.
     """
     from sqlalchemy import text
-    db.execute(text(
+    base_sql = (
         "UPDATE merged_pos mp "
         "JOIN category_rules cr ON mp.item_description = cr.item_description "
-        "SET mp.category = cr.category"
-    ))
-    db.commit()
+        "SET mp.category = cr.category "
+        "WHERE NOT (mp.category <=> cr.category)"
+    )
+
+    progress = progress or ImportProgress(None)
+
+    if descriptions is None and po_ids is None:
+        with progress.phase("category_rules"):
+            # text() statements fire no ORM event: mark the write here
+            financial_rollup.mark_all(db)
+            data_generation.mark(db, data_generation.MERGED_POS)
+            updated = db.execute(text(base_sql)).rowcount
+            db.commit()
+        return updated
+
+    if descriptions is not None:
+        column, values = "mp.item_description", list({d for d in descriptions if d})
+    else:
+        column, values = "mp.po_id", list(po_ids)
+
+    scoped_column = models.MergedPO.item_description if descriptions is not None else models.MergedPO.po_id
+    scoped = text(f"{base_sql} AND {column} IN :values").bindparams(sa.bindparam("values", expanding=True))
+    updated = 0
+    with progress.phase("category_rules", total=len(values)):
+        for start in range(0, len(values), MERGE_CHUNK_SIZE):
+            chunk = values[start:start + MERGE_CHUNK_SIZE]
+            # text() statements fire no ORM event: mark the write here
+            financial_rollup.mark_projects(db, financial_rollup.projects_of(db, scoped_column.in_(chunk)))
+            data_generation.mark(db, data_generation.MERGED_POS)
+            updated += db.execute(scoped, {"values": chunk}).rowcount
+            progress.advance(len(chunk))
+        db.commit()
+    return updated
 
 
 def get_category_rules(db: Session, page: int = 1, per_page: int = 50, search: str = None):
@@ -1189,8 +1385,8 @@ def create_category_rule(db: Session, item_description: str, category: str) -> m
     db.add(rule)
     db.commit()
     db.refresh(rule)
-    # Use the full JOIN UPDATE so matching logic is identical to the import hook
-    apply_category_rules(db)
+    # Same JOIN UPDATE as the import hook, limited to the rows this rule can match
+    apply_category_rules(db, descriptions=[rule.item_description])
     return rule
 
 
@@ -1202,10 +1398,8 @@ def update_category_rule(db: Session, rule_id: int, item_description: str, categ
     rule.item_description = item_description
     rule.category = category
     db.commit()
-    db.refresh(rule)
-    # Use the full JOIN UPDATE so matching logic is identical to the import hook
-    apply_category_rules(db)
-    db.commit()
+    # Same JOIN UPDATE as the import hook, limited to the rows this rule can match
+    apply_category_rules(db, descriptions=[item_description])
     db.refresh(rule)
     return rule
 
@@ -1225,6 +1419,7 @@ def bulk_upsert_category_rules(db: Session, rows: list[dict]) -> dict:
     """
     valid_categories = {"Service", "Transport", "Survey", "Civil Work", "Material"}
     created = updated = skipped = 0
+    touched_descriptions = []
     for row in rows:
         desc = str(row.get("item_description", "")).strip()
         cat = str(row.get("category", "")).strip()
@@ -1238,164 +1433,134 @@ def bulk_upsert_category_rules(db: Session, rows: list[dict]) -> dict:
             if existing.category != cat:
                 existing.category = cat
                 updated += 1
+                touched_descriptions.append(desc)
         else:
             db.add(models.CategoryRule(item_description=desc, category=cat))
             created += 1
+            touched_descriptions.append(desc)
     db.commit()
-    apply_category_rules(db)
+    if touched_descriptions:
+        apply_category_rules(db, descriptions=touched_descriptions)
     return {"created": created, "updated": updated, "skipped": skipped}
 
 
 def run_database_category_cleanup(db: Session):
     """
     Force updates all TBD and NULL categories in the database.
+    The classification runs inside the database (services/maintenance, "tbd_categories").
     """
-    # 1. Query all problematic rows
-    pos_to_fix = db.query(models.MergedPO).filter(
-        or_(
-            models.MergedPO.category == "TBD",
-            models.MergedPO.category.is_(None),
-            models.MergedPO.category == ""
-        )
-    ).all()
+    candidates = maintenance.tbd_category_predicate()
+    total_processed = db.query(func.count(models.MergedPO.id)).filter(candidates).scalar()
+
+    maintenance.run_maintenance(db, ["tbd_categories"])
 
-    stats = {
-        "total_processed": len(pos_to_fix),
-        "fixed": 0,
-        "still_tbd": 0
+    still_tbd = db.query(func.count(models.MergedPO.id)).filter(candidates).scalar()
+    return {
+        "total_processed": total_processed,
+        "fixed": total_processed - still_tbd,
+        "still_tbd": still_tbd
     }
 
-    for po in pos_to_fix:
-        new_cat = deduce_category(po.item_description)
-        po.category = new_cat
-        if new_cat != "TBD":
-            stats["fixed"] += 1
-        else:
-            stats["still_tbd"] += 1
 
-    db.commit()
-    return stats
+def _merged_po_acceptance_frame(db: Session, po_ids: List[str]) -> pd.DataFrame:
+    """MergedPO columns the AC/PAC computation reads and writes, one row per po_id."""
+    columns = ['id', 'po_id', 'unit_price', 'requested_qty', 'payment_term', 'item_description'] + ACCEPTANCE_AMOUNT_COLUMNS
+    rows = []
+    for start in range(0, len(po_ids), MERGE_CHUNK_SIZE):
+        rows.extend(
+            db.query(*[getattr(models.MergedPO, c) for c in columns])
+            .filter(models.MergedPO.po_id.in_(po_ids[start:start + MERGE_CHUNK_SIZE]))
+            .all()
+        )
+    return pd.DataFrame.from_records(rows, columns=columns)
+
 
+def _latest_acceptances(db: Session, line_keys: List[tuple]) -> pd.DataFrame:
+    """
+    Latest acceptance per shipment of the given (po_no, po_line_no) lines, read from
+    acceptance_latest, in application order (date, then raw id; undated rows last).
+    """
+    latest_table = models.AcceptanceLatest
+    columns = ['id', 'po_no', 'po_line_no', 'shipment_no', 'acceptance_qty', 'application_processed_date']
+    rows = []
+    for start in range(0, len(line_keys), MERGE_CHUNK_SIZE):
+        rows.extend(
+            db.query(
+                latest_table.raw_acceptance_id, latest_table.po_no, latest_table.po_line_no,
+                latest_table.shipment_no, latest_table.acceptance_qty, latest_table.application_processed_date,
+            )
+            .filter(sa.tuple_(latest_table.po_no, latest_table.po_line_no).in_(line_keys[start:start + MERGE_CHUNK_SIZE]))
+            .all()
+        )
 
+    latest = pd.DataFrame.from_records(rows, columns=columns)
+    latest['application_processed_date'] = pd.to_datetime(latest['application_processed_date'])
+    latest.sort_values(['application_processed_date', 'id'], inplace=True)
+    return latest
 
 
-def process_acceptances_by_ids(db: Session, raw_acceptance_ids: List[int]):
+def process_acceptances_by_ids(db: Session, raw_acceptance_ids: List[int], progress: Optional[ImportProgress] = None):
     """
     Processes RawAcceptance records by ID.
     Uses 'keep=last' to handle Huawei's Reversals and block duplicate spam.
     """
     if not raw_acceptance_ids:
         return 0
+    progress = progress or ImportProgress(None)
 
-    # 1. Fetch ONLY the newly uploaded raw records
-    query_new_raw = db.query(models.RawAcceptance).filter(
-        models.RawAcceptance.id.in_(raw_acceptance_ids),
-        models.RawAcceptance.is_processed == False
-    )
-    new_df = pd.read_sql(query_new_raw.statement, db.bind)
-    
-    if new_df.empty:
-        return 0
-
-    # 2. Fetch ALL history for the affected POs
-    affected_po_nos = new_df['po_no'].unique().tolist()
-    query_all_history = db.query(models.RawAcceptance).filter(
-        models.RawAcceptance.po_no.in_(affected_po_nos)
-    )
-    history_df = pd.read_sql(query_all_history.statement, db.bind)
-
-    # =========================================================================
-    # 🚨 THE FIX: DEDUPLICATION BY OVERWRITE (LATEST STATE WINS)
-    # By dropping duplicates based ONLY on [PO, Line, Shipment], 
-    # we instantly destroy the 79 duplicates.
-    # If the last row uploaded was a negative reversal (-5), it SURVIVES!
-    # =========================================================================
-    # Sort by date and ID so the most recently uploaded file is at the very bottom
-    history_df.sort_values(['application_processed_date', 'id'], inplace=True)
-    
-    history_df.drop_duplicates(
-        subset=['po_no', 'po_line_no', 'shipment_no'], 
-        keep='last', 
-        inplace=True
-    )
-
-    # Generate IDs for joining
-    history_df['po_id'] = history_df['po_no'] + '-' + history_df['po_line_no'].astype(int).astype(str)
-
-    # 3. Fetch related MergedPOs
-    po_ids_to_update = history_df['po_id'].unique().tolist()
-    merged_po_records = db.query(models.MergedPO).filter(models.MergedPO.po_id.in_(po_ids_to_update)).all()
-    merged_po_map = {mp.po_id: mp for mp in merged_po_records}
+    with progress.phase("load_acceptance_history"):
+        # 1. Fetch ONLY the newly uploaded raw records
+        query_new_raw = db.query(models.RawAcceptance).filter(
+            models.RawAcceptance.id.in_(raw_acceptance_ids),
+            models.RawAcceptance.is_processed == False
+        )
+        new_df = pd.read_sql(query_new_raw.statement, db.bind)
     
-    updated_po_ids = set()
+        if new_df.empty:
+            return 0
 
-    # 4. Calculation Loop
-    for index, row in history_df.iterrows():
-        po_id = row['po_id']
-        
-        if po_id in merged_po_map:
-            merged_po = merged_po_map[po_id]
-            updated_po_ids.add(po_id)
-            
-            # Use the LATEST quantity directly (no summing needed!)
-            latest_qty = row['acceptance_qty']
-            raw_processed_date = row['application_processed_date']
-            shipment_no = row['shipment_no']
-            
-            unit_price = merged_po.unit_price or 0
-            req_qty = merged_po.requested_qty or 0
-
-            # --- TIMEZONE FIX: 2026-01-01 -> 2025-12-31 ---
-            final_processed_date = None
-            if latest_qty > 0 and pd.notna(raw_processed_date):
-                date_obj = raw_processed_date.date()
-                if date_obj == date(2026, 1, 1):
-                    final_processed_date = date(2025, 12, 31)
-                else:
-                    final_processed_date = date_obj
-
-            # --- MATHEMATICAL CAP ---
-            # If latest_qty is negative (reversal), it becomes 0.
-            agg_acceptance_qty = max(0, min(latest_qty, req_qty))
-
-            # Re-deduce category
-            merged_po.category = deduce_category(merged_po.item_description)
-            payment_term = merged_po.payment_term
-
-            # --- APPLY THE NEUTRALIZATION LOGIC ---
-            if shipment_no == 1:
-                if agg_acceptance_qty > 0:
-                    merged_po.total_ac_amount = unit_price * req_qty * 0.80
-                    merged_po.accepted_ac_amount = unit_price * agg_acceptance_qty * 0.80
-                    merged_po.date_ac_ok = final_processed_date 
-                    
-                    if payment_term == "AC PAC 100%":
-                        merged_po.total_pac_amount = unit_price * req_qty * 0.20
-                        merged_po.accepted_pac_amount = unit_price * agg_acceptance_qty * 0.20
-                        merged_po.date_pac_ok = final_processed_date 
-                else:
-                    # REVERSAL DETECTED: Reset to 0
-                    merged_po.accepted_ac_amount = 0.0
-                    merged_po.date_ac_ok = None
-                    if payment_term == "AC PAC 100%":
-                        merged_po.accepted_pac_amount = 0.0
-                        merged_po.date_pac_ok = None
-
-            elif shipment_no == 2:
-                if payment_term == "AC1 80 | PAC 20":
-                    if agg_acceptance_qty > 0:
-                        merged_po.total_pac_amount = unit_price * req_qty * 0.20
-                        merged_po.accepted_pac_amount = unit_price * agg_acceptance_qty * 0.20
-                        merged_po.date_pac_ok = final_processed_date
-                    else:
-                        # REVERSAL DETECTED: Reset to 0
-                        merged_po.accepted_pac_amount = 0.0
-                        merged_po.date_pac_ok = None
+        # 2. Latest state per shipment, only for the PO lines this upload touched.
+        #    Reversals survive: if the newest row of a shipment is negative, it wins.
+        line_keys = [
+            (po_no, int(line_no))
+            for po_no, line_no in new_df[['po_no', 'po_line_no']].drop_duplicates().itertuples(index=False)
+            if pd.notna(line_no)
+        ]
+        history_df = _latest_acceptances(db, line_keys)
+
+        # Generate IDs for joining
+        history_df['po_id'] = history_df['po_no'] + '-' + history_df['po_line_no'].astype(int).astype(str)
+
+    with progress.phase("apply_acceptances", total=len(history_df)):
+        # 3. Current state of the related MergedPOs
+        po_ids_to_update = history_df['po_id'].unique().tolist()
+        merged_df = _merged_po_acceptance_frame(db, po_ids_to_update)
+
+        # 4. Whole-column AC/PAC computation (same rules as the old per-row loop)
+        updates = compute_acceptance_updates(history_df, merged_df)
+        descriptions = merged_df.set_index('po_id')['item_description']
+        updates['category'] = deduce_categories(descriptions.reindex(updates.index)).to_numpy()
+
+        mappings = updates[['id', 'category'] + ACCEPTANCE_AMOUNT_COLUMNS].to_dict('records')
+        progress.set_total(len(mappings))
+        for start in range(0, len(mappings), MERGE_CHUNK_SIZE):
+            chunk = mappings[start:start + MERGE_CHUNK_SIZE]
+            db.bulk_update_mappings(models.MergedPO, chunk)
+            data_generation.mark(db, data_generation.MERGED_POS)
+            financial_rollup.mark_projects(db, financial_rollup.projects_of(
+                db, models.MergedPO.id.in_([mapping["id"] for mapping in chunk])
+            ))
+            progress.advance(len(chunk))
+        updated_po_ids = updates.index
 
     # 5. Mark new rows as Processed & Commit
     query_new_raw.update({"is_processed": True})
     db.commit()
 
+    # 6. The heuristic category above must not override a CategoryRule: re-apply the
+    #    rules to these lines (a later PO import only re-applies them to its own lines)
+    apply_category_rules(db, po_ids=updated_po_ids.tolist(), progress=progress)
+
     return len(updated_po_ids)
 
 
@@ -1554,6 +1719,34 @@ def process_acceptance_dataframe(db: Session, acceptance_df: pd.DataFrame):
 
     return len(set(updated_records))
 
+# Lean grid projection (GET /api/data/merged-pos/grid): name -> column, project names flattened
+MERGED_PO_GRID_COLUMNS = {
+    "id": models.MergedPO.id,
+    "po_id": models.MergedPO.po_id,
+    "po_no": models.MergedPO.po_no,
+    "po_line_no": models.MergedPO.po_line_no,
+    "site_id": models.MergedPO.site_id,
+    "site_code": models.MergedPO.site_code,
+    "customer_project_id": models.MergedPO.customer_project_id,
+    "customer_project_name": models.CustomerProject.name,
+    "internal_project_id": models.MergedPO.internal_project_id,
+    "internal_project_name": models.InternalProject.name,
+    "item_description": models.MergedPO.item_description,
+    "category": models.MergedPO.category,
+    "payment_term": models.MergedPO.payment_term,
+    "unit_price": models.MergedPO.unit_price,
+    "requested_qty": models.MergedPO.requested_qty,
+    "internal_control": models.MergedPO.internal_control,
+    "line_amount_hw": models.MergedPO.line_amount_hw,
+    "publish_date": models.MergedPO.publish_date,
+    "total_ac_amount": models.MergedPO.total_ac_amount,
+    "accepted_ac_amount": models.MergedPO.accepted_ac_amount,
+    "date_ac_ok": models.MergedPO.date_ac_ok,
+    "total_pac_amount": models.MergedPO.total_pac_amount,
+    "accepted_pac_amount": models.MergedPO.accepted_pac_amount,
+    "date_pac_ok": models.MergedPO.date_pac_ok,
+}
+
 def get_filtered_merged_pos(
     db: Session,
     internal_project_id: Optional[int] = None,
@@ -1562,17 +1755,26 @@ def get_filtered_merged_pos(
     category: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    columns: Optional[List[str]] = None
 ) -> Query:
     """
     Builds a SQLAlchemy Query for the MergedPO table with multiple optional filters.
-    """
-    # Start with a base query and eagerly load relationships to prevent N+1 query problem.
-    # This makes the API faster.
-    query = db.query(models.MergedPO).options(
-        joinedload(models.MergedPO.customer_project),joinedload(models.MergedPO.internal_project),
-        joinedload(models.MergedPO.site)
-    )
+    With `columns` (keys of MERGED_PO_GRID_COLUMNS) it selects just those, as plain rows.
+    """
+    if columns:
+        # Lean path: no ORM objects, project names from outer joins
+        query = db.query(*[MERGED_PO_GRID_COLUMNS[name].label(name) for name in columns])\
+                  .select_from(models.MergedPO)\
+                  .outerjoin(models.CustomerProject, models.MergedPO.customer_project_id == models.CustomerProject.id)\
+                  .outerjoin(models.InternalProject, models.MergedPO.internal_project_id == models.InternalProject.id)
+    else:
+        # Start with a base query and eagerly load relationships to prevent N+1 query problem.
+        # This makes the API faster.
+        query = db.query(models.MergedPO).options(
+            joinedload(models.MergedPO.customer_project),joinedload(models.MergedPO.internal_project),
+            joinedload(models.MergedPO.site)
+        )
 
    
     if internal_project_id:
@@ -1595,50 +1797,37 @@ def get_filtered_merged_pos(
         )
     elif category:
         query = query.filter(models.MergedPO.category == category)
-    if start_date:
-        query = query.filter(sa.func.date(models.MergedPO.publish_date) >= start_date)
-
-    if end_date:
-        query = query.filter(sa.func.date(models.MergedPO.publish_date) <= end_date)
+    if start_date or end_date:
+        query = query.filter(period_filter(models.MergedPO.publish_date, start_date=start_date, end_date=end_date))
         
     if search:
-        search_term = f"%{search}%"
-        # Search on MergedPO fields AND related fields
-        # We join explicitly for the search columns
-        query = query.join(models.CustomerProject, isouter=True)\
-                     .join(models.InternalProject, isouter=True) # Direct join
-                     
-        query = query.filter(
-            (models.MergedPO.po_id.ilike(search_term)) |
-            (models.MergedPO.item_description.ilike(search_term)) |
-            (models.InternalProject.name.ilike(search_term)) | 
-            (models.CustomerProject.name.ilike(search_term))
-        )
+        # Indexed search on MergedPO fields AND project names
+        query = text_search.restrict(db, query, "merged_po", search, models.MergedPO.id)
         
     return query
 def get_total_financial_summary(db: Session, user: models.User = None) -> dict:
-    # base_query = db.query(models.MergedPO)
+    # Reads the pre-aggregated rollup (services/financial_rollup.py), not merged_pos
+    financial_rollup.refresh(db)
+    rollup = models.FinancialRollup
     query = db.query(
-        func.sum(models.MergedPO.line_amount_hw).label("total_po_value"),
-        func.sum(models.MergedPO.accepted_ac_amount).label("total_accepted_ac"),
-        func.sum(models.MergedPO.accepted_pac_amount).label("total_accepted_pac")
+        func.sum(rollup.po_value).label("total_po_value"),
+        func.sum(rollup.ac_value).label("total_accepted_ac"),
+        func.sum(rollup.pac_value).label("total_accepted_pac")
     )
     canceled_query = db.query(
-        func.sum(models.MergedPO.line_amount_hw).label("total_canceled")
-    ).filter(models.MergedPO.internal_control == 0)
+        func.sum(rollup.po_value).label("total_canceled")
+    ).filter(rollup.internal_control == 0)
 
 
-    # --- THIS IS THE FIX ---
     # If a user is provided and their role is PM, filter the data
     if user and user.role in [UserRole.PM]:
         # Join with InternalProject to access the project_manager_id
         query = query.join(
             models.InternalProject, 
-            models.MergedPO.internal_project_id == models.InternalProject.id
+            rollup.internal_project_id == models.InternalProject.id
         )
         # Add the WHERE clause
         query = query.filter(models.InternalProject.project_manager_id == user.id)
-    # -----------------------
     
     # Execute the (now possibly filtered) query
     result = query.one()
@@ -1659,50 +1848,52 @@ def get_total_financial_summary(db: Session, user: models.User = None) -> dict:
 
     }
 def get_internal_projects_financial_summary(db: Session, user: models.User = None):
-    # 1. Fetch APPROVED data grouped by Internal Project AND Project Manager
+    financial_rollup.refresh(db)
+    rollup = models.FinancialRollup
+
+    # APPROVED and "Pending Approval" totals per Internal Project, from the rollup
+    totals = db.query(
+        rollup.internal_project_id,
+        rollup.assignment_status,
+        func.sum(rollup.po_value),
+        func.sum(rollup.ac_value),
+        func.sum(rollup.pac_value)
+    ).filter(
+        rollup.assignment_status.in_([models.AssignmentStatus.APPROVED, models.AssignmentStatus.PENDING_APPROVAL])
+    ).group_by(rollup.internal_project_id, rollup.assignment_status).all()
+
+    return _internal_project_summaries(db, totals, user)
+
+
+def _internal_project_summaries(db: Session, totals, user: models.User = None) -> list:
+    """
+    The internal projects overview from rollup totals [(project_id, assignment_status, po, ac, pac)]:
+    APPROVED money on its project, every PENDING_APPROVAL line (the Limbo Money) on TBD.
+    """
+    approved = defaultdict(lambda: [0.0, 0.0])  # project_id -> [po value, accepted]
+    pending_po = pending_accepted = 0.0
+    for project_id, assignment_status, po, ac, pac in totals:
+        accepted = float(ac or 0.0) + float(pac or 0.0)
+        if assignment_status == models.AssignmentStatus.APPROVED:
+            approved[project_id][0] += float(po or 0.0)
+            approved[project_id][1] += accepted
+        elif assignment_status == models.AssignmentStatus.PENDING_APPROVAL:
+            pending_po += float(po or 0.0)
+            pending_accepted += accepted
+
+    # Every project (with its PM), whether or not it has POs
     results = db.query(
         models.InternalProject.id.label("project_id"),
         models.InternalProject.name.label("project_name"),
         models.InternalProject.project_manager_id.label("project_manager_id"),
-        # --- NEW: Select PM Name Fields ---
         models.User.first_name.label("pm_first_name"),
-        models.User.last_name.label("pm_last_name"),
-        # ----------------------------------
-        func.coalesce(func.sum(models.MergedPO.line_amount_hw), 0).label("total_po_value"),
-        (
-            func.coalesce(func.sum(models.MergedPO.accepted_ac_amount), 0) + 
-            func.coalesce(func.sum(models.MergedPO.accepted_pac_amount), 0)
-        ).label("total_accepted")
+        models.User.last_name.label("pm_last_name")
     ).outerjoin(
-        models.MergedPO, 
-        and_(
-            models.InternalProject.id == models.MergedPO.internal_project_id,
-            models.MergedPO.assignment_status == models.AssignmentStatus.APPROVED
-        )
-    ).outerjoin( # --- NEW: Join User Table to get PM details ---
         models.User,
         models.InternalProject.project_manager_id == models.User.id
-    ).group_by(
-        models.InternalProject.id, 
-        models.InternalProject.name,
-        # --- NEW: Group by PM fields ---
-        models.User.first_name,
-        models.User.last_name
     ).all()
 
-    # 2. Fetch "Pending Approval" data (The Limbo Money)
-    pending_stats = db.query(
-        func.coalesce(func.sum(models.MergedPO.line_amount_hw), 0).label("po_value"),
-        func.coalesce(func.sum(models.MergedPO.accepted_ac_amount), 0).label("ac_value"),
-        func.coalesce(func.sum(models.MergedPO.accepted_pac_amount), 0).label("pac_value")
-    ).filter(
-        models.MergedPO.assignment_status == models.AssignmentStatus.PENDING_APPROVAL
-    ).first()
-    
-    pending_po = float(pending_stats.po_value) if pending_stats else 0.0
-    pending_accepted = (float(pending_stats.ac_value) + float(pending_stats.pac_value)) if pending_stats else 0.0
-
-    # 3. Identify TBD Project
+    # Identify TBD Project
     tbd_project = db.query(models.InternalProject).filter(models.InternalProject.name == "To Be Determined").first()
     tbd_id = tbd_project.id if tbd_project else -1
 
@@ -1714,8 +1905,7 @@ def get_internal_projects_financial_summary(db: Session, user: models.User = Non
              if row.project_manager_id != user.id:
                  continue
 
-        po_value = float(row.total_po_value)
-        accepted = float(row.total_accepted)
+        po_value, accepted = approved.get(row.project_id, (0.0, 0.0))
 
         # CRITICAL: If this is TBD, add the Pending money to it
         if row.project_id == tbd_id:
@@ -1746,22 +1936,28 @@ def get_internal_projects_financial_summary(db: Session, user: models.User = Non
     return summary_list
 
 def get_customer_projects_financial_summary(db: Session):
+    financial_rollup.refresh(db)
+    rollup = models.FinancialRollup
+    approved = db.query(
+        rollup.customer_project_id.label("project_id"),
+        func.sum(rollup.po_value).label("po_value"),
+        func.sum(rollup.ac_value).label("ac_value"),
+        func.sum(rollup.pac_value).label("pac_value")
+    ).filter(
+        rollup.assignment_status == models.AssignmentStatus.APPROVED
+    ).group_by(rollup.customer_project_id).subquery()
+
     results = db.query(
         models.CustomerProject.id.label("project_id"),
         models.CustomerProject.name.label("project_name"),
-        func.coalesce(func.sum(models.MergedPO.line_amount_hw), 0).label("total_po_value"),
+        func.coalesce(approved.c.po_value, 0).label("total_po_value"),
         (
-            func.coalesce(func.sum(models.MergedPO.accepted_ac_amount), 0) + 
-            func.coalesce(func.sum(models.MergedPO.accepted_pac_amount), 0)
+            func.coalesce(approved.c.ac_value, 0) + 
+            func.coalesce(approved.c.pac_value, 0)
         ).label("total_accepted")
-    ).outerjoin( 
-        models.MergedPO, 
-        and_(
-            models.CustomerProject.id == models.MergedPO.customer_project_id,
-            # --- UPDATE: Filter inside the JOIN ---
-            models.MergedPO.assignment_status == models.AssignmentStatus.APPROVED
-        )
-    ).group_by(models.CustomerProject.id, models.CustomerProject.name).all()
+    ).outerjoin(
+        approved, models.CustomerProject.id == approved.c.project_id
+    ).all()
     
     summary_list = []
     for row in results:
@@ -1785,33 +1981,28 @@ def get_po_value_by_category(db: Session, user: models.User = None):
     """
     Calculates the total PO value for each category, correctly filtered by user role.
     """
-    # Define the category label once for reuse
-    category_label = coalesce(models.MergedPO.category, "TBD").label("category_name")
+    financial_rollup.refresh(db)
+    rollup = models.FinancialRollup
 
-    # --- THIS IS THE FIX ---
+    # Define the category label once for reuse
+    category_label = coalesce(rollup.category, "TBD").label("category_name")
 
-    # 1. Start the query from the main table, MergedPO.
-    base_query = db.query(models.MergedPO)
+    base_query = db.query(rollup)
 
-    # 2. Apply the role-based filter by joining to InternalProject.
-    #    This must be done BEFORE the final select and group_by.
+    # Role-based filter: the PM is resolved through the project
     if user and user.role in [UserRole.PM]:
         base_query = base_query.join(
             models.InternalProject, 
-            models.MergedPO.internal_project_id == models.InternalProject.id
+            rollup.internal_project_id == models.InternalProject.id
         ).filter(
             models.InternalProject.project_manager_id == user.id
         )
 
-    # 3. Now, with the correct FROM and JOIN clauses established,
-    #    select the final columns and apply the GROUP BY.
     final_query = base_query.with_entities(
         category_label,
-        func.sum(models.MergedPO.line_amount_hw).label("total_value")
+        func.sum(rollup.po_value).label("total_value")
     ).group_by(category_label)
 
-    # -----------------------
-
     results = final_query.all()
     
     return [{"category": row.category_name, "value": row.total_value or 0} for row in results]
@@ -1828,8 +2019,8 @@ def get_remaining_to_accept_paginated(
     internal_project_id: Optional[int] = None,
     customer_project_id: Optional[int] = None,
     project_manager_id: Optional[int] = None,
-        user: models.User = None  # <-- Add user parameter
-
+        user: models.User = None,  # <-- Add user parameter
+    cursor: Optional[str] = None  # keyset mode: "" = first page, then next_cursor
 ):
     # 1. Define SQL Expressions (Same as before)
     remaining_expr = models.MergedPO.line_amount_hw - (
@@ -1873,17 +2064,19 @@ def get_remaining_to_accept_paginated(
             models.MergedPO.internal_project_id == models.InternalProject.id
         ).filter(models.InternalProject.project_manager_id == project_manager_id)
     if search:
-        term = f"%{search}%"
-        query = query.filter(
-            (models.MergedPO.po_no.ilike(term)) | 
-            (models.MergedPO.site_code.ilike(term)) |
-            (models.MergedPO.item_description.ilike(term))
-        )
+        query = text_search.restrict(db, query, "remaining_to_accept", search, models.MergedPO.id)
 
-    # 4. Pagination
-    total_items = query.count()
-    results = query.order_by(models.MergedPO.publish_date.desc())\
-                   .offset((page - 1) * size).limit(size).all()
+    # 4. Pagination (total cached until merged_pos or internal_projects change)
+    signature = (
+        "remaining_to_accept", user.id if user and user.role in [UserRole.PM] else None,
+        filter_stage, search, internal_project_id, customer_project_id, project_manager_id,
+    )
+    total_items = pagination.cached_count(db, signature, query)
+    next_cursor = None
+    if cursor is not None:
+        results, next_cursor = pagination.keyset_page(query, cursor, size, merged_po=lambda row: row[0])
+    else:
+        results = pagination.newest_first(query).offset((page - 1) * size).limit(size).all()
 
     # 5. Format Output
     items = []
@@ -1900,39 +2093,30 @@ def get_remaining_to_accept_paginated(
         "total_items": total_items,
         "page": page,
         "size": size,
-        "total_pages": (total_items + size - 1) // size
+        "total_pages": (total_items + size - 1) // size,
+        "next_cursor": next_cursor,
     }
 
 # NEW HELPER: Get Stats efficiently without fetching all rows
 def get_remaining_stats(db: Session,user: models.User = None) -> dict:
-    remaining_expr = models.MergedPO.line_amount_hw - (
-        func.coalesce(models.MergedPO.accepted_ac_amount, 0) + func.coalesce(models.MergedPO.accepted_pac_amount, 0)
-    )
-    stage_expr = case(
-        (models.MergedPO.date_ac_ok.is_(None), "WAITING_AC"),
-        (and_(models.MergedPO.date_ac_ok.isnot(None), models.MergedPO.date_pac_ok.is_(None)), "WAITING_PAC"),
-        else_="PARTIAL_GAP"
-    )
-    
+    financial_rollup.refresh(db)
+    rollup = models.FinancialRollup
+
+    # Open lines (|remaining| > 0.01) and their remaining amount, per stage
     base_query = db.query(
-    stage_expr.label("stage"),
-    func.count(models.MergedPO.id).label("count"),
-    func.sum(remaining_expr).label("total_gap")
-    ).filter(
-        func.abs(remaining_expr) > 0.01
+        rollup.stage.label("stage"),
+        func.sum(rollup.open_lines).label("count"),
+        func.sum(rollup.open_remaining).label("total_gap")
     )
 
-    # --- THIS IS THE FIX ---
     # Apply the same role-based filter
     if user and user.role in [UserRole.PM]:
         base_query = base_query.join(
             models.InternalProject,
-            models.MergedPO.internal_project_id == models.InternalProject.id
+            rollup.internal_project_id == models.InternalProject.id
         ).filter(models.InternalProject.project_manager_id == user.id)
-    # -----------------------
 
-    # Now group by and execute on the (potentially filtered) query
-    stats = base_query.group_by(stage_expr).all()
+    stats = base_query.group_by(rollup.stage).all()
 
     # Initialize all buckets to 0
     all_stages = ["WAITING_AC", "WAITING_PAC", "PARTIAL_GAP"]
@@ -1941,7 +2125,7 @@ def get_remaining_stats(db: Session,user: models.User = None) -> dict:
     # Populate the dictionary with actual results
     for row in stats:
         if row.stage in result_dict:
-            result_dict[row.stage] = {"count": row.count, "gap": row.total_gap or 0}
+            result_dict[row.stage] = {"count": int(row.count or 0), "gap": row.total_gap or 0}
 
     return result_dict
 
@@ -1968,30 +2152,20 @@ def get_financial_summary_by_period(
         ).filter(models.InternalProject.project_manager_id == user.id)
 
     # --- Define date filters for each metric ---
-    po_date_filters = [extract('year', models.MergedPO.publish_date) == year]
-    ac_date_filters = [extract('year', models.MergedPO.date_ac_ok) == year]
-    pac_date_filters = [extract('year', models.MergedPO.date_pac_ok) == year]
-
-    if month:
-        po_date_filters.append(extract('month', models.MergedPO.publish_date) == month)
-        ac_date_filters.append(extract('month', models.MergedPO.date_ac_ok) == month)
-        pac_date_filters.append(extract('month', models.MergedPO.date_pac_ok) == month)
-
-    if week:
-        # Note: func.week(..., 3) is MySQL specific for Monday-start weeks.
-        po_date_filters.append(func.week(models.MergedPO.publish_date, 3) == week)
-        ac_date_filters.append(func.week(models.MergedPO.date_ac_ok, 3) == week)
-        pac_date_filters.append(func.week(models.MergedPO.date_pac_ok, 3) == week)
+    # Range predicates (week = ISO week, as MySQL WEEK(col, 3)) so the date indexes apply
+    po_in_period = period_filter(models.MergedPO.publish_date, year=year, month=month, week=week)
+    ac_in_period = period_filter(models.MergedPO.date_ac_ok, year=year, month=month, week=week)
+    pac_in_period = period_filter(models.MergedPO.date_pac_ok, year=year, month=month, week=week)
         # Only count POs that have been formally approved for their project
     # status_filter = (models.MergedPO.assignment_status == models.AssignmentStatus.APPROVED)
 
     # --- Perform conditional aggregation on the (potentially filtered) base_query ---
     summary = base_query.with_entities(
         # Add the status filter to every SUM condition using AND
-        func.sum(case((and_(*po_date_filters), models.MergedPO.line_amount_hw), else_=0)).label("total_po_value"),
-        func.sum(case((and_(*ac_date_filters), models.MergedPO.accepted_ac_amount), else_=0)).label("total_accepted_ac"),
-        func.sum(case((and_(*pac_date_filters), models.MergedPO.accepted_pac_amount), else_=0)).label("total_accepted_pac")
-    ).one()
+        func.sum(case((po_in_period, models.MergedPO.line_amount_hw), else_=0)).label("total_po_value"),
+        func.sum(case((ac_in_period, models.MergedPO.accepted_ac_amount), else_=0)).label("total_accepted_ac"),
+        func.sum(case((pac_in_period, models.MergedPO.accepted_pac_amount), else_=0)).label("total_accepted_pac")
+    ).filter(or_(po_in_period, ac_in_period, pac_in_period)).one()
 
 
     # Process results (no change here)
@@ -2007,56 +2181,51 @@ def get_financial_summary_by_period(
         "remaining_gap": remaining_gap,
     }
 
-# --- Also, let's fix the get_yearly_chart_data function ---
-
 def get_yearly_chart_data(db: Session, year: int, user: models.User = None):
-    # Base query for MergedPO
-    base_query = db.query(models.MergedPO)
-    
-    # Filter: Only Approved POs
-    base_query = base_query.filter(models.MergedPO.assignment_status == models.AssignmentStatus.APPROVED)
+    """
+    Monthly PO value and paid (AC + PAC) amount of `year`, in one grouped read of
+    financial_rollup: PO value by publish month, AC / PAC by their own acceptance
+    month (the per-month figures of get_financial_summary_by_period).
 
-    # Filter: User Role (PM/PD)
-    if user and user.role in [models.UserRole.PM, models.UserRole.PD]:
-        # Since MergedPO doesn't link directly to InternalProject anymore,
-        # we must join through CustomerProject -> InternalProject
-        base_query = base_query.join(models.CustomerProject).join(models.InternalProject).filter(
-            models.InternalProject.project_manager_id == user.id
-        )
+    Role scoping is unchanged: a month is listed when it has an APPROVED line on
+    one of the user's projects (PM / PD); the amounts are filtered for a PM only.
+    """
+    financial_rollup.refresh(db)
+    rollup = models.FinancialRollup
+    scoped_months = bool(user and user.role in [models.UserRole.PM, models.UserRole.PD])
 
-    # --- Identify Active Months ---
-    month_col = extract('month', models.MergedPO.publish_date).label("month_num")
-    
-    po_months = base_query.with_entities(month_col).filter(extract('year', models.MergedPO.publish_date) == year)
-    
-    ac_months = base_query.with_entities(
-        extract('month', models.MergedPO.date_ac_ok).label("month_num")
-    ).filter(extract('year', models.MergedPO.date_ac_ok) == year)
-    
-    pac_months = base_query.with_entities(
-        extract('month', models.MergedPO.date_pac_ok).label("month_num")
-    ).filter(extract('year', models.MergedPO.date_pac_ok) == year)
-    
-    all_months_query = union_all(po_months, ac_months, pac_months).subquery()
-    active_months_query = db.query(distinct(all_months_query.c.month_num))
-    active_months = [row[0] for row in active_months_query.all()]
+    month_is_active = rollup.assignment_status == models.AssignmentStatus.APPROVED
+    if scoped_months:
+        month_is_active = and_(month_is_active, models.InternalProject.project_manager_id == user.id)
 
-    # --- Fetch Data ---
-    monthly_data = []
-    for month in active_months:
-        if not month: continue
+    query = db.query(
+        rollup.period_month.label("month"),
+        func.sum(rollup.po_value).label("total_po_value"),
+        func.sum(rollup.ac_value).label("total_accepted_ac"),
+        func.sum(rollup.pac_value).label("total_accepted_pac"),
+        func.max(case((month_is_active, 1), else_=0)).label("active")
+    ).filter(rollup.period_year == year)
+
+    if scoped_months:
+        query = query.outerjoin(models.InternalProject, rollup.internal_project_id == models.InternalProject.id)
+    if user and user.role in [UserRole.PM]:
+        query = query.filter(models.InternalProject.project_manager_id == user.id)
 
-        # The helper function 'get_financial_summary_by_period' MUST also be updated 
-        # to filter by APPROVED status (as provided in the previous response).
-        summary = get_financial_summary_by_period(db=db, year=year, month=month, user=user)
-        
-        total_paid = (summary.get("total_accepted_ac", 0) or 0) + (summary.get("total_accepted_pac", 0) or 0)
+    return _yearly_chart_points(query.group_by(rollup.period_month).all())
+
+
+def _yearly_chart_points(monthly) -> list:
+    """Chart points from [(month, po, ac, pac, active)], active months only."""
+    monthly_data = []
+    for month, po, ac, pac, active in monthly:
+        if not month or not active:
+            continue
         monthly_data.append({
-            "month": month,
-            "total_po_value": summary.get("total_po_value", 0) or 0,
-            "total_paid": total_paid
+            "month": int(month),
+            "total_po_value": po or 0,
+            "total_paid": (ac or 0) + (pac or 0)
         })
-        
+
     return sorted(monthly_data, key=lambda x: x['month'])
 
 
@@ -2129,18 +2298,10 @@ def get_export_dataframe(
         query = query.filter(models.MergedPO.site_code == site_code)
     if category:
         query= query.filter(models.MergedPO.category == category)
-    if start_date:
-        query = query.filter(sa.func.date(models.MergedPO.publish_date) >= start_date)
-    if end_date:
-        query = query.filter(sa.func.date(models.MergedPO.publish_date) <= end_date)
+    if start_date or end_date:
+        query = query.filter(period_filter(models.MergedPO.publish_date, start_date=start_date, end_date=end_date))
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (models.MergedPO.po_id.ilike(search_term)) |
-            (models.MergedPO.item_description.ilike(search_term)) |
-            (IntProj.name.ilike(search_term)) |
-            (CustProj.name.ilike(search_term))
-        )
+        query = text_search.restrict(db, query, "merged_po", search, models.MergedPO.id)
 
     df = pd.read_sql(query.statement, db.bind)
     
@@ -2268,12 +2429,12 @@ def get_user_performance_stats(
 
     # Apply Date Range Logic
     if start_date:
-        po_filters.append(func.date(models.MergedPO.publish_date) >= start_date)
+        po_filters.append(period_filter(models.MergedPO.publish_date, start_date=start_date))
         ac_filters.append(models.MergedPO.date_ac_ok >= start_date)
         pac_filters.append(models.MergedPO.date_pac_ok >= start_date)
 
     if end_date:
-        po_filters.append(func.date(models.MergedPO.publish_date) <= end_date)
+        po_filters.append(period_filter(models.MergedPO.publish_date, end_date=end_date))
         ac_filters.append(models.MergedPO.date_ac_ok <= end_date)
         pac_filters.append(models.MergedPO.date_pac_ok <= end_date)
 
@@ -2332,6 +2493,36 @@ def set_user_target(db: Session, target: schemas.UserTargetCreate):
 
 # In crud.py
 
+def _pm_actuals_by_month(db: Session, pm_ids: List[int], *criteria) -> dict:
+    """
+    {pm_id: [(year, month, po, ac, pac), ...]} for every PM at once: one read of
+    financial_rollup grouped by PM and month (PO by publish month, AC / PAC by
+    their own acceptance months; NULL year / month = no date).
+    """
+    if not pm_ids:
+        return {}
+    financial_rollup.refresh(db)
+    rollup = models.FinancialRollup
+    pm_id = models.InternalProject.project_manager_id
+    rows = db.query(
+        pm_id,
+        rollup.period_year,
+        rollup.period_month,
+        func.sum(rollup.po_value),
+        func.sum(rollup.ac_value),
+        func.sum(rollup.pac_value)
+    ).join(
+        models.InternalProject, rollup.internal_project_id == models.InternalProject.id
+    ).filter(
+        pm_id.in_(pm_ids), *criteria
+    ).group_by(pm_id, rollup.period_year, rollup.period_month).all()
+
+    by_pm = defaultdict(list)
+    for pm, row_year, row_month, po, ac, pac in rows:
+        by_pm[pm].append((row_year, row_month, po, ac, pac))
+    return by_pm
+
+
 def get_performance_matrix(
     db: Session, 
     year: int, 
@@ -2347,65 +2538,41 @@ def get_performance_matrix(
         pms_to_process = db.query(models.User).filter(
             models.User.role.in_(['PM', 'ADMIN', 'PD'])
         ).all()
-        
+    pm_ids = [pm.id for pm in pms_to_process]
+
+    # A. Targets (Plan) of every PM in one grouped query
+    target_query = db.query(
+        models.UserPerformanceTarget.user_id,
+        func.sum(models.UserPerformanceTarget.po_monthly_update),
+        func.sum(models.UserPerformanceTarget.acceptance_monthly_update)
+    ).filter(
+        models.UserPerformanceTarget.user_id.in_(pm_ids),
+        models.UserPerformanceTarget.year == year,
+    )
+    if month:
+        target_query = target_query.filter(models.UserPerformanceTarget.month == month)
+    plans = {user_id: (plan_po, plan_invoice) for user_id, plan_po, plan_invoice in target_query.group_by(
+        models.UserPerformanceTarget.user_id
+    ).all()}
+
+    # B + C. Actuals per PM and month (internal_control = 1): the period and the lifetime gap
+    actuals = _pm_actuals_by_month(db, pm_ids, models.FinancialRollup.internal_control == 1)
+
     results = []
 
     for pm in pms_to_process:
-        # A. Fetch Targets (Plan) - Remains the same (Targets are set independently of control)
-        target_query = db.query(
-            func.sum(models.UserPerformanceTarget.po_monthly_update),
-            func.sum(models.UserPerformanceTarget.acceptance_monthly_update)
-        ).filter(
-            models.UserPerformanceTarget.user_id == pm.id,
-            models.UserPerformanceTarget.year == year,
-        )
-        if month:
-            target_query = target_query.filter(models.UserPerformanceTarget.month == month)
-            
-        plan_po, plan_invoice = target_query.first()
+        plan_po, plan_invoice = plans.get(pm.id, (None, None))
         plan_po = plan_po or 0.0
         plan_invoice = plan_invoice or 0.0
 
-        # --- B. Fetch Actuals for Period (WITH INTERNAL_CONTROL = 1) ---
-        base_filters = [models.InternalProject.project_manager_id == pm.id]
-        
-        # We add internal_control == 1 to every metric condition
-        control_filter = (models.MergedPO.internal_control == 1)
-        
-        po_date_filters = base_filters + [extract('year', models.MergedPO.publish_date) == year, control_filter]
-        ac_date_filters = base_filters + [extract('year', models.MergedPO.date_ac_ok) == year, control_filter]
-        pac_date_filters = base_filters + [extract('year', models.MergedPO.date_pac_ok) == year, control_filter]
-        
-        if month:
-            po_date_filters.append(extract('month', models.MergedPO.publish_date) == month)
-            ac_date_filters.append(extract('month', models.MergedPO.date_ac_ok) == month)
-            pac_date_filters.append(extract('month', models.MergedPO.date_pac_ok) == month)
-
-        summary = db.query(
-            func.sum(case((and_(*po_date_filters), models.MergedPO.line_amount_hw), else_=0)),
-            func.sum(case((and_(*ac_date_filters), models.MergedPO.accepted_ac_amount), else_=0)),
-            func.sum(case((and_(*pac_date_filters), models.MergedPO.accepted_pac_amount), else_=0))
-        ).join(
-            models.InternalProject, models.MergedPO.internal_project_id == models.InternalProject.id
-        ).first()
-
-        actual_po_period = float(summary[0] or 0.0)
-        actual_paid_period = float(summary[1] or 0.0) + float(summary[2] or 0.0)
-
-        # --- C. Fetch LIFETIME GAP (WITH INTERNAL_CONTROL = 1) ---
-        lifetime_summary = db.query(
-            func.sum(models.MergedPO.line_amount_hw),
-            func.sum(models.MergedPO.accepted_ac_amount),
-            func.sum(models.MergedPO.accepted_pac_amount)
-        ).join(
-            models.InternalProject, models.MergedPO.internal_project_id == models.InternalProject.id
-        ).filter(
-            models.InternalProject.project_manager_id == pm.id,
-            models.MergedPO.internal_control == 1 # <--- THE FIX
-        ).first()
-        
-        lifetime_po = float(lifetime_summary[0] or 0.0)
-        lifetime_paid = float(lifetime_summary[1] or 0.0) + float(lifetime_summary[2] or 0.0)
+        actual_po_period = actual_paid_period = 0.0
+        lifetime_po = lifetime_paid = 0.0
+        for row_year, row_month, po, ac, pac in actuals.get(pm.id, []):
+            lifetime_po += float(po or 0.0)
+            lifetime_paid += float(ac or 0.0) + float(pac or 0.0)
+            if row_year == year and (not month or row_month == month):
+                actual_po_period += float(po or 0.0)
+                actual_paid_period += float(ac or 0.0) + float(pac or 0.0)
         total_lifetime_gap = lifetime_po - lifetime_paid
 
         # --- E. Final Result Construction ---
@@ -2507,7 +2674,23 @@ def get_planning_matrix(db: Session, year: int, user: Optional[models.User] = No
         pms_to_process = db.query(models.User).filter(
             models.User.role.in_(['PM', 'ADMIN', 'PD'])
         ).all()
-    
+    pm_ids = [pm.id for pm in pms_to_process]
+
+    # 2. Targets of every PM for the year, in one query
+    targets_by_pm = defaultdict(list)
+    for t in db.query(models.UserPerformanceTarget).filter(
+        models.UserPerformanceTarget.user_id.in_(pm_ids),
+        models.UserPerformanceTarget.year == year
+    ).all():
+        targets_by_pm[t.user_id].append(t)
+
+    # 3. Actuals of every PM for the year (APPROVED lines), grouped by PM and month
+    actuals = _pm_actuals_by_month(
+        db, pm_ids,
+        models.FinancialRollup.period_year == year,
+        models.FinancialRollup.assignment_status == models.AssignmentStatus.APPROVED
+    )
+
     matrix_data = []
 
     for pm in pms_to_process:
@@ -2520,15 +2703,7 @@ def get_planning_matrix(db: Session, year: int, user: Optional[models.User] = No
         acc_update = [0.0] * 12
         acc_actual = [0.0] * 12
 
-        # 2. Fetch Targets (Database)
-        # Assuming you renamed the model to UserPerformanceTarget or kept MonthlyTarget
-        # AND you ran the migration to add the 'master' columns.
-        targets = db.query(models.UserPerformanceTarget).filter(
-            models.UserPerformanceTarget.user_id == pm.id,
-            models.UserPerformanceTarget.year == year
-        ).all()
-
-        for t in targets:
+        for t in targets_by_pm.get(pm.id, []):
             if 1 <= t.month <= 12:
                 idx = t.month - 1
                 # Map the database columns to our arrays
@@ -2537,39 +2712,11 @@ def get_planning_matrix(db: Session, year: int, user: Optional[models.User] = No
                 acc_master[idx] = t.acceptance_master_plan or 0
                 acc_update[idx] = t.acceptance_monthly_update or 0
 
-        # 3. Calculate Actuals (Logic from your old function, slightly optimized)
-        
-        # A. Actual POs (Based on Publish Date)
-        po_results = db.query(
-            extract('month', models.MergedPO.publish_date).label('month'),
-            func.sum(models.MergedPO.line_amount_hw)
-        ).join(models.CustomerProject).join(models.InternalProject).filter(
-            models.InternalProject.project_manager_id == pm.id,
-            extract('year', models.MergedPO.publish_date) == year,
-            models.MergedPO.assignment_status == models.AssignmentStatus.APPROVED
-        ).group_by('month').all()
-
-        for m, val in po_results:
-            if m: po_actual[int(m) - 1] = val or 0
-
-        # B. Actual Acceptance (Based on AC/PAC Dates)
-        # Using the same logic as before: fetch items where either date is in year
-        paid_items = db.query(models.MergedPO).join(models.CustomerProject).join(models.InternalProject).filter(
-            models.InternalProject.project_manager_id == pm.id,
-            (extract('year', models.MergedPO.date_ac_ok) == year) | 
-            (extract('year', models.MergedPO.date_pac_ok) == year),
-                    models.MergedPO.assignment_status == models.AssignmentStatus.APPROVED
-
-        ).all()
-
-        for item in paid_items:
-            # AC Logic
-            if item.date_ac_ok and item.date_ac_ok.year == year:
-                acc_actual[item.date_ac_ok.month - 1] += (item.accepted_ac_amount or 0)
-            
-            # PAC Logic
-            if item.date_pac_ok and item.date_pac_ok.year == year:
-                acc_actual[item.date_pac_ok.month - 1] += (item.accepted_pac_amount or 0)
+        # A. Actual POs by publish month, B. Actual Acceptance by AC / PAC month
+        for _, row_month, po, ac, pac in actuals.get(pm.id, []):
+            if row_month:
+                po_actual[int(row_month) - 1] += po or 0
+                acc_actual[int(row_month) - 1] += (ac or 0) + (pac or 0)
 
         # 4. Construct the Data Structure for the Frontend
         # We return an object that matches the structure expected by the React component I gave you earlier.
@@ -3668,19 +3815,7 @@ def get_all_bcs(db: Session, current_user: models.User, search: Optional[str] =
     # 4. SEARCH LOGIC
     # =========================================================
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                models.BonDeCommande.bc_number.ilike(search_term),
-                models.SBC.short_name.ilike(search_term),
-                models.SBC.name.ilike(search_term),
-                models.InternalProject.name.ilike(search_term),
-                models.BonDeCommande.creator.has(func.concat(models.User.first_name, " ", models.User.last_name).ilike(search_term)),
-                models.BonDeCommande.internal_project.has(
-                    models.InternalProject.project_manager.has(func.concat(models.User.first_name, " ", models.User.last_name).ilike(search_term))
-                )
-            )
-        )
+        query = text_search.restrict(db, query, "bc", search, models.BonDeCommande.id)
 
     # 5. Status Filter
     if status_filter and status_filter != "ALL":
@@ -3915,14 +4050,16 @@ def assign_site_to_internal_project_by_code(
         db.add(allocation)
 
     # 4. Mettre à jour tous les MergedPO pour ce site
-    updated_rows = (
-        db.query(models.MergedPO)
-        .filter(models.MergedPO.site_id == site.id)
-        .update(
-            {models.MergedPO.internal_project_id: internal_project.id},
-            synchronize_session=False,
+    moved_from = financial_rollup.projects_of(db, models.MergedPO.site_id == site.id)
+    with financial_rollup.scope(db, moved_from | {internal_project.id}):
+        updated_rows = (
+            db.query(models.MergedPO)
+            .filter(models.MergedPO.site_id == site.id)
+            .update(
+                {models.MergedPO.internal_project_id: internal_project.id},
+                synchronize_session=False,
+            )
         )
-    )
 
     db.commit()
     return updated_rows
@@ -3988,13 +4125,15 @@ def bulk_reassign_pos(db: Session, po_ids: List[int], target_project_id: int, ad
 
     # 1. Update the POs directly
     # Since this is a manual correction by a Director/Admin, we force status to APPROVED
-    updated_count = db.query(models.MergedPO).filter(
-        models.MergedPO.id.in_(po_ids)
-    ).update({
-        "internal_project_id": target_project_id,
-        "assignment_status": models.AssignmentStatus.APPROVED,
-        "assignment_date": datetime.now()
-    }, synchronize_session=False)
+    moved_from = financial_rollup.projects_of(db, models.MergedPO.id.in_(po_ids))
+    with financial_rollup.scope(db, moved_from | {target_project_id}):
+        updated_count = db.query(models.MergedPO).filter(
+            models.MergedPO.id.in_(po_ids)
+        ).update({
+            "internal_project_id": target_project_id,
+            "assignment_status": models.AssignmentStatus.APPROVED,
+            "assignment_date": datetime.now()
+        }, synchronize_session=False)
 
     db.commit()
 
@@ -4023,10 +4162,8 @@ def bulk_assign_sites(db: Session, site_ids: List[int], target_project_id: int,
     # 2. Simplified Validation: We assume the Admin knows what they are doing.
     # If the site ID exists, we will update it. This matches the single-assign logic.
     # We just filter out any IDs that aren't actually in the Sites table to be safe.
-    valid_site_ids = [
-        sid for sid in site_ids 
-        if db.query(models.Site.id).filter_by(id=sid).scalar() is not None
-    ]
+    existing_site_ids = bulk_hydrate(db, models.Site, "id", site_ids, create_missing=False)
+    valid_site_ids = [sid for sid in site_ids if sid in existing_site_ids]
     
     if not valid_site_ids: 
         return {"updated": 0, "skipped": len(site_ids)}
@@ -4067,13 +4204,15 @@ def bulk_assign_sites(db: Session, site_ids: List[int], target_project_id: int,
             
     # 4. Update MergedPO Records (The most important part)
     # This moves the POs to the new project and sets them to PENDING_APPROVAL
-    result_count = db.query(models.MergedPO).filter(
-        models.MergedPO.site_id.in_(valid_site_ids)
-    ).update({
-        "internal_project_id": target_project_id,
-        "assignment_status": models.AssignmentStatus.PENDING_APPROVAL,
-        "assignment_date": datetime.now()
-    }, synchronize_session=False)
+    moved_from = financial_rollup.projects_of(db, models.MergedPO.site_id.in_(valid_site_ids))
+    with financial_rollup.scope(db, moved_from | {target_project_id}):
+        result_count = db.query(models.MergedPO).filter(
+            models.MergedPO.site_id.in_(valid_site_ids)
+        ).update({
+            "internal_project_id": target_project_id,
+            "assignment_status": models.AssignmentStatus.PENDING_APPROVAL,
+            "assignment_date": datetime.now()
+        }, synchronize_session=False)
     
     db.commit()
 
@@ -4161,13 +4300,15 @@ def auto_approve_old_assignments(db: Session):
 
     # 3. Perform the Bulk Update
     # We update ALL eligible records in one go for efficiency
-    db.query(models.MergedPO).filter(
+    expired = (
         models.MergedPO.assignment_status == models.AssignmentStatus.PENDING_APPROVAL,
-        models.MergedPO.assignment_date <= seven_days_ago
-    ).update({
-        "assignment_status": models.AssignmentStatus.APPROVED,
-        "assignment_date": None 
-    }, synchronize_session=False)
+        models.MergedPO.assignment_date <= seven_days_ago,
+    )
+    with financial_rollup.scope(db, financial_rollup.projects_of(db, *expired)):
+        db.query(models.MergedPO).filter(*expired).update({
+            "assignment_status": models.AssignmentStatus.APPROVED,
+            "assignment_date": None 
+        }, synchronize_session=False)
 
     # 4. Notify Admins
     # We send a summary to all admins
@@ -4211,13 +4352,15 @@ def process_assignment_review(db: Session, merged_po_ids: List[int], action: str
     count = query.count()
     if count == 0:
         return 0
+    reviewed_projects = {project_id for (project_id,) in query.with_entities(models.MergedPO.internal_project_id).distinct()}
 
     # 2. Apply Logic
     if action == "APPROVE":
         # Change status to APPROVED. Keep project assignment.
-        query.update({
-            "assignment_status": models.AssignmentStatus.APPROVED
-        }, synchronize_session=False)
+        with financial_rollup.scope(db, reviewed_projects):
+            query.update({
+                "assignment_status": models.AssignmentStatus.APPROVED
+            }, synchronize_session=False)
 
     elif action == "REJECT":
         # Revert to TBD project and set status to APPROVED (as TBD is auto-approved)
@@ -4225,10 +4368,11 @@ def process_assignment_review(db: Session, merged_po_ids: List[int], action: str
         tbd_id = tbd_project.id if tbd_project else None
         
         if tbd_id:
-            query.update({
-                "internal_project_id": tbd_id,
-                "assignment_status": models.AssignmentStatus.APPROVED
-            }, synchronize_session=False)
+            with financial_rollup.scope(db, reviewed_projects | {tbd_id}):
+                query.update({
+                    "internal_project_id": tbd_id,
+                    "assignment_status": models.AssignmentStatus.APPROVED
+                }, synchronize_session=False)
             
             # Also revert the Allocation table for these sites
             # We need the site_ids from the POs first
@@ -4303,10 +4447,8 @@ def search_merged_pos_by_site_codes(
         models.MergedPO.internal_project_id == tbd_project.id # <--- ADD THIS FILTER
     )
     # 3. Apply Date Filters
-    if start_date:
-        query = query.filter(func.date(models.MergedPO.publish_date) >= start_date)
-    if end_date:
-        query = query.filter(func.date(models.MergedPO.publish_date) <= end_date)
+    if start_date or end_date:
+        query = query.filter(period_filter(models.MergedPO.publish_date, start_date=start_date, end_date=end_date))
 
     return query.all()
 
@@ -4393,7 +4535,13 @@ def bulk_assign_projects_only(db: Session, file_contents: bytes):
         # Update in batches of 5000
         batch_size = 5000
         for i in range(0, len(update_list), batch_size):
-            db.bulk_update_mappings(models.MergedPO, update_list[i:i+batch_size])
+            batch = update_list[i:i+batch_size]
+            # Old and new projects of the batch (mark before the rows move)
+            financial_rollup.mark_projects(db, financial_rollup.projects_of(
+                db, models.MergedPO.id.in_([item["id"] for item in batch])
+            ) | {item["internal_project_id"] for item in batch})
+            db.bulk_update_mappings(models.MergedPO, batch)
+            data_generation.mark(db, data_generation.MERGED_POS)
             db.commit()
 
     return {
@@ -4584,61 +4732,188 @@ def get_acceptance_export_dataframe(db: Session, current_user: models.User, expo
     return pd.DataFrame(data)
 
 
+# Age buckets of the remaining GAP: (label, max age in days); older lines go to '> 365 Days'
+AGING_BUCKETS = [('0-30 Days', 30), ('30-90 Days', 90), ('90-180 Days', 180), ('180-365 Days', 365)]
+OLDEST_AGING_BUCKET = '> 365 Days'
+
+
+def _own_projects_only(query, project_id_column, user: Optional[models.User]):
+    """Keeps a PM's own projects (joins internal_projects); other roles see everything."""
+    if user and user.role in [UserRole.PM]:
+        query = query.join(
+            models.InternalProject, project_id_column == models.InternalProject.id
+        ).filter(models.InternalProject.project_manager_id == user.id)
+    return query
+
+
 def get_aging_analysis(db: Session,user: Optional[models.User] = None):
     """
     Groups the total remaining amount (GAP) into age buckets based on publish_date.
     """
-    
-    # Calculate GAP for each row: Line Amount - (Accepted AC + Accepted PAC)
-    # We use coalesce to handle NULLs safely
-    gap_expression = (
-        func.coalesce(models.MergedPO.line_amount_hw, 0) - 
-        (func.coalesce(models.MergedPO.accepted_ac_amount, 0) + func.coalesce(models.MergedPO.accepted_pac_amount, 0))
-    )
-    
-    # Calculate Age in Days
-    # DATEDIFF(NOW(), publish_date)
-    age_expression = func.datediff(func.now(), models.MergedPO.publish_date)
+    financial_rollup.refresh(db)
+    rollup = models.FinancialRollup
+    monthly = _own_projects_only(db.query(
+        rollup.period_year,
+        rollup.period_month,
+        func.sum(rollup.positive_gap)
+    ), rollup.internal_project_id, user).group_by(rollup.period_year, rollup.period_month).all()
+    return _aging_buckets(db, monthly, user)
 
-    # Define Buckets using CASE statement
-    bucket_expression = case(
-        (age_expression <= 30, '0-30 Days'),
-        ((age_expression > 30) & (age_expression <= 90), '30-90 Days'),
-        ((age_expression > 90) & (age_expression <= 180), '90-180 Days'),
-        ((age_expression > 180) & (age_expression <= 365), '180-365 Days'),
-        else_='> 365 Days'
-    ).label("age_bucket")
 
-    # The Query: Sum the GAP, grouped by the Bucket
-    base_query = db.query(
-        bucket_expression,
-        func.sum(gap_expression).label("total_gap")
-    ).filter(
-        # Only include rows where there IS a gap (gap > 0.01 to avoid float dust)
-        gap_expression > 0.01
-    )
-    if user and user.role in [UserRole.PM]:
-        base_query = base_query.join(models.InternalProject).filter(
-            models.InternalProject.project_manager_id == user.id
-        )
-    # ----------------------
+def _aging_buckets(db: Session, monthly_gaps, user: Optional[models.User] = None) -> list:
+    """
+    Age buckets from the rollup's positive gap per publish month [(year, month, gap)].
+
+    Age is DATEDIFF(today, publish_date). A publish month lying wholly inside one
+    bucket is taken as is; the (at most four) months a bucket boundary cuts
+    through are summed exactly from merged_pos.
+    """
+    # Publish dates on/after `start` belong to `label` (walking from youngest to oldest)
+    today = date.today()
+    bucket_starts = [(label, today - timedelta(days=max_age)) for label, max_age in AGING_BUCKETS]
+
+    def bucket_of(day: date) -> str:
+        for label, start in bucket_starts:
+            if day >= start:
+                return label
+        return OLDEST_AGING_BUCKET
 
-    results = base_query.group_by(bucket_expression).all()
+    def month_range(day: date):
+        first = day.replace(day=1)
+        return first, (first + timedelta(days=32)).replace(day=1)
 
-    # Convert to a clean list of dicts, ensuring all buckets exist even if empty
-    buckets = {
-        '0-30 Days': 0.0,
-        '30-90 Days': 0.0,
-        '90-180 Days': 0.0,
-        '180-365 Days': 0.0,
-        '> 365 Days': 0.0
+    split_months = {
+        month_range(start) for _, start in bucket_starts if start.day != 1
     }
-    
-    for row in results:
-        if row.age_bucket in buckets:
-            buckets[row.age_bucket] = row.total_gap or 0.0
+
+    buckets = {label: 0.0 for label, _ in AGING_BUCKETS}
+    buckets[OLDEST_AGING_BUCKET] = 0.0
+
+    # 1. Whole months
+    for period_year, period_month, total_gap in monthly_gaps:
+        if period_year is None or period_month is None:
+            bucket = OLDEST_AGING_BUCKET  # no publish date: DATEDIFF is NULL
+        else:
+            first_day = date(int(period_year), int(period_month), 1)
+            if month_range(first_day) in split_months:
+                continue
+            bucket = bucket_of(first_day)
+        buckets[bucket] += total_gap or 0.0
+
+    # 2. Months cut by a bucket boundary, line by line
+    if split_months:
+        mp = models.MergedPO
+        gap_expression = financial_rollup.gap_expression()
+        bucket_expression = case(
+            *[(mp.publish_date >= datetime.combine(start, datetime.min.time()), label) for label, start in bucket_starts],
+            else_=OLDEST_AGING_BUCKET
+        ).label("age_bucket")
+        in_split_months = or_(*[
+            period_filter(mp.publish_date, start_date=first, end_date=next_first - timedelta(days=1))
+            for first, next_first in sorted(split_months)
+        ])
+        results = _own_projects_only(db.query(
+            bucket_expression,
+            func.sum(gap_expression).label("total_gap")
+        ), mp.internal_project_id, user).filter(
+            in_split_months,
+            # Only include rows where there IS a gap (gap > 0.01 to avoid float dust)
+            gap_expression > financial_rollup.GAP_EPSILON
+        ).group_by(bucket_expression).all()
+
+        for row in results:
+            buckets[row.age_bucket] += row.total_gap or 0.0
 
     return [{"bucket": k, "amount": v} for k, v in buckets.items()]
+
+
+def _add(total, value):
+    """SUM() semantics: NULLs are skipped, all-NULL stays None."""
+    if value is None:
+        return total
+    return value if total is None else total + value
+
+
+def get_dashboard_bundle(db: Session, year: int, user: Optional[models.User] = None) -> dict:
+    """
+    Every home-dashboard widget (financial overview, internal projects overview,
+    category split, remaining stats, aging buckets, yearly chart of `year`) from
+    ONE grouped read of financial_rollup, pivoted in memory with the role scoping
+    of the individual /api/summary endpoints. Only the project list and the aging
+    boundary months need a query of their own.
+    """
+    financial_rollup.refresh(db)
+    rollup = models.FinancialRollup
+    project_manager_id = models.InternalProject.project_manager_id
+    dimensions = (
+        rollup.internal_project_id, project_manager_id, rollup.assignment_status, rollup.internal_control,
+        coalesce(rollup.category, "TBD"), rollup.stage, rollup.period_year, rollup.period_month,
+    )
+    rows = db.query(
+        *dimensions,
+        func.sum(rollup.po_value),
+        func.sum(rollup.ac_value),
+        func.sum(rollup.pac_value),
+        func.sum(rollup.open_lines),
+        func.sum(rollup.open_remaining),
+        func.sum(rollup.positive_gap)
+    ).outerjoin(
+        models.InternalProject, rollup.internal_project_id == models.InternalProject.id
+    ).group_by(*dimensions).all()
+
+    pm_only = bool(user and user.role in [UserRole.PM])
+    months_scoped = bool(user and user.role in [UserRole.PM, UserRole.PD])
+
+    overview = [None, None, None]        # po, ac, pac
+    canceled = None
+    project_totals = defaultdict(lambda: [None, None, None])  # (project, status) -> po, ac, pac
+    categories = {}
+    stages = {stage: [0, None] for stage in financial_rollup.STAGES}  # open lines, remaining
+    aging_months = defaultdict(lambda: None)
+    chart_months = defaultdict(lambda: [None, None, None, 0])  # month -> po, ac, pac, active
+
+    for (project_id, pm_id, assignment_status, internal_control, category, stage, period_year, period_month,
+         po, ac, pac, open_lines, open_remaining, positive_gap) in rows:
+        if internal_control == 0:
+            canceled = _add(canceled, po)
+        totals = project_totals[(project_id, assignment_status)]
+        totals[:] = [_add(totals[0], po), _add(totals[1], ac), _add(totals[2], pac)]
+
+        if period_year == year:
+            point = chart_months[period_month]
+            if assignment_status == models.AssignmentStatus.APPROVED and (not months_scoped or pm_id == user.id):
+                point[3] = 1
+            if not pm_only or pm_id == user.id:
+                point[:3] = [_add(point[0], po), _add(point[1], ac), _add(point[2], pac)]
+
+        if pm_only and pm_id != user.id:
+            continue
+        overview = [_add(overview[0], po), _add(overview[1], ac), _add(overview[2], pac)]
+        categories[category] = _add(categories.get(category), po)
+        if stage in stages:
+            stages[stage] = [stages[stage][0] + int(open_lines or 0), _add(stages[stage][1], open_remaining)]
+        aging_months[(period_year, period_month)] = _add(aging_months[(period_year, period_month)], positive_gap)
+
+    total_po_value, total_accepted_ac, total_accepted_pac = (value or 0.0 for value in overview)
+    return {
+        "year": year,
+        "financial_overview": {
+            "total_po_value": total_po_value,
+            "total_accepted_ac": total_accepted_ac,
+            "total_accepted_pac": total_accepted_pac,
+            "remaining_gap": total_po_value - (total_accepted_ac + total_accepted_pac),
+            "total_canceled": canceled or 0.0,
+        },
+        "internal_projects": _internal_project_summaries(db, [
+            (project_id, assignment_status, *totals) for (project_id, assignment_status), totals in project_totals.items()
+        ], user),
+        "value_by_category": [{"category": name, "value": value or 0} for name, value in categories.items()],
+        "remaining_stats": {stage: {"count": count, "gap": gap or 0} for stage, (count, gap) in stages.items()},
+        "aging": _aging_buckets(db, [(y, m, gap) for (y, m), gap in aging_months.items()], user),
+        "yearly_chart": _yearly_chart_points([(month, *point) for month, point in chart_months.items()]),
+    }
+
+
 def create_notification(
     db: Session, 
     recipient_id: int, 
@@ -6180,21 +6455,12 @@ def get_transactions(
     # 3. Standard Filters
     if type_filter and type_filter != "ALL":
         query = query.filter(models.Transaction.type == type_filter)
-    if start_date:
-        query = query.filter(func.date(models.Transaction.created_at) >= start_date)
-    if end_date:
-        query = query.filter(func.date(models.Transaction.created_at) <= end_date)
+    if start_date or end_date:
+        query = query.filter(period_filter(models.Transaction.created_at, start_date=start_date, end_date=end_date))
     
     if search:
-        term = f"%{search}%"
-        # Combine first and last name for full-name matching
-        full_name = func.concat(models.User.first_name, " ", models.User.last_name)
-        query = query.filter(or_(
-            models.Transaction.description.ilike(term),
-            models.User.first_name.ilike(term),
-            models.User.last_name.ilike(term),
-            full_name.ilike(term)
-        ))
+        # Description or wallet owner's name
+        query = text_search.restrict(db, query, "transaction", search, models.Transaction.id)
 
     total_items = query.count()
     transactions = query.order_by(models.Transaction.created_at.desc())\
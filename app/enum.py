@@ -203,4 +203,15 @@ class StatusReportIsdp(str, enum.Enum):
 
 class NeedDocument(str, enum.Enum):
     YES = "Yes"
-    NO = "No"
\ No newline at end of file
+    NO = "No"
+class JobType(str, enum.Enum):
+    PO_IMPORT = "PO_IMPORT"                   # PO export (optionally chained with an AC file)
+    ACCEPTANCE_IMPORT = "ACCEPTANCE_IMPORT"   # Acceptance export on its own
+    HARD_SYNC_ACCEPTANCES = "HARD_SYNC_ACCEPTANCES"  # Rebuild accepted AC/PAC from the raw history
+    DB_MAINTENANCE = "DB_MAINTENANCE"                # Set-based heal of merged_pos (services/maintenance.py)
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "QUEUED"         # Waiting for a worker (also: waiting for a retry)
+    RUNNING = "RUNNING"       # Claimed by a worker, lease active
+    SUCCEEDED = "SUCCEEDED"
+    FAILED = "FAILED"         # Handler raised after the last attempt
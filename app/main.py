@@ -12,6 +12,7 @@ from app.routers import internal_projects, projects, users, auth, selectors, sit
 from .database import engine ,SessionLocal
 from  .dependencies import get_db
 from . import crud, models, schemas
+from .services import job_queue
 import os
 from fastapi.staticfiles import StaticFiles
 from app.routers import expenses, facturation
@@ -23,18 +24,22 @@ models.Base.metadata.create_all(bind=engine, checkfirst=True)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Recover any imports that were left stuck due to a server restart
+    # Recover imports that no worker owns any more (lease-aware: imports running
+    # in other gunicorn/worker processes are left alone).
     db = SessionLocal()
     try:
-        stuck = db.query(models.UploadHistory).filter(
-            models.UploadHistory.status.in_(["PROCESSING", "WAITING"])
-        ).all()
-        if stuck:
-            for record in stuck:
-                record.status = "FAILED"
-                record.error_message = "Import interrupted by server restart."
-            db.commit()
-            logger.info(f"Startup recovery: marked {len(stuck)} stuck import(s) as FAILED.")
+        failed = job_queue.recover_orphaned_uploads(db)
+        if failed:
+            logger.info(f"Startup recovery: marked {failed} orphaned import(s) as FAILED.")
+
+        # acceptance_latest created by create_all on an existing database starts empty.
+        # Not rebuilt here: every API worker would run it at once. The migration back-fills
+        # it; otherwise the queued hard sync does (it rebuilds the table first).
+        if db.query(models.AcceptanceLatest.id).first() is None and db.query(models.RawAcceptance.id).first() is not None:
+            logger.warning(
+                "acceptance_latest is empty while raw_acceptances is not: run the acceptance hard sync "
+                "(POST /api/data/system/hard-sync-acceptances) to back-fill it."
+            )
     finally:
         db.close()
     yield
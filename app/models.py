@@ -9,7 +9,8 @@ from sqlalchemy.orm import backref # Ensure this is imported
 from .enum import (
     ProjectType, UserRole, SBCStatus, BCStatus, NotificationType, BCType,
     AssignmentStatus, ValidationState, ItemGlobalStatus, SBCType,
-    FundRequestStatus, TransactionType, TransactionStatus, ExpenseStatus, NotificationModule, InvoiceStatus,ProjectRoleType,ProjectActionType,PnLStatus
+    FundRequestStatus, TransactionType, TransactionStatus, ExpenseStatus, NotificationModule, InvoiceStatus,ProjectRoleType,ProjectActionType,PnLStatus,
+    JobType, JobStatus,
 )
 from .database import Base
  # <--- AJOUTER CET IMPORT
@@ -162,6 +163,7 @@ class Site(Base):
 
 class InternalProject(Base):
     __tablename__ = 'internal_projects'
+    __table_args__ = (sa.Index("ft_internal_projects_name", "name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),)
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), unique=True, index=True, nullable=False)
@@ -203,6 +205,7 @@ class InternalProject(Base):
 
 class CustomerProject(Base):
     __tablename__ = 'customer_projects'
+    __table_args__ = (sa.Index("ft_customer_projects_name", "name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),)
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), unique=True, index=True, nullable=False)
     
@@ -296,6 +299,9 @@ class RawPurchaseOrder(Base):
     purchase_type = Column(String(100), nullable=True)
     huawei_source = Column(Boolean, nullable=True, default=False)
 
+    # Content fingerprint of the Excel line (NULL for B2B rows); unchanged lines are not re-staged
+    row_hash = Column(String(32), nullable=True, index=True)
+
 
 class RawAcceptance(Base):
     __tablename__ = "raw_acceptances"
@@ -313,9 +319,60 @@ class RawAcceptance(Base):
     uploader_id = Column(Integer, ForeignKey("users.id"))
     uploader = relationship("User")
 
+    # Content fingerprint of the Excel line; unchanged shipments are not re-staged
+    row_hash = Column(String(32), nullable=True, index=True)
+
+    __table_args__ = (
+        # Latest row per shipment of a PO line (process_acceptances_by_ids)
+        sa.Index(
+            "ix_raw_acceptances_shipment_latest",
+            "po_no", "po_line_no", "shipment_no", "application_processed_date", "id",
+        ),
+    )
+
+
+class AcceptanceLatest(Base):
+    """
+    Latest RawAcceptance of each (po_no, po_line_no, shipment_no), maintained on
+    ingestion (crud.upsert_acceptance_latest). "Latest" = newest application date,
+    then highest raw id; an undated row counts as the newest.
+    """
+    __tablename__ = "acceptance_latest"
+    __table_args__ = (
+        sa.UniqueConstraint("po_no", "po_line_no", "shipment_no", name="uix_acceptance_latest_shipment"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    po_no = Column(String(100), nullable=False)
+    po_line_no = Column(Integer, nullable=False)
+    shipment_no = Column(Integer, nullable=False)
+    acceptance_qty = Column(Float)
+    application_processed_date = Column(DateTime)
+    raw_acceptance_id = Column(Integer, ForeignKey("raw_acceptances.id"), nullable=False)
+
 
 class MergedPO(Base):
     __tablename__ = "merged_pos"
+    # Access paths of the dashboards / lists (see test_merged_po_indexes.py)
+    __table_args__ = (
+        # Pending assignments (PM review, auto-approval); summaries read financial_rollup
+        sa.Index("ix_merged_pos_status_assigned", "assignment_status", "assignment_date"),
+        # Per-project period metrics (PO / AC / PAC), internal_control = 1 only
+        sa.Index("ix_merged_pos_project_publish", "internal_project_id", "internal_control", "publish_date"),
+        sa.Index("ix_merged_pos_project_ac", "internal_project_id", "internal_control", "date_ac_ok"),
+        sa.Index("ix_merged_pos_project_pac", "internal_project_id", "internal_control", "date_pac_ok"),
+        # Company-wide period dashboards and P&L revenue
+        sa.Index("ix_merged_pos_publish_date", "publish_date"),
+        sa.Index("ix_merged_pos_date_ac_ok", "date_ac_ok", "internal_control"),
+        sa.Index("ix_merged_pos_date_pac_ok", "date_pac_ok", "internal_control"),
+        # List filters, P&L site mapping, cancelled total
+        sa.Index("ix_merged_pos_category", "category"),
+        sa.Index("ix_merged_pos_site_code_project", "site_code", "internal_project_id"),
+        # Search boxes (services/text_search.py): merged PO lists / remaining-to-accept
+        sa.Index("ft_merged_pos_search", "po_id", "item_description", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+        sa.Index("ft_merged_pos_remaining_search", "po_no", "site_code", "item_description",
+                 mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     
     po_id = Column(String(255), unique=True, index=True)
@@ -408,6 +465,13 @@ class UploadHistory(Base):
     # Who
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     uploader = relationship("User")
+
+    # Identical re-uploads are not re-imported: status DUPLICATE + link to the first import
+    file_sha256 = Column(String(64), nullable=True, index=True)
+    duplicate_of_id = Column(Integer, ForeignKey("upload_history.id"), nullable=True)
+
+    # Live progress + per-phase timings (services/import_progress.py)
+    progress = Column(JSON, nullable=True)
 # backend/app/models.py
 
 class UserPerformanceTarget(Base):
@@ -454,6 +518,7 @@ class TaxRule(Base):
 
 class SBC(Base):
     __tablename__ = 'sbcs'
+    __table_args__ = (sa.Index("ft_sbcs_names", "short_name", "name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),)
 
     id = Column(Integer, primary_key=True, index=True)
     
@@ -508,6 +573,7 @@ class SBC(Base):
 
 class BonDeCommande(Base):
     __tablename__ = 'bon_de_commandes'
+    __table_args__ = (sa.Index("ft_bon_de_commandes_number", "bc_number", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),)
 
     id = Column(Integer, primary_key=True, index=True)
     bc_number = Column(String(100), unique=True, index=True) # BC-25-TEL-001
@@ -771,6 +837,7 @@ class FundRequestItem(Base):
 # 4. The Ledger (History of movements)
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (sa.Index("ft_transactions_description", "description", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),)
     
     id = Column(Integer, primary_key=True, index=True)
     caisse_id = Column(Integer, ForeignKey("caisses.id"), nullable=False)
@@ -1068,4 +1135,113 @@ class CategoryRule(Base):
     id = Column(Integer, primary_key=True, index=True)
     item_description = Column(String(500), nullable=False, unique=True, index=True)
     category = Column(String(100), nullable=False)
-    created_at = Column(DateTime, default=datetime.now)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.now)
+
+
+class ImportJob(Base):
+    """
+    Durable work item for the import worker pool (python -m app.worker).
+    API workers only enqueue; a worker claims a job by taking its lease, and a job
+    whose lease ran out (worker killed, deploy) is claimed again until max_attempts.
+    Besides imports, the pool runs long data maintenance jobs (e.g. the acceptance hard
+    sync); those have no UploadHistory and record their progress on the job itself.
+    """
+    __tablename__ = "import_jobs"
+    __table_args__ = (
+        sa.Index("ix_import_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(Enum(JobType), nullable=False)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    payload = Column(JSON, nullable=False)  # keyword arguments for the job handler
+
+    upload_history_id = Column(Integer, ForeignKey("upload_history.id"), nullable=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=True)  # not claimable before (retry back-off)
+
+    # Ownership: the claiming worker ("host:pid:slot") renews its lease with a heartbeat.
+    # Only a job whose lease has expired may be taken over by another worker.
+    claimed_by = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+    last_error = Column(Text, nullable=True)
+    progress = Column(JSON, nullable=True)  # maintenance jobs (ImportProgress document)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    upload_history = relationship("UploadHistory")
+
+
+class DataGeneration(Base):
+    """
+    Change counter of a table (services/data_generation.py): bumped after every
+    committed transaction that wrote it, so caches can tell in one PK read whether
+    their entries are still current.
+    """
+    __tablename__ = "data_generations"
+
+    name = Column(String(50), primary_key=True)  # table name
+    generation = Column(sa.BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
+
+class FinancialRollup(Base):
+    """
+    Pre-aggregated merged_pos measures feeding the summary dashboards
+    (services/financial_rollup.py). One row per dimension combination and month:
+    the PO value falls in its publish month, accepted AC / PAC in the month of
+    date_ac_ok / date_pac_ok (NULL month when the date is missing).
+    """
+    __tablename__ = "financial_rollup"
+    __table_args__ = (
+        sa.Index("ix_financial_rollup_project", "internal_project_id"),
+        sa.Index("ix_financial_rollup_customer_project", "customer_project_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+
+    # Dimensions
+    internal_project_id = Column(Integer, nullable=True)
+    customer_project_id = Column(Integer, nullable=True)
+    category = Column(String(100), nullable=True)
+    assignment_status = Column(Enum(AssignmentStatus), nullable=True)
+    internal_control = Column(Integer, nullable=True)
+    stage = Column(String(20), nullable=True)  # WAITING_AC / WAITING_PAC / PARTIAL_GAP
+    period_year = Column(Integer, nullable=True)
+    period_month = Column(Integer, nullable=True)
+
+    # Measures (SUMs; NULL when every summed value was NULL)
+    po_value = Column(Float, nullable=True)
+    ac_value = Column(Float, nullable=True)
+    pac_value = Column(Float, nullable=True)
+    open_lines = Column(Integer, nullable=True)    # lines with |remaining| > 0.01
+    open_remaining = Column(Float, nullable=True)  # their remaining amount
+    positive_gap = Column(Float, nullable=True)    # gap of the lines with gap > 0.01
+
+
+class FinancialRollupDirty(Base):
+    """
+    Partitions of financial_rollup (one internal project, or all of them) whose
+    merged_pos rows changed since the last refresh. Written in the same
+    transaction as the change.
+    """
+    __tablename__ = "financial_rollup_dirty"
+
+    id = Column(Integer, primary_key=True)
+    internal_project_id = Column(Integer, nullable=True)
+    full_rebuild = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+@sa.event.listens_for(Base.metadata, "before_create")
+def _fulltext_without_stopwords(target, connection, **kw):
+    # As in alembic d1f3a9c5e7b2: with the ngram parser a stopword such as "a"
+    # would drop every token containing it from the FULLTEXT indexes create_all builds
+    if connection.dialect.name == "mysql":
+        connection.exec_driver_sql("SET SESSION innodb_ft_enable_stopword = OFF")
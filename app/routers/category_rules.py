@@ -59,6 +59,19 @@ def bulk_import(
     return result
 
 
+@router.post("/reapply")
+def reapply_all_rules(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(_require_admin),
+):
+    """
+    Maintenance: re-applies every rule to the whole merged_pos table.
+    Rule edits and imports already apply rules to the rows they touch.
+    """
+    updated = crud.apply_category_rules(db)
+    return {"message": "Category rules re-applied.", "updated": updated}
+
+
 @router.get("/", response_model=schemas.PaginatedCategoryRules)
 def list_rules(
     page: int = Query(1, gt=0),
@@ -1,6 +1,6 @@
 # in app/routers/data_processing.py
 from typing import List
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 import pandas as pd
 import io
 import logging
@@ -24,6 +24,9 @@ from fastapi import BackgroundTasks # Import this
 import shutil
 import os
 from ..utils import pdf_generator 
+from ..utils.content_hash import save_upload_with_sha256
+from ..services import job_queue, maintenance, pagination
+from ..enum import JobType
 from ..utils.email import send_bc_status_email, send_email_background
 from fastapi.temp_pydantic_v1_params import Body
 
@@ -36,7 +39,6 @@ logger = logging.getLogger(__name__)
 
 @router.post("/import/purchase-orders")
 async def import_purchase_orders(
-    background_tasks: BackgroundTasks,  # <-- Add this parameter
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user),
@@ -58,20 +60,30 @@ async def import_purchase_orders(
     os.makedirs(temp_dir, exist_ok=True)
     temp_file_path = f"{temp_dir}/{history_record.id}_{file.filename}"
 
-    with open(temp_file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    file_sha256 = save_upload_with_sha256(file.file, temp_file_path)
 
-    # 3. Add the task to the background queue
-    background_tasks.add_task(
-        crud.process_po_file_background,
-        temp_file_path,
-        history_record.id,
-        current_user.id,
+    # Same file already imported: nothing to do, point the user at the earlier import
+    earlier = crud.record_upload_file_hash(db, history_record.id, file_sha256)
+    if earlier:
+        os.remove(temp_file_path)
+        return {
+            "message": f"This file was already imported (import #{earlier.id}).",
+            "history_id": history_record.id,
+            "duplicate_of_id": earlier.id,
+        }
+
+    # 3. Queue the import for the worker pool (python -m app.worker)
+    job_queue.enqueue_job(
+        db,
+        JobType.PO_IMPORT,
+        {"file_path": temp_file_path, "history_id": history_record.id, "user_id": current_user.id},
+        user_id=current_user.id,
+        upload_history_id=history_record.id,
     )
 
     # 4. Respond IMMEDIATELY
     return {
-        "message": "File uploaded. Processing started in background.",
+        "message": "File uploaded. Processing queued.",
         "history_id": history_record.id,
     }
 
@@ -104,6 +116,11 @@ def get_staging_purchase_orders(
     )
 
 
+def _merged_pos_signature(*filters) -> tuple:
+    """Cache key of a /merged-pos filter combination (shared by the lean grid)."""
+    return ("merged_pos_preview", *filters)
+
+
 @router.get(
     "/merged-pos", response_model=schemas.PaginatedMergedPO
 )  # Use a paginated schema
@@ -121,9 +138,11 @@ def get_merged_pos_preview(
     # Add pagination parameters
     page: int = Query(1, gt=0),
     per_page: int = Query(20, gt=0),
+    cursor: Optional[str] = Query(None, description="Keyset mode: empty for the first page, then next_cursor"),
 ):
     """
     Retrieves a paginated and filtered list of records from the MergedPO table.
+    With `cursor` the pages are read by keyset (constant cost at any depth).
     """
     # 1. Get the base filtered query from our new CRUD function
     query = crud.get_filtered_merged_pos(
@@ -137,11 +156,17 @@ def get_merged_pos_preview(
         search=search,
     )
 
-    # 2. Get the total count of items that match the filters (for pagination)
-    total_items = query.count()
+    # 2. Get the total count of items that match the filters (cached until merged_pos or internal_projects change)
+    signature = _merged_pos_signature(internal_project_id, customer_project_id, site_code,
+                                      category, start_date, end_date, search)
+    total_items = pagination.cached_count(db, signature, query)
 
     # 3. Apply pagination to the query
-    items = query.offset((page - 1) * per_page).limit(per_page).all()
+    next_cursor = None
+    if cursor is not None:
+        items, next_cursor = pagination.keyset_page(query, cursor, per_page)
+    else:
+        items = query.offset((page - 1) * per_page).limit(per_page).all()
 
     # 4. Return the data in a structured pagination format
     return {
@@ -150,9 +175,74 @@ def get_merged_pos_preview(
         "page": page,
         "per_page": per_page,
         "total_pages": (total_items + per_page - 1) // per_page,
+        "next_cursor": next_cursor,
     }
 
 
+@router.get("/merged-pos/grid", response_class=ORJSONResponse)
+def get_merged_pos_grid(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+    internal_project_id: Optional[int] = Query(None),
+    customer_project_id: Optional[int] = Query(None),
+    site_code: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    start_date: Optional[date] = Query(None, description="Format: YYYY-MM-DD"),
+    end_date: Optional[date] = Query(None, description="Format: YYYY-MM-DD"),
+    search: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of the grid columns (default: all)"),
+    page: int = Query(1, gt=0),
+    per_page: int = Query(20, gt=0),
+    cursor: Optional[str] = Query(None, description="Keyset mode: empty for the first page, then next_cursor"),
+):
+    """
+    Lean variant of /merged-pos for the grid: only the grid's columns, project names
+    flattened, rows as plain arrays (in `columns` order) serialized by orjson, without
+    ORM objects or response-model validation. Dates are ISO formatted.
+    """
+    columns = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(crud.MERGED_PO_GRID_COLUMNS)
+    unknown = [f for f in columns if f not in crud.MERGED_PO_GRID_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}.")
+    columns = list(dict.fromkeys(columns))
+    # The pagination position (id, publish_date) is always read, and dropped if not requested
+    selected = columns + [key for key in ("id", "publish_date") if key not in columns]
+
+    query = crud.get_filtered_merged_pos(
+        db,
+        internal_project_id=internal_project_id,
+        customer_project_id=customer_project_id,
+        site_code=site_code,
+        category=category,
+        start_date=start_date,
+        end_date=end_date,
+        search=search,
+        columns=selected,
+    )
+
+    # Same filters, same cached total as /merged-pos
+    signature = _merged_pos_signature(internal_project_id, customer_project_id, site_code,
+                                      category, start_date, end_date, search)
+    total_items = pagination.cached_count(db, signature, query)
+
+    next_cursor = None
+    if cursor is not None:
+        rows, next_cursor = pagination.keyset_page(query, cursor, per_page)
+    else:
+        rows = pagination.newest_first(query).offset((page - 1) * per_page).limit(per_page).all()
+
+    width = len(columns)
+    return ORJSONResponse({
+        "columns": columns,
+        "rows": [tuple(row)[:width] for row in rows],
+        "total_items": total_items,
+        "page": page,
+        "per_page": per_page,
+        "total_pages": (total_items + per_page - 1) // per_page,
+        "next_cursor": next_cursor,
+    })
+
+
 @router.get("/export-merged-pos", status_code=status.HTTP_200_OK)
 def export_merged_pos_report(
     db: Session = Depends(get_db),
@@ -387,6 +477,7 @@ def get_remaining_pos(
     internal_project_id: Optional[int] = None,
     customer_project_id: Optional[int] = None,
     project_manager_id: Optional[int] = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
@@ -400,6 +491,7 @@ def get_remaining_pos(
         customer_project_id,
         project_manager_id,
         user=current_user,
+        cursor=cursor,
     )
     # Note: Stats are usually global, calculating them with filters might be expensive
     # but let's keep the global stats for the cards at the top
@@ -1118,139 +1210,68 @@ def bulk_update_category(
     return {"message": f"Successfully updated {count} lines to {payload.category}."}
 
 
-@router.post("/system/hard-sync-acceptances")
-def hard_sync_all_acceptances(db: Session = Depends(get_db)):
+@router.post("/system/hard-sync-acceptances", status_code=status.HTTP_202_ACCEPTED)
+def hard_sync_all_acceptances(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
     """
-    Wipes and recalculates all Accepted AC/PAC amounts based strictly 
-    on deduplicated raw Huawei files.
+    Queues a wipe-and-recalculate of all Accepted AC/PAC amounts based strictly
+    on deduplicated raw Huawei files (app/services/acceptance_sync.py).
+    Follow it with GET /system/jobs/{job_id}.
     """
-    # 1. Reset all acceptance totals in the main table to ZERO
-    db.query(models.MergedPO).update({
-        models.MergedPO.accepted_ac_amount: 0,
-        models.MergedPO.accepted_pac_amount: 0,
-        models.MergedPO.date_ac_ok: None,
-        models.MergedPO.date_pac_ok: None
-    }, synchronize_session=False)
-    db.commit()
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only Admins can run a hard sync.")
 
-    # 2. Fetch all raw acceptances
-    raw_data = db.query(models.RawAcceptance).all()
-    if not raw_data:
-        return {"message": "No raw data to sync."}
-
-    # Convert to Pandas for easy deduplication
-    df = pd.DataFrame([{
-        "id": r.id,
-        "po_no": r.po_no,
-        "po_line_no": r.po_line_no,
-        "shipment_no": r.shipment_no,
-        "acceptance_qty": r.acceptance_qty,
-        "date": r.application_processed_date
-    } for r in raw_data])
-
-    # 3. DEDUPLICATE: Keep only the latest entry for a specific PO/Line/Shipment
-    # This completely eliminates the "Double Import" bug
-    df = df.sort_values("date").drop_duplicates(
-        subset=["po_no", "po_line_no", "shipment_no"], 
-        keep="last"
-    )
+    job = job_queue.find_active_job(db, JobType.HARD_SYNC_ACCEPTANCES)
+    if job is None:
+        job = job_queue.enqueue_job(db, JobType.HARD_SYNC_ACCEPTANCES, {}, user_id=current_user.id)
+        return {"message": "Hard Sync queued.", "job_id": job.id}
+    return {"message": "A Hard Sync is already queued or running.", "job_id": job.id}
 
-    # 4. AGGREGATE: Sum the clean quantities per PO Line
-    agg_df = df.groupby(["po_no", "po_line_no"]).agg(
-        total_qty=("acceptance_qty", "sum"),
-        max_date=("date", "max")
-    ).reset_index()
-
-    # 5. RECALCULATE AND UPDATE THE DATABASE
-    update_count = 0
-    pos = db.query(models.MergedPO).all()
-    po_map = {f"{p.po_no}-{p.po_line_no}": p for p in pos}
-
-    for _, row in agg_df.iterrows():
-        po_key = f"{row['po_no']}-{int(row['po_line_no'])}"
-        merged_po = po_map.get(po_key)
-
-        if merged_po:
-            qty = row['total_qty']
-            unit_price = merged_po.unit_price or 0.0
-            payment_term = merged_po.payment_term
-
-            # Only process if quantity is not zero
-            if qty != 0:
-                if payment_term == "AC PAC 100%":
-                    merged_po.accepted_ac_amount = qty * unit_price * 0.80
-                    merged_po.accepted_pac_amount = qty * unit_price * 0.20
-                    merged_po.date_ac_ok = row['max_date']
-                    merged_po.date_pac_ok = row['max_date']
-                
-                elif payment_term == "AC1 80 | PAC 20":
-                    # Assume Shipment 1 is AC, Shipment 2 is PAC based on your previous logic
-                    # To be perfectly accurate, we should sum shipment 1 and 2 separately, 
-                    # but since this is a global sync, we apply standard proportions:
-                    merged_po.accepted_ac_amount = qty * unit_price * 0.80
-                    merged_po.accepted_pac_amount = qty * unit_price * 0.20
-                    merged_po.date_ac_ok = row['max_date']
-                    merged_po.date_pac_ok = row['max_date']
-
-                update_count += 1
 
-    db.commit()
-    return {
-        "message": "Hard Sync Complete", 
-        "unique_raw_lines_processed": len(df),
-        "po_lines_updated": update_count
-    }
+@router.get("/system/jobs/{job_id}", response_model=schemas.BackgroundJob)
+def get_background_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Status and live progress of a maintenance job (the result is in progress["result"])."""
+    job = db.query(models.ImportJob).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
 
 
 
 @router.post("/heal-database")
 def run_db_heal(
+    operations: List[str] = Query(maintenance.DEFAULT_HEAL_OPERATIONS),
+    dry_run: bool = False,
     db: Session = Depends(get_db), 
     current_user: models.User = Depends(get_current_user)
 ):
     """
-    One-time script to fix date offsets and enforce mathematical caps 
-    across all historical records.
+    Fixes date offsets and enforces mathematical caps across all historical
+    records (operations: date_shift, cap_ac, cap_pac, tbd_categories).
+    dry_run=true answers right away with the number of rows each operation would
+    change; a real run is queued for the worker pool (GET /system/jobs/{job_id}).
     """
+    if current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only Admins can heal the database.")
     try:
-        # 1. Fix date offsets (2026-01-01 -> 2025-12-31)
-        target_date = date(2026, 1, 1)
-        fixed_date = date(2025, 12, 31)
-        
-        # Update AC dates
-        pos_ac = db.query(models.MergedPO).filter(models.MergedPO.date_ac_ok == target_date).all()
-        for po in pos_ac: po.date_ac_ok = fixed_date
-            
-        # Update PAC dates
-        pos_pac = db.query(models.MergedPO).filter(models.MergedPO.date_pac_ok == target_date).all()
-        for po in pos_pac: po.date_pac_ok = fixed_date
-
-        # 2. Enforce Mathematical Caps on all existing records
-        all_pos = db.query(models.MergedPO).all()
-        healed_count = 0
-        for po in all_pos:
-            unit_price = po.unit_price or 0
-            req_qty = po.requested_qty or 0
-            max_ac = unit_price * req_qty * 0.80
-            max_pac = unit_price * req_qty * 0.20
-
-            if po.accepted_ac_amount and po.accepted_ac_amount > max_ac:
-                po.accepted_ac_amount = max_ac
-                healed_count += 1
-            
-            if po.accepted_pac_amount and po.accepted_pac_amount > max_pac:
-                po.accepted_pac_amount = max_pac
-                healed_count += 1
-                
-        db.commit()
-        return {
-            "status": "success",
-            "dates_fixed": len(pos_ac) + len(pos_pac),
-            "amount_caps_enforced": healed_count
-        }
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
+        operations = maintenance.validate_operations(operations)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if dry_run:
+        return {"status": "dry_run", **maintenance.run_maintenance(db, operations, dry_run=True)}
+
+    job = job_queue.find_active_job(db, JobType.DB_MAINTENANCE)
+    if job is not None:
+        return {"status": "already_running", "job_id": job.id}
+    job = job_queue.enqueue_job(db, JobType.DB_MAINTENANCE, {"operations": operations}, user_id=current_user.id)
+    return {"status": "queued", "job_id": job.id}
 
 
 @router.post("/remaining-update-upload")
@@ -1,14 +1,21 @@
+import asyncio
+import json
 import os
 import shutil
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File, status
-from sqlalchemy.orm import Session
-from .. import crud, models, auth
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, object_session
+from starlette.concurrency import run_in_threadpool
+from .. import crud, models, auth, schemas
+from ..database import SessionLocal
 from ..dependencies import get_db
+from ..utils.content_hash import save_upload_with_sha256
+from ..services import job_queue
+from ..enum import JobType
 router = APIRouter(prefix="/api/import", tags=["import"])
 
 @router.post("/unified")
 async def unified_import(
-    background_tasks: BackgroundTasks,
     po_file: UploadFile = File(None),
     ac_file: UploadFile = File(None),
     db: Session = Depends(get_db),
@@ -22,6 +29,10 @@ async def unified_import(
 
     po_info = None
     ac_info = None
+    po_history_id = None
+    ac_history_id = None
+    # Identical files already imported are recorded as DUPLICATE and not processed
+    duplicates = {"po_duplicate_of_id": None, "ac_duplicate_of_id": None}
 
     # 1. Prepare PO File if exists
     if po_file:
@@ -32,48 +43,67 @@ async def unified_import(
             db=db, filename=f"[PO] {po_file.filename}", status="PROCESSING", user_id=current_user.id
         )
         po_path = f"{temp_dir}/po_{history_po.id}_{po_file.filename}"
-        with open(po_path, "wb") as buffer:
-            shutil.copyfileobj(po_file.file, buffer)
-        po_info = {"path": po_path, "history_id": history_po.id}
+        po_sha256 = save_upload_with_sha256(po_file.file, po_path)
+        duplicates["po_duplicate_of_id"] = getattr(
+            crud.record_upload_file_hash(db, history_po.id, po_sha256), "id", None
+        )
+        po_history_id = history_po.id
+        if duplicates["po_duplicate_of_id"]:
+            os.remove(po_path)
+        else:
+            po_info = {"path": po_path, "history_id": history_po.id}
 
     # 2. Prepare AC File if exists
     if ac_file:
         if not ac_file.filename.endswith((".xlsx", ".xls")):
             raise HTTPException(status_code=400, detail="Invalid Acceptance file type.")
         
-        # If PO file exists, set AC status to "WAITING" (Waiting for PO to finish)
-        initial_status = "WAITING" if po_file else "PROCESSING"
+        # If a PO import runs first, set AC status to "WAITING" (Waiting for PO to finish)
+        initial_status = "WAITING" if po_info else "PROCESSING"
         history_ac = crud.create_upload_history_record(
             db=db, filename=f"[AC] {ac_file.filename}", status=initial_status, user_id=current_user.id
         )
         ac_path = f"{temp_dir}/ac_{history_ac.id}_{ac_file.filename}"
-        with open(ac_path, "wb") as buffer:
-            shutil.copyfileobj(ac_file.file, buffer)
-        ac_info = {"path": ac_path, "history_id": history_ac.id}
+        ac_sha256 = save_upload_with_sha256(ac_file.file, ac_path)
+        duplicates["ac_duplicate_of_id"] = getattr(
+            crud.record_upload_file_hash(db, history_ac.id, ac_sha256), "id", None
+        )
+        ac_history_id = history_ac.id
+        if duplicates["ac_duplicate_of_id"]:
+            os.remove(ac_path)
+        else:
+            ac_info = {"path": ac_path, "history_id": history_ac.id}
 
-    # 3. Trigger Background Tasks
+    # 3. Queue the jobs for the worker pool (python -m app.worker)
     if po_info:
         # If we have a PO file, start it and tell it to trigger AC after it finishes
-        background_tasks.add_task(
-            crud.process_po_file_background,
-            po_info["path"],
-            po_info["history_id"],
-            current_user.id,
-            ac_info # This is the "Chain" parameter
+        job_queue.enqueue_job(
+            db,
+            JobType.PO_IMPORT,
+            {
+                "file_path": po_info["path"],
+                "history_id": po_info["history_id"],
+                "user_id": current_user.id,
+                "chained_ac_info": ac_info,  # This is the "Chain" parameter
+            },
+            user_id=current_user.id,
+            upload_history_id=po_info["history_id"],
         )
     elif ac_info:
         # Only AC file provided, start it immediately
-        background_tasks.add_task(
-            crud.process_acceptance_file_background,
-            ac_info["path"],
-            ac_info["history_id"],
-            current_user.id
+        job_queue.enqueue_job(
+            db,
+            JobType.ACCEPTANCE_IMPORT,
+            {"file_path": ac_info["path"], "history_id": ac_info["history_id"], "user_id": current_user.id},
+            user_id=current_user.id,
+            upload_history_id=ac_info["history_id"],
         )
 
     return {
-        "message": "Upload successful. Processing background tasks.",
-        "po_history_id": po_info["history_id"] if po_info else None,
-        "ac_history_id": ac_info["history_id"] if ac_info else None
+        "message": "Upload successful. Processing queued.",
+        "po_history_id": po_history_id,
+        "ac_history_id": ac_history_id,
+        **duplicates,
     }
 
 
@@ -91,4 +121,87 @@ def cancel_stuck_import(
     record.status = "FAILED"
     record.error_message = "Manually cancelled by user."
     db.commit()
-    return {"message": "Import marked as failed.", "id": history_id}
\ No newline at end of file
+    return {"message": "Import marked as failed.", "id": history_id}
+
+
+@router.get("/history/{history_id}/progress", response_model=schemas.UploadProgress)
+def get_import_progress(
+    history_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """Polling endpoint: status + current phase, rows done/total and per-phase timings."""
+    record = db.query(models.UploadHistory).get(history_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Import record not found.")
+    return record
+
+
+SSE_POLL_SECONDS = 1.0
+SSE_KEEPALIVE_SECONDS = 15.0
+
+
+def _import_exists(history_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        return db.query(models.UploadHistory.id).filter(models.UploadHistory.id == history_id).first() is not None
+    finally:
+        db.close()
+
+
+def _release_session(obj) -> None:
+    # Request-scoped sessions are only closed once the response ends: hand the
+    # connection back to the pool now rather than hold it for the whole stream
+    session = object_session(obj)
+    if session is not None:
+        session.close()
+
+
+def _read_progress(history_id: int):
+    db = SessionLocal()
+    try:
+        record = db.query(models.UploadHistory).get(history_id)
+        return schemas.UploadProgress.model_validate(record).model_dump() if record else None
+    finally:
+        db.close()
+
+
+@router.get("/history/{history_id}/progress/stream")
+async def stream_import_progress(
+    history_id: int,
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """
+    Server-Sent Events: one `progress` event whenever the record changes, then a final
+    `done` event once the import leaves PROCESSING/WAITING.
+    Holds no database connection between polls: each read uses a short session.
+    """
+    await run_in_threadpool(_release_session, current_user)
+    if not await run_in_threadpool(_import_exists, history_id):
+        raise HTTPException(status_code=404, detail="Import record not found.")
+
+    async def events():
+        last_sent = None
+        idle = 0.0
+        while True:
+            snapshot = await run_in_threadpool(_read_progress, history_id)
+            if snapshot is None:
+                return
+            payload = json.dumps(snapshot, default=str)
+            finished = snapshot["status"] not in ("PROCESSING", "WAITING")
+            if payload != last_sent:
+                yield f"event: {'done' if finished else 'progress'}\ndata: {payload}\n\n"
+                last_sent, idle = payload, 0.0
+            elif idle >= SSE_KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            if finished:
+                return
+            await asyncio.sleep(SSE_POLL_SECONDS)
+            idle += SSE_POLL_SECONDS
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
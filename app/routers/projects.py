@@ -12,6 +12,7 @@ from io import BytesIO
 from .. import crud, schemas
 from ..dependencies import get_db, get_current_user, require_admin, require_management
 from ..schemas import SiteCodeList, MergedPOSimple
+from ..services import financial_rollup
 
 router = APIRouter(
     prefix="/api/projects",  # All routes in this file will start with /api/projects
@@ -187,13 +188,15 @@ def assign_site_to_internal_project(
     # 2. GLOBAL UPDATE: Update MergedPO records
     # Set them to PENDING_APPROVAL so the PM sees them.
     # Note: We update internal_project_id so the PM knows which project it's intended for.
-    updated_rows = db.query(models.MergedPO).filter(
-        models.MergedPO.site_id == site_id
-    ).update({
-        "internal_project_id": target_project_id,
-        "assignment_status": models.AssignmentStatus.PENDING_APPROVAL,
-        "assignment_date": datetime.now()
-    }, synchronize_session=False)
+    moved_from = financial_rollup.projects_of(db, models.MergedPO.site_id == site_id)
+    with financial_rollup.scope(db, moved_from | {target_project_id}):
+        updated_rows = db.query(models.MergedPO).filter(
+            models.MergedPO.site_id == site_id
+        ).update({
+            "internal_project_id": target_project_id,
+            "assignment_status": models.AssignmentStatus.PENDING_APPROVAL,
+            "assignment_date": datetime.now()
+        }, synchronize_session=False)
     
     db.commit()
 
@@ -1,5 +1,5 @@
 # in backend/app/routers/selectors.py
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import distinct, func
 from sqlalchemy.orm import Session
 from typing import List
@@ -8,6 +8,7 @@ from .. import models, schemas, auth,crud
 from ..dependencies import get_db
 from ..enum import UserRole
 from ..dependencies import get_current_user
+from ..services import text_search
 
 
 router = APIRouter(
@@ -99,4 +100,18 @@ def get_categories_selector(
         category_list.append("TBD")
         
     # 4. Sort alphabetically
-    return sorted(category_list)
\ No newline at end of file
+    return sorted(category_list)
+@router.get("/search", response_model=List[schemas.SearchHit])
+def search_type_ahead(
+    q: str = Query(..., min_length=1, max_length=100),
+    entity: str = Query("merged_po", description="merged_po | bc | transaction"),
+    limit: int = Query(text_search.SEARCH_LIMIT, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """
+    Ranked ids of the merged POs / BCs / transactions matching `q` (type-ahead).
+    """
+    if entity not in text_search.ENTITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown entity '{entity}'.")
+    return text_search.search_ids(db, entity, q, limit=limit)
@@ -12,6 +12,7 @@ from datetime import date
 from ..models import UserRole
 from .. import models
 from ..dependencies import get_current_user
+from ..services import response_cache
 from fastapi import APIRouter, Depends, UploadFile, File, status
 router = APIRouter(
     prefix="/api/summary",
@@ -26,21 +27,26 @@ def get_financial_overview(    db: Session = Depends(get_db),
     """
     Provides a high-level financial overview of all processed POs.
     """
-    return crud.get_total_financial_summary(db, user=current_user)
+    return response_cache.cached(
+        db, "financial-overview", lambda: crud.get_total_financial_summary(db, user=current_user), user=current_user
+    )
 @router.get("/internal-projects-overview", response_model=List[schemas.ProjectFinancials])
 def get_internal_projects_overview(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user) # Add this
 ):  
     # Pass current_user to filter data
-    return crud.get_internal_projects_financial_summary(db, user=current_user)
+    return response_cache.cached(
+        db, "internal-projects-overview",
+        lambda: crud.get_internal_projects_financial_summary(db, user=current_user), user=current_user
+    )
 
 @router.get("/customer-projects-overview", response_model=List[schemas.ProjectFinancials])
 def get_customer_projects_overview(db: Session = Depends(get_db)):
     return crud.get_customer_projects_financial_summary(db=db)
 @router.get("/value-by-category")
 def get_value_by_category(db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
-    return crud.get_po_value_by_category(db=db, user=user)
+    return response_cache.cached(db, "value-by-category", lambda: crud.get_po_value_by_category(db=db, user=user), user=user)
 @router.get("/yearly-overview", response_model=schemas.FinancialSummary)
 def get_yearly_overview(year: int, db: Session = Depends(get_db),user: models.User = Depends(get_current_user)):
     # Call the new, consolidated function
@@ -62,7 +68,9 @@ def get_weekly_overview(year: int, week: int, db: Session = Depends(get_db),user
 @router.get("/yearly-chart", response_model=List[schemas.MonthlyChartData])
 def get_yearly_chart_data(year: int, db: Session = Depends(get_db),user: models.User = Depends(get_current_user)):
     """Returns correctly calculated aggregated data for each month of a year."""
-    return crud.get_yearly_chart_data(db=db, year=year,user=user)
+    return response_cache.cached(
+        db, "yearly-chart", lambda: crud.get_yearly_chart_data(db=db, year=year, user=user), user=user, params={"year": year}
+    )
 
 @router.get("/user-performance", response_model=schemas.UserPerformanceSummary)
 def get_user_performance(
@@ -82,7 +90,36 @@ def get_user_performance(
 
 @router.get("/aging-analysis")
 def get_aging_analysis_endpoint(db: Session = Depends(get_db),user: models.User = Depends(get_current_user)):
-    return crud.get_aging_analysis(db,user=user)
+    # Ages move with the calendar: the day is part of the key
+    return response_cache.cached(
+        db, "aging-analysis", lambda: crud.get_aging_analysis(db, user=user), user=user, params={"today": date.today()}
+    )
+
+
+@router.get("/bundle", response_model=schemas.DashboardBundle)
+def get_dashboard_bundle(
+    year: Optional[int] = None,
+    db: Session = Depends(get_db),
+    user: models.User = Depends(get_current_user)
+):
+    """
+    The home dashboard in one call: financial overview, internal projects overview,
+    category split, remaining stats, aging buckets and the yearly chart (`year`,
+    default: the current one), computed from a single rollup read.
+    """
+    year = year or date.today().year
+    return response_cache.cached(
+        db, "bundle", lambda: crud.get_dashboard_bundle(db, year, user=user),
+        user=user, params={"year": year, "today": date.today()}
+    )
+
+
+@router.get("/cache-stats")
+def get_cache_stats(current_user: models.User = Depends(get_current_user)):
+    """Hit / miss counters of the dashboard response cache (this API process)."""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Only Admins can view cache statistics.")
+    return response_cache.stats()
 @router.post("/planning/import")
 def import_planning_data(
     file: UploadFile = File(...),
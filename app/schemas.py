@@ -1,5 +1,5 @@
 from pydantic import Field
-from typing import Annotated, List, Optional
+from typing import Annotated, Dict, List, Optional
 from datetime import date, datetime
 from pydantic import ConfigDict, field_validator
 
@@ -284,16 +284,49 @@ class UploadHistory(UploadHistoryBase):
     id: int
     uploaded_at: datetime
     uploader: User # Nest the full user object
+    file_sha256: Optional[str] = None
+    duplicate_of_id: Optional[int] = None
+    progress: Optional[dict] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class UploadProgress(BaseModel):
+    id: int
+    status: str
+    total_rows: int
+    error_message: Optional[str] = None
+    progress: Optional[dict] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BackgroundJob(BaseModel):
+    id: int
+    job_type: str
+    status: str
+    attempts: int
+    progress: Optional[dict] = None
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SearchHit(BaseModel):
+    id: int
+    score: float
+
+
 class PaginatedMergedPO(BaseModel):
     items: List[MergedPO]
     total_items: int
     page: int
     per_page: int
     total_pages: int
+    next_cursor: Optional[str] = None  # keyset mode only; None on the last page
 
 
 
@@ -341,6 +374,28 @@ class MonthlyChartData(BaseModel):
     total_po_value: float
     total_paid: float
     
+class CategoryValue(BaseModel):
+    category: str
+    value: float
+
+class StageRemaining(BaseModel):
+    count: int
+    gap: float
+
+class AgingBucket(BaseModel):
+    bucket: str
+    amount: float
+
+class DashboardBundle(BaseModel):
+    """Every home-dashboard widget in one response (GET /api/summary/bundle)."""
+    year: int
+    financial_overview: FinancialSummary
+    internal_projects: List[ProjectFinancials]
+    value_by_category: List[CategoryValue]
+    remaining_stats: Dict[str, StageRemaining]
+    aging: List[AgingBucket]
+    yearly_chart: List[MonthlyChartData]
+
 class ProjectTargetSummary(BaseModel):
     project_name: str
     pm_name: str
@@ -0,0 +1,113 @@
+"""
+Service: vectorized AC / PAC amounts from the latest acceptance of each shipment.
+
+Whole-column equivalent of the per-row rules that process_acceptances_by_ids
+applied with iterrows():
+
+- accepted qty = max(0, min(acceptance_qty, requested_qty)); a reversal (<= 0) resets
+- acceptance date = application date, 2026-01-01 booked as 2025-12-31 (timezone fix)
+- shipment 1 → AC (80%); also PAC (20%) when the term is "AC PAC 100%"
+- shipment 2 → PAC (20%) when the term is "AC1 80 | PAC 20"
+- any other shipment / term combination leaves the amounts alone
+
+Rows are applied in the order given (later rows win), exactly like the loop.
+"""
+from datetime import date
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+AC_SHARE = 0.80
+PAC_SHARE = 0.20
+TERM_AC_PAC_100 = "AC PAC 100%"
+TERM_AC80_PAC20 = "AC1 80 | PAC 20"
+
+AMOUNT_COLUMNS: List[str] = [
+    "total_ac_amount", "accepted_ac_amount", "date_ac_ok",
+    "total_pac_amount", "accepted_pac_amount", "date_pac_ok",
+]
+
+_BOOKED_AS = {date(2026, 1, 1): date(2025, 12, 31)}
+
+
+def _numbers(series: pd.Series) -> np.ndarray:
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+
+
+def compute_acceptance_updates(latest: pd.DataFrame, merged: pd.DataFrame) -> pd.DataFrame:
+    """
+    latest: the latest acceptance per (po_no, po_line_no, shipment_no), in application order,
+            with columns po_id, shipment_no, acceptance_qty, application_processed_date.
+    merged: current MergedPO state with columns id, po_id, unit_price, requested_qty,
+            payment_term and AMOUNT_COLUMNS.
+    Returns the merged rows touched by `latest` (indexed by po_id) with AMOUNT_COLUMNS
+    updated. Values are plain objects; NULL is None.
+    """
+    result = merged[merged["po_id"].isin(latest["po_id"])].set_index("po_id", drop=False)
+    result = result[["id", "po_id"] + AMOUNT_COLUMNS].astype(object)
+    result = result.where(result.notna(), None)
+    if result.empty:
+        return result
+
+    rows = latest[["po_id", "shipment_no", "acceptance_qty", "application_processed_date"]].merge(
+        merged[["po_id", "unit_price", "requested_qty", "payment_term"]], on="po_id", how="inner"
+    )
+    n = len(rows)
+
+    # `merged_po.unit_price or 0` / `merged_po.requested_qty or 0`
+    unit_price = np.nan_to_num(_numbers(rows["unit_price"]), nan=0.0)
+    req_qty = np.nan_to_num(_numbers(rows["requested_qty"]), nan=0.0)
+    qty = _numbers(rows["acceptance_qty"])
+
+    # max(0, min(qty, req)) with Python's NaN semantics: min(nan, x) is nan, max(0, nan) is 0
+    with np.errstate(invalid="ignore"):
+        capped = np.where(req_qty < qty, req_qty, qty)
+        agg_qty = np.where(capped > 0, capped, 0.0)
+        accepted = agg_qty > 0
+        has_qty = qty > 0
+
+    processed = pd.to_datetime(rows["application_processed_date"], errors="coerce")
+    booked = np.array(
+        [_BOOKED_AS.get(d, d) for d in processed.dt.date.where(processed.notna(), None)], dtype=object
+    )
+    dates = np.where(has_qty & processed.notna().to_numpy(), booked, None)
+
+    shipment = _numbers(rows["shipment_no"])
+    term = rows["payment_term"].to_numpy(dtype=object)
+    ship_1 = shipment == 1
+    ac_pac_100 = ship_1 & (term == TERM_AC_PAC_100)
+    pac_20 = (shipment == 2) & (term == TERM_AC80_PAC20)
+    pac_rows = ac_pac_100 | pac_20
+
+    ac_set, ac_reset = ship_1 & accepted, ship_1 & ~accepted
+    pac_set, pac_reset = pac_rows & accepted, pac_rows & ~accepted
+
+    # column -> [(rows that write it, value per row)]
+    writes = {
+        "total_ac_amount": [(ac_set, unit_price * req_qty * AC_SHARE)],
+        "accepted_ac_amount": [(ac_set, unit_price * agg_qty * AC_SHARE), (ac_reset, 0.0)],
+        "date_ac_ok": [(ac_set, dates), (ac_reset, None)],
+        "total_pac_amount": [(pac_set, unit_price * req_qty * PAC_SHARE)],
+        "accepted_pac_amount": [(pac_set, unit_price * agg_qty * PAC_SHARE), (pac_reset, 0.0)],
+        "date_pac_ok": [(pac_set, dates), (pac_reset, None)],
+    }
+
+    po_ids = rows["po_id"].to_numpy(dtype=object)
+    for column, sources in writes.items():
+        values = np.empty(n, dtype=object)
+        written = np.zeros(n, dtype=bool)
+        for mask, value in sources:
+            if isinstance(value, np.ndarray):
+                values[mask] = [v.item() if isinstance(v, np.generic) else v for v in value[mask]]
+            else:
+                values[mask] = value
+            written |= mask
+        if not written.any():
+            continue
+        last = pd.DataFrame({"po_id": po_ids[written], "value": values[written]}).drop_duplicates(
+            "po_id", keep="last"
+        )
+        result.loc[last["po_id"].to_numpy(), column] = last["value"].to_numpy(dtype=object)
+
+    return result
@@ -0,0 +1,129 @@
+"""
+Service: set-based hard sync of accepted AC/PAC amounts (POST /api/data/system/hard-sync-acceptances).
+
+Runs as a HARD_SYNC_ACCEPTANCES job in the worker pool. Nothing is loaded into
+Python beyond one chunk of PO numbers at a time:
+
+1. rebuild_latest — acceptance_latest is recomputed from the whole raw history
+   with ROW_NUMBER() over (po_no, po_line_no, shipment_no)
+2. reset          — accepted amounts / dates zeroed, by merged_pos id range
+3. apply          — per chunk of PO numbers, the clean quantities are summed per
+                    PO line in the database and written with one UPDATE ... JOIN
+
+The rules are the ones the endpoint applied in Python: lines with a non-zero
+accepted quantity and an "AC PAC 100%" or "AC1 80 | PAC 20" term get
+qty * unit price * 80% / 20%, both dated with the latest application date.
+"""
+import logging
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from .. import crud, models
+from ..database import SessionLocal
+from .acceptance_amounts import AC_SHARE, PAC_SHARE, TERM_AC80_PAC20, TERM_AC_PAC_100
+from . import maintenance
+from .import_progress import ImportProgress
+
+logger = logging.getLogger(__name__)
+
+RESET_CHUNK_SIZE = 5000  # merged_pos ids per reset UPDATE
+PO_CHUNK_SIZE = 500      # distinct PO numbers per aggregate + UPDATE ... JOIN
+
+
+def _reset_accepted_amounts(db: Session, progress: ImportProgress) -> None:
+    mp = models.MergedPO
+    first_id, last_id = db.query(func.min(mp.id), func.max(mp.id)).one()
+    if first_id is None:
+        return
+    progress.set_total(last_id - first_id + 1)
+    maintenance.chunked_update(db, sa.true(), {
+        mp.accepted_ac_amount: 0,
+        mp.accepted_pac_amount: 0,
+        mp.date_ac_ok: None,
+        mp.date_pac_ok: None,
+    }, progress=progress, chunk_size=RESET_CHUNK_SIZE)
+
+
+def _apply_po_range(db: Session, after, last) -> int:
+    """Aggregates acceptance_latest for after < po_no <= last and updates the matching lines."""
+    latest = models.AcceptanceLatest
+    mp = models.MergedPO
+
+    in_range = latest.po_no <= last if after is None else and_(latest.po_no > after, latest.po_no <= last)
+    agg = (
+        sa.select(
+            latest.po_no,
+            latest.po_line_no,
+            func.coalesce(func.sum(latest.acceptance_qty), 0).label("total_qty"),
+            func.max(latest.application_processed_date).label("max_date"),
+        )
+        .where(in_range)
+        .group_by(latest.po_no, latest.po_line_no)
+        .subquery("agg")
+    )
+    matched = and_(mp.po_no == agg.c.po_no, mp.po_line_no == agg.c.po_line_no, agg.c.total_qty != 0)
+
+    lines = db.execute(sa.select(func.count()).select_from(mp).join(agg, matched)).scalar()
+
+    amount = agg.c.total_qty * func.coalesce(mp.unit_price, 0)
+    accepted_on = func.date(agg.c.max_date)
+    db.execute(
+        sa.update(mp)
+        .where(matched, mp.payment_term.in_([TERM_AC_PAC_100, TERM_AC80_PAC20]))
+        .values(
+            accepted_ac_amount=amount * AC_SHARE,
+            accepted_pac_amount=amount * PAC_SHARE,
+            date_ac_ok=accepted_on,
+            date_pac_ok=accepted_on,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return lines
+
+
+def hard_sync_acceptances(db: Session, progress: Optional[ImportProgress] = None) -> dict:
+    """Wipes and recalculates all accepted AC/PAC amounts from the raw Huawei history."""
+    progress = progress or ImportProgress(None)
+    latest = models.AcceptanceLatest
+
+    with progress.phase("rebuild_latest"):
+        unique_lines = crud.rebuild_acceptance_latest(db)
+
+    with progress.phase("reset"):
+        _reset_accepted_amounts(db, progress)
+
+    updated = 0
+    with progress.phase("apply", total=db.query(func.count(func.distinct(latest.po_no))).scalar()):
+        after = None
+        while True:
+            # Keyset walk over the PO numbers (prefix of the table's unique key)
+            page = db.query(latest.po_no).distinct().order_by(latest.po_no)
+            if after is not None:
+                page = page.filter(latest.po_no > after)
+            po_nos = [po_no for (po_no,) in page.limit(PO_CHUNK_SIZE)]
+            if not po_nos:
+                break
+            updated += _apply_po_range(db, after, po_nos[-1])
+            after = po_nos[-1]
+            progress.advance(len(po_nos))
+
+    logger.info(f"Hard sync: {unique_lines} unique acceptance lines, {updated} PO lines updated.")
+    return {
+        "message": "Hard Sync Complete",
+        "unique_raw_lines_processed": unique_lines,
+        "po_lines_updated": updated,
+    }
+
+
+def run_hard_sync_job(job_id: int) -> None:
+    """Worker entry point for a HARD_SYNC_ACCEPTANCES job; progress goes to the job row."""
+    db = SessionLocal()
+    progress = ImportProgress(job_id, model=models.ImportJob)
+    try:
+        progress.finish(hard_sync_acceptances(db, progress))
+    finally:
+        db.close()
@@ -0,0 +1,101 @@
+"""
+Service: data generation counters, a cheap "has this table changed?" check.
+
+data_generations holds one counter per tracked table. Session events note every
+write to a tracked table (unit-of-work flushes and INSERT / UPDATE / DELETE
+statements run through the session). After the commit they bump the counter
+from a short transaction of their own, so API and worker processes see the
+same value. bulk_*_mappings bypass the session events; call `mark` next to them.
+financial_rollup has no automatic tracking: `financial_rollup.refresh` marks it.
+
+Caches store the generation they read *before* computing an entry, and reuse
+the entry only while `current` still returns it. An entry computed while a
+write was committing is at worst recomputed once.
+"""
+import logging
+from datetime import datetime
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+MERGED_POS = "merged_pos"
+INTERNAL_PROJECTS = "internal_projects"
+FINANCIAL_ROLLUP = "financial_rollup"
+TRACKED_TABLES = {MERGED_POS, INTERNAL_PROJECTS}
+
+_PENDING = "data_generation_pending"  # Session.info key: tables written in the transaction
+
+
+def mark(db: Session, name: str) -> None:
+    """Records a write to `name` in the current transaction (bumped on commit)."""
+    db.info.setdefault(_PENDING, set()).add(name)
+
+
+def current(db: Session, name: str) -> int:
+    generation = db.query(models.DataGeneration.generation).filter(
+        models.DataGeneration.name == name
+    ).scalar()
+    return generation or 0
+
+
+def generations(db: Session, names) -> tuple:
+    """`current` of several tables in one query, in the order of `names`."""
+    table = models.DataGeneration
+    found = dict(db.query(table.name, table.generation).filter(table.name.in_(list(names))).all())
+    return tuple(found.get(name) or 0 for name in names)
+
+
+def _bump(engine, names) -> None:
+    table = models.DataGeneration.__table__
+    with engine.begin() as conn:
+        for name in sorted(names):
+            updated = conn.execute(
+                sa.update(table)
+                .where(table.c.name == name)
+                .values(generation=table.c.generation + 1, updated_at=datetime.utcnow())
+            ).rowcount
+            if not updated:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(sa.insert(table).values(name=name, generation=1, updated_at=datetime.utcnow()))
+                except IntegrityError:
+                    pass  # created by a concurrent bump, which counts as one
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flushed_writes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        name = getattr(getattr(obj, "__table__", None), "name", None)
+        if name in TRACKED_TABLES:
+            mark(session, name)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_statement_writes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if getattr(table, "name", None) in TRACKED_TABLES:
+            mark(orm_execute_state.session, table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_writes(session):
+    names = session.info.pop(_PENDING, None)
+    if not names:
+        return
+    try:
+        _bump(session.get_bind().engine, names)
+    except Exception:
+        # Never fail the (already committed) write; caches catch up at the next bump
+        logger.exception(f"Could not bump data generation of {', '.join(sorted(names))}.")
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(session):
+    session.info.pop(_PENDING, None)
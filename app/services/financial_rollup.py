@@ -0,0 +1,275 @@
+"""
+Service: financial_rollup, the pre-aggregated merged_pos behind /api/summary/*.
+
+The summary dashboards used to re-aggregate the whole merged_pos table on every
+hit. They now sum financial_rollup, one row per
+
+    internal project, customer project, category, assignment_status,
+    internal_control, remaining stage, year, month
+
+holding the PO value by publish month and the accepted AC / PAC by the month of
+their own acceptance date. The PM is not a column: PM filters join
+internal_projects at read time, so a project changing PM needs no refresh.
+
+The table is partitioned by internal project. Writes to merged_pos record the
+partitions they touched in financial_rollup_dirty, in their own transaction:
+
+- unit-of-work flushes of MergedPO objects: automatic (old and new project)
+- UPDATE / DELETE statements: inside `scope(db, project_ids)` the listed
+  partitions; outside any scope the whole table (safe default for maintenance
+  and hard syncs)
+- bulk_*_mappings and text() statements fire no statement event: call
+  `mark_projects` next to them
+
+`refresh` rebuilds the dirty partitions from merged_pos and clears the markers
+it consumed. Refreshes are serialized by a lock (GET_LOCK on MySQL) that is
+never waited for: whoever finds it taken serves the current rollup. The summary
+readers only fold dirty partitions; a whole-table rebuild is left to the worker,
+which refreshes after each job and on its idle polls.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Optional, Set
+
+import sqlalchemy as sa
+from sqlalchemy import and_, case, event, func, or_
+from sqlalchemy.orm import Session, attributes
+
+from .. import models
+from . import data_generation
+
+logger = logging.getLogger(__name__)
+
+GAP_EPSILON = 0.01      # float dust below which a line counts as settled
+PARTITION_CHUNK = 200   # internal projects rebuilt per DELETE + INSERT ... SELECT
+
+WAITING_AC, WAITING_PAC, PARTIAL_GAP = "WAITING_AC", "WAITING_PAC", "PARTIAL_GAP"
+STAGES = [WAITING_AC, WAITING_PAC, PARTIAL_GAP]
+
+_MARKED = "financial_rollup_marked"  # Session.info key: partitions marked in the transaction
+_SCOPES = "financial_rollup_scopes"  # Session.info key: depth of active `scope` blocks
+_ALL = "all"
+
+LOCK_NAME = "po_app_financial_rollup_refresh"
+_process_lock = threading.Lock()  # stands in for GET_LOCK on databases without it
+
+DIMENSIONS = [
+    "internal_project_id", "customer_project_id", "category",
+    "assignment_status", "internal_control", "stage",
+]
+MEASURES = ["po_value", "ac_value", "pac_value", "open_lines", "open_remaining", "positive_gap"]
+
+
+# --- Row-level expressions (shared with the readers that still need merged_pos) ---
+
+def remaining_expression():
+    """Line amount minus accepted AC + PAC (NULL when the line amount is NULL)."""
+    mp = models.MergedPO
+    return mp.line_amount_hw - (func.coalesce(mp.accepted_ac_amount, 0) + func.coalesce(mp.accepted_pac_amount, 0))
+
+
+def gap_expression():
+    """Remaining amount with a missing line amount counted as 0."""
+    mp = models.MergedPO
+    return func.coalesce(mp.line_amount_hw, 0) - (
+        func.coalesce(mp.accepted_ac_amount, 0) + func.coalesce(mp.accepted_pac_amount, 0)
+    )
+
+
+def stage_expression():
+    mp = models.MergedPO
+    return case(
+        (mp.date_ac_ok.is_(None), WAITING_AC),
+        (and_(mp.date_ac_ok.isnot(None), mp.date_pac_ok.is_(None)), WAITING_PAC),
+        else_=PARTIAL_GAP,
+    )
+
+
+# --- Build ---
+
+def _facts(condition):
+    """merged_pos rows matching `condition`, projected once per measure date."""
+    mp = models.MergedPO
+    remaining, gap = remaining_expression(), gap_expression()
+    is_open = func.abs(remaining) > GAP_EPSILON
+    dimensions = [
+        mp.internal_project_id, mp.customer_project_id, mp.category,
+        mp.assignment_status, mp.internal_control, stage_expression().label("stage"),
+    ]
+
+    def projection(date_column, po=None, ac=None, pac=None, open_lines=None, open_remaining=None, positive_gap=None):
+        measures = dict(po_value=po, ac_value=ac, pac_value=pac, open_lines=open_lines,
+                        open_remaining=open_remaining, positive_gap=positive_gap)
+        return sa.select(
+            *dimensions,
+            sa.extract("year", date_column).label("period_year"),
+            sa.extract("month", date_column).label("period_month"),
+            *[(sa.null() if value is None else value).label(name) for name, value in measures.items()],
+        ).where(condition)
+
+    return sa.union_all(
+        projection(
+            mp.publish_date,
+            po=mp.line_amount_hw,
+            open_lines=case((is_open, 1), else_=0),
+            open_remaining=case((is_open, remaining)),
+            positive_gap=case((gap > GAP_EPSILON, gap)),
+        ),
+        # Every line, amount or not: a month with an acceptance date counts as active
+        projection(mp.date_ac_ok, ac=mp.accepted_ac_amount),
+        projection(mp.date_pac_ok, pac=mp.accepted_pac_amount),
+    ).subquery("facts")
+
+
+def _insert_rollup(condition):
+    facts = _facts(condition)
+    keys = [facts.c[name] for name in DIMENSIONS + ["period_year", "period_month"]]
+    grouped = sa.select(*keys, *[func.sum(facts.c[name]).label(name) for name in MEASURES]).group_by(*keys)
+    table = models.FinancialRollup.__table__
+    return sa.insert(table).from_select(DIMENSIONS + ["period_year", "period_month"] + MEASURES, grouped)
+
+
+def _in_partitions(column, project_ids: Set[Optional[int]]):
+    known = sorted(pid for pid in project_ids if pid is not None)
+    clauses = [column.in_(known)] if known else []
+    if None in project_ids:
+        clauses.append(column.is_(None))
+    return or_(*clauses)
+
+
+@contextmanager
+def _refresh_lock(db: Session):
+    """Yields whether the refresh lock was taken, without waiting for it."""
+    engine = db.get_bind().engine
+    if engine.dialect.name != "mysql":
+        acquired = _process_lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _process_lock.release()
+        return
+
+    # A connection of its own: the session hands its connection back on commit
+    with engine.connect() as conn:
+        acquired = conn.execute(sa.text("SELECT GET_LOCK(:name, 0)"), {"name": LOCK_NAME}).scalar() == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(sa.text("SELECT RELEASE_LOCK(:name)"), {"name": LOCK_NAME})
+
+
+def refresh(db: Session, rebuild_all: bool = False) -> bool:
+    """
+    Rebuilds the dirty partitions and commits. Returns False when nothing was refreshed:
+    nothing dirty, another process refreshing, or a whole-table rebuild pending
+    without `rebuild_all` (the worker's job; readers keep serving the current rollup).
+    """
+    dirty = models.FinancialRollupDirty
+    if db.query(dirty.id).first() is None:
+        return False
+
+    with _refresh_lock(db) as acquired:
+        if not acquired:
+            return False
+        markers = db.query(dirty.id, dirty.internal_project_id, dirty.full_rebuild).all()
+        if not markers:
+            return False
+        full = any(marker.full_rebuild for marker in markers)
+        if full and not rebuild_all:
+            return False
+
+        table = models.FinancialRollup.__table__
+        mp = models.MergedPO
+        if full:
+            db.execute(sa.delete(table))
+            db.execute(_insert_rollup(sa.true()))
+        else:
+            project_ids = sorted({marker.internal_project_id for marker in markers}, key=lambda pid: (pid is not None, pid))
+            for start in range(0, len(project_ids), PARTITION_CHUNK):
+                chunk = set(project_ids[start:start + PARTITION_CHUNK])
+                db.execute(sa.delete(table).where(_in_partitions(table.c.internal_project_id, chunk)))
+                db.execute(_insert_rollup(_in_partitions(mp.internal_project_id, chunk)))
+
+        # Markers added meanwhile stay for the next refresh
+        marker_ids = [marker.id for marker in markers]
+        for start in range(0, len(marker_ids), PARTITION_CHUNK):
+            db.execute(sa.delete(dirty.__table__).where(dirty.id.in_(marker_ids[start:start + PARTITION_CHUNK])))
+        # Cached responses read from the rollup are stale from here on
+        data_generation.mark(db, data_generation.FINANCIAL_ROLLUP)
+        db.commit()
+    logger.info(f"Financial rollup refreshed ({len(markers)} dirty markers).")
+    return True
+
+
+# --- Change tracking ---
+
+def _record(session: Session, project_ids: Iterable[Optional[int]] = (), full: bool = False) -> None:
+    marked = session.info.setdefault(_MARKED, set())
+    if _ALL in marked:
+        return
+    rows = [{"internal_project_id": None, "full_rebuild": True}] if full else [
+        {"internal_project_id": pid, "full_rebuild": False} for pid in set(project_ids) - marked
+    ]
+    if not rows:
+        return
+    session.connection().execute(sa.insert(models.FinancialRollupDirty.__table__), rows)
+    marked.update([_ALL] if full else [row["internal_project_id"] for row in rows])
+
+
+def mark_projects(db: Session, project_ids: Iterable[Optional[int]]) -> None:
+    """Marks the partitions of `project_ids` (None = unassigned lines) dirty in this transaction."""
+    _record(db, project_ids)
+
+
+def mark_all(db: Session) -> None:
+    _record(db, full=True)
+
+
+def projects_of(db: Session, *criteria) -> Set[Optional[int]]:
+    """Internal projects currently holding the merged_pos rows matching `criteria`."""
+    mp = models.MergedPO
+    return {pid for (pid,) in db.query(mp.internal_project_id).filter(*criteria).distinct()}
+
+
+@contextmanager
+def scope(db: Session, project_ids: Iterable[Optional[int]]):
+    """
+    Declares that the merged_pos statements run inside only move rows between /
+    within `project_ids`: those partitions are marked instead of the whole table.
+    """
+    mark_projects(db, project_ids)
+    db.info[_SCOPES] = db.info.get(_SCOPES, 0) + 1
+    try:
+        yield
+    finally:
+        db.info[_SCOPES] -= 1
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flushed_pos(session, flush_context):
+    project_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, models.MergedPO):
+            history = attributes.get_history(obj, "internal_project_id")
+            project_ids.update(history.deleted)
+            project_ids.add(obj.internal_project_id)
+    if project_ids:
+        _record(session, project_ids)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_statement_writes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        session = orm_execute_state.session
+        if getattr(table, "name", None) == models.MergedPO.__tablename__ and not session.info.get(_SCOPES):
+            mark_all(session)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_marked(session):
+    session.info.pop(_MARKED, None)
@@ -0,0 +1,128 @@
+"""
+Service: live progress + per-phase timing of an import, stored on UploadHistory.progress.
+
+    progress = ImportProgress(history_id)
+    with progress.phase("merge", total=len(ids)):
+        ...
+        progress.advance(len(chunk))
+    progress.finish()
+
+Stored document (also the permanent timing record of the import):
+    {
+      "phase": "merge", "done": 4000, "total": 12000,      # current phase
+      "phases": {"stage_raw": {"ms": 8123, "done": 12000, "total": 12000}, ...},
+      "elapsed_ms": 9876, "finished": false, "updated_at": "2026-...Z"
+    }
+
+Writes go through their own short session, so they are visible to the polling /
+SSE endpoints immediately and never touch the import's own transaction.
+Row-count updates are throttled; phase boundaries are always written.
+ImportProgress(None) times phases but writes nothing.
+ImportProgress(job_id, model=models.ImportJob) records on a maintenance job instead;
+finish(result) adds the job's summary as "result".
+
+Phase and chunk boundaries are also where a queued job stops once its worker has
+lost the lease (job_queue.check_lease raises LeaseLost).
+"""
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+from .. import models
+from ..database import SessionLocal
+from . import job_queue
+
+logger = logging.getLogger(__name__)
+
+MIN_WRITE_INTERVAL = 1.0  # seconds between two row-count writes
+
+
+class ImportProgress:
+    def __init__(self, history_id: Optional[int], model=models.UploadHistory):
+        self.history_id = history_id
+        self.model = model
+        self.started = time.perf_counter()
+        self.current: Optional[str] = None
+        self.phases: dict = {}
+        self.finished = False
+        self.result: Optional[dict] = None
+        self._last_write = 0.0
+
+    @contextmanager
+    def phase(self, name: str, total: Optional[int] = None):
+        """
+        Makes `name` the current phase and adds its wall time to phases[name]["ms"].
+        Re-entering a phase accumulates (e.g. category rules applied per merge chunk);
+        a nested phase hands the current-phase label back to its parent on exit.
+        """
+        job_queue.check_lease()
+        parent = self.current
+        entry = self.phases.setdefault(name, {"ms": 0, "done": 0, "total": None})
+        if total is not None:
+            entry["total"] = (entry["total"] or 0) + total
+        self.current = name
+        self._write(force=True)
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            entry["ms"] += int((time.perf_counter() - start) * 1000)
+            self.current = parent
+            self._write(force=True)
+
+    def advance(self, rows: int) -> None:
+        """Adds `rows` to the current phase's done counter."""
+        job_queue.check_lease()
+        if self.current is None:
+            return
+        self.phases[self.current]["done"] += rows
+        self._write()
+
+    def set_total(self, total: int) -> None:
+        if self.current is not None:
+            self.phases[self.current]["total"] = total
+            self._write()
+
+    def finish(self, result: Optional[dict] = None) -> None:
+        self.finished = True
+        self.result = result
+        self.current = None
+        self._write(force=True)
+
+    def as_dict(self) -> dict:
+        current = self.phases.get(self.current, {}) if self.current else {}
+        document = {
+            "phase": self.current or ("done" if self.finished else None),
+            "done": current.get("done"),
+            "total": current.get("total"),
+            "phases": {name: dict(entry) for name, entry in self.phases.items()},
+            "elapsed_ms": int((time.perf_counter() - self.started) * 1000),
+            "finished": self.finished,
+            "updated_at": datetime.utcnow().isoformat() + "Z",
+        }
+        if self.result is not None:
+            document["result"] = self.result
+        return document
+
+    def _write(self, force: bool = False) -> None:
+        if self.history_id is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_write < MIN_WRITE_INTERVAL:
+            return
+        self._last_write = now
+
+        db = SessionLocal()
+        try:
+            db.query(self.model).filter(self.model.id == self.history_id).update(
+                {self.model.progress: self.as_dict()}, synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            # Progress is best effort; never fail an import because of it
+            logger.warning(f"Could not record progress for import {self.history_id}.", exc_info=True)
+            db.rollback()
+        finally:
+            db.close()
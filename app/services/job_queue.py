@@ -0,0 +1,279 @@
+"""
+Service: DB-backed import job queue.
+
+The API only enqueues (`enqueue_job`); the worker pool in `app/worker.py`
+claims, runs and settles jobs. Every state change is a row update in
+`import_jobs`, so queued and interrupted work survives restarts and deploys.
+
+Job lifecycle:
+    QUEUED --claim--> RUNNING --handler ok--> SUCCEEDED
+                         |--handler raised--> QUEUED (back-off) ... FAILED after max_attempts
+                         |--lease expired (worker died)--> claimed again ... FAILED after max_attempts
+
+Claims use SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers never
+take the same job and never wait on each other's row locks.
+
+Ownership: a claim records the worker id (`claimed_by`) and a short lease that
+the worker renews with `renew_lease` while the handler runs. Heartbeats and
+settling are conditional on still owning the job, so a worker that lost its
+lease can never overwrite the state written by the worker that took over.
+The handler itself stops too: the worker runs it inside `lease(lost)`, and
+`check_lease` (called by ImportProgress at every phase and chunk) raises
+LeaseLost once the heartbeat has found the job owned by someone else.
+
+Handlers raise on failure. The uploaded files a job reads stay on disk until
+the job is settled for good (SUCCEEDED or FAILED), so every retry finds them.
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Optional, Set
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from ..enum import JobStatus, JobType
+
+logger = logging.getLogger(__name__)
+
+RETRY_BACKOFF_SECONDS = 30  # multiplied by the attempt number
+
+_running = threading.local()  # .lease_lost: Event of the job run by this thread
+
+
+class LeaseLost(Exception):
+    """The worker running the job no longer owns it; another worker has taken over."""
+
+
+@contextmanager
+def lease(lost: threading.Event):
+    """Runs a job handler under a lease: `check_lease` raises once `lost` is set."""
+    _running.lease_lost = lost
+    try:
+        yield
+    finally:
+        _running.lease_lost = None
+
+
+def check_lease() -> None:
+    """Raises LeaseLost if the job run by this thread was taken over. No-op outside a job."""
+    lost = getattr(_running, "lease_lost", None)
+    if lost is not None and lost.is_set():
+        raise LeaseLost("Lease lost to another worker; stopping.")
+
+
+def enqueue_job(
+    db: Session,
+    job_type: JobType,
+    payload: dict,
+    user_id: Optional[int] = None,
+    upload_history_id: Optional[int] = None,
+) -> models.ImportJob:
+    job = models.ImportJob(
+        job_type=job_type,
+        status=JobStatus.QUEUED,
+        payload=payload,
+        user_id=user_id,
+        upload_history_id=upload_history_id,
+        max_attempts=settings.import_job_max_attempts,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def find_active_job(db: Session, job_type: JobType) -> Optional[models.ImportJob]:
+    """The QUEUED or RUNNING job of this type, if any (maintenance jobs run one at a time)."""
+    return db.query(models.ImportJob).filter(
+        models.ImportJob.job_type == job_type,
+        models.ImportJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+    ).order_by(models.ImportJob.id).first()
+
+
+def _job_history_ids(job: models.ImportJob) -> List[int]:
+    """The job's own UploadHistory plus the acceptance import chained behind a PO import."""
+    chained = (job.payload or {}).get("chained_ac_info") or {}
+    return [h for h in (job.upload_history_id, chained.get("history_id")) if h]
+
+
+def _job_files(job: models.ImportJob) -> List[str]:
+    """The uploaded files the job reads: its own and the chained acceptance file."""
+    payload = job.payload or {}
+    chained = payload.get("chained_ac_info") or {}
+    return [path for path in (payload.get("file_path"), chained.get("path")) if path]
+
+
+def _discard_files(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            logger.exception(f"Could not delete import file {path}.")
+
+
+def _mark_history(db: Session, history_id: Optional[int], status: str, message: Optional[str] = None) -> None:
+    if not history_id:
+        return
+    history = db.query(models.UploadHistory).get(history_id)
+    if history and history.status not in ("SUCCESS", "DUPLICATE"):
+        history.status = status
+        if message:
+            history.error_message = message[:500]
+
+
+def _fail_histories(db: Session, job: models.ImportJob, message: str) -> None:
+    own = db.query(models.UploadHistory).get(job.upload_history_id) if job.upload_history_id else None
+    own_succeeded = own is not None and own.status == "SUCCESS"
+    _mark_history(db, job.upload_history_id, "FAILED", message)
+    chained = (job.payload or {}).get("chained_ac_info") or {}
+    if chained.get("history_id"):
+        # The chained acceptance import only ran if the PO import went through
+        chained_message = message if own_succeeded else "Cancelled because the prerequisite PO import failed."
+        _mark_history(db, chained["history_id"], "FAILED", chained_message)
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[models.ImportJob]:
+    """
+    Takes the oldest claimable job: QUEUED and due, or RUNNING with an expired lease.
+    A job that already used all its attempts is settled as FAILED instead of run again.
+    Returns the claimed (RUNNING) job, or None when there is nothing to do.
+    """
+    Job = models.ImportJob
+    while True:
+        now = datetime.utcnow()
+        job = (
+            db.query(Job)
+            .filter(or_(
+                and_(Job.status == JobStatus.QUEUED, or_(Job.run_after.is_(None), Job.run_after <= now)),
+                and_(Job.status == JobStatus.RUNNING, Job.lease_expires_at < now),
+            ))
+            .order_by(Job.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            db.commit()  # release the (empty) locking read
+            return None
+
+        if job.status == JobStatus.RUNNING:
+            logger.warning(f"Job {job.id}: lease of {job.claimed_by} expired, reclaiming.")
+            if job.attempts >= job.max_attempts:
+                job.status = JobStatus.FAILED
+                job.finished_at = now
+                job.last_error = f"Interrupted {job.attempts} time(s); giving up."
+                _fail_histories(db, job, "Import interrupted repeatedly; giving up.")
+                files = _job_files(job)
+                db.commit()
+                _discard_files(files)
+                continue
+
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.claimed_by = worker_id
+        job.heartbeat_at = now
+        job.lease_expires_at = now + timedelta(seconds=settings.import_job_lease_seconds)
+        job.started_at = now
+        # A resumed import shows its spinner again
+        _mark_history(db, job.upload_history_id, "PROCESSING")
+        db.commit()
+        db.refresh(job)
+        return job
+
+
+def renew_lease(db: Session, job_id: int, worker_id: str) -> bool:
+    """Heartbeat. Returns False if `worker_id` no longer owns the job (lease lost to another worker)."""
+    now = datetime.utcnow()
+    renewed = db.query(models.ImportJob).filter(
+        models.ImportJob.id == job_id,
+        models.ImportJob.claimed_by == worker_id,
+        models.ImportJob.status == JobStatus.RUNNING,
+    ).update({
+        models.ImportJob.heartbeat_at: now,
+        models.ImportJob.lease_expires_at: now + timedelta(seconds=settings.import_job_lease_seconds),
+    }, synchronize_session=False)
+    db.commit()
+    return renewed == 1
+
+
+def _owned_job(db: Session, job_id: int, worker_id: str) -> Optional[models.ImportJob]:
+    job = db.query(models.ImportJob).filter(
+        models.ImportJob.id == job_id,
+        models.ImportJob.claimed_by == worker_id,
+        models.ImportJob.status == JobStatus.RUNNING,
+    ).with_for_update().first()
+    if job is None:
+        logger.warning(f"Job {job_id}: {worker_id} no longer owns it; leaving its state alone.")
+        db.commit()
+    return job
+
+
+def complete_job(db: Session, job_id: int, worker_id: str) -> None:
+    job = _owned_job(db, job_id, worker_id)
+    if job is None:
+        return
+    job.status = JobStatus.SUCCEEDED
+    job.finished_at = datetime.utcnow()
+    job.lease_expires_at = None
+    files = _job_files(job)
+    db.commit()
+    _discard_files(files)
+
+
+def fail_job(db: Session, job_id: int, worker_id: str, error: str, message: Optional[str] = None) -> None:
+    """
+    Schedules a retry with linear back-off, or settles the job as FAILED after the last attempt.
+    `error` (traceback included) goes on the job; `message` on the upload histories.
+    """
+    job = _owned_job(db, job_id, worker_id)
+    if job is None:
+        return
+    now = datetime.utcnow()
+    job.last_error = error[:2000]
+    job.lease_expires_at = None
+    files = []
+    if job.attempts < job.max_attempts:
+        job.status = JobStatus.QUEUED
+        job.run_after = now + timedelta(seconds=RETRY_BACKOFF_SECONDS * job.attempts)
+    else:
+        job.status = JobStatus.FAILED
+        job.finished_at = now
+        _fail_histories(db, job, message or error)
+        files = _job_files(job)
+    db.commit()
+    _discard_files(files)
+
+
+def active_upload_history_ids(db: Session) -> Set[int]:
+    """UploadHistory ids still owned by a QUEUED or RUNNING job (chained acceptance imports included)."""
+    jobs = db.query(models.ImportJob).filter(
+        models.ImportJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+    ).all()
+    return {history_id for job in jobs for history_id in _job_history_ids(job)}
+
+
+def recover_orphaned_uploads(db: Session) -> int:
+    """
+    Marks as FAILED the PROCESSING/WAITING uploads that nothing will ever finish:
+    no QUEUED/RUNNING job owns them, and they are older than the grace period an
+    upload needs to get its job enqueued.
+    Running imports are never touched here, whichever process runs them: a job
+    whose owner died is taken over by a worker once its lease has expired.
+    Returns the number of records failed.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.import_upload_grace_seconds)
+    orphans = db.query(models.UploadHistory).filter(
+        models.UploadHistory.status.in_(["PROCESSING", "WAITING"]),
+        models.UploadHistory.uploaded_at < cutoff,
+        models.UploadHistory.id.notin_(active_upload_history_ids(db)),
+    ).all()
+    for record in orphans:
+        record.status = "FAILED"
+        record.error_message = "Import interrupted and no worker owns it any more."
+    db.commit()
+    return len(orphans)
@@ -0,0 +1,182 @@
+"""
+Service: set-based data maintenance on merged_pos (POST /api/data/heal-database).
+
+Every fix is one WHERE predicate plus its SET values, applied by `chunked_update`
+as a series of UPDATE statements over merged_pos id ranges (each committed), so a
+full production table is healed without loading a single row into Python.
+
+Operations (OPERATIONS):
+    date_shift      date_ac_ok / date_pac_ok 2026-01-01 -> 2025-12-31 (timezone fix)
+    cap_ac          accepted_ac_amount capped at 80% of unit price x requested qty
+    cap_pac         accepted_pac_amount capped at 20% of unit price x requested qty
+    tbd_categories  TBD / empty categories re-derived from the item description
+
+dry_run=True only counts the rows each operation would change.
+Real runs are queued as DB_MAINTENANCE jobs for the worker pool (run_maintenance_job).
+"""
+import logging
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy import and_, func, or_
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal
+from ..utils.category_classifier import category_case
+from .acceptance_amounts import AC_SHARE, PAC_SHARE
+from .import_progress import ImportProgress
+
+logger = logging.getLogger(__name__)
+
+UPDATE_CHUNK_SIZE = 5000  # merged_pos ids per UPDATE
+
+SHIFTED_DATE = date(2026, 1, 1)
+BOOKED_DATE = date(2025, 12, 31)
+
+OPERATIONS = ["date_shift", "cap_ac", "cap_pac", "tbd_categories"]
+DEFAULT_HEAL_OPERATIONS = ["date_shift", "cap_ac", "cap_pac"]
+
+
+def chunked_update(
+    db: Session,
+    predicate,
+    values: dict,
+    progress: Optional[ImportProgress] = None,
+    dry_run: bool = False,
+    chunk_size: int = UPDATE_CHUNK_SIZE,
+) -> int:
+    """
+    UPDATE merged_pos SET `values` WHERE `predicate`, one id range at a time.
+    Returns the number of rows updated (or, with dry_run, that would be).
+    """
+    mp = models.MergedPO
+    if dry_run:
+        return db.query(func.count(mp.id)).filter(predicate).scalar()
+
+    first_id, last_id = db.query(func.min(mp.id), func.max(mp.id)).one()
+    if first_id is None:
+        return 0
+    updated = 0
+    for start in range(first_id, last_id + 1, chunk_size):
+        result = db.execute(
+            sa.update(mp)
+            .where(mp.id >= start, mp.id < start + chunk_size, predicate)
+            .values(values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        updated += result.rowcount
+        if progress is not None:
+            progress.advance(min(chunk_size, last_id + 1 - start))
+    return updated
+
+
+def _line_value(share: float):
+    mp = models.MergedPO
+    return func.coalesce(mp.unit_price, 0) * func.coalesce(mp.requested_qty, 0) * share
+
+
+def _amount_cap(column, share: float) -> List[tuple]:
+    # Zero / NULL amounts are left alone, as the Python heal did
+    cap = _line_value(share)
+    return [(and_(column.isnot(None), column != 0, column > cap), {column: cap})]
+
+
+def tbd_category_predicate():
+    category = models.MergedPO.category
+    return or_(category.is_(None), category == "", category == "TBD")
+
+
+def _fixes(operation: str) -> List[tuple]:
+    """(predicate, values) pairs making up one operation."""
+    mp = models.MergedPO
+    if operation == "date_shift":
+        return [
+            (mp.date_ac_ok == SHIFTED_DATE, {mp.date_ac_ok: BOOKED_DATE}),
+            (mp.date_pac_ok == SHIFTED_DATE, {mp.date_pac_ok: BOOKED_DATE}),
+        ]
+    if operation == "cap_ac":
+        return _amount_cap(mp.accepted_ac_amount, AC_SHARE)
+    if operation == "cap_pac":
+        return _amount_cap(mp.accepted_pac_amount, PAC_SHARE)
+    if operation == "tbd_categories":
+        derived = category_case(mp.item_description)
+        # Only rows whose category actually changes (NULL / "" become "TBD")
+        return [(and_(tbd_category_predicate(), or_(mp.category.is_(None), mp.category != derived)),
+                 {mp.category: derived})]
+    raise ValueError(f"Unknown maintenance operation '{operation}'.")
+
+
+def validate_operations(operations: Iterable[str]) -> List[str]:
+    operations = list(dict.fromkeys(operations))  # de-duplicated, order kept
+    unknown = [op for op in operations if op not in OPERATIONS]
+    if unknown:
+        raise ValueError(f"Unknown maintenance operation(s): {', '.join(unknown)}. Known: {', '.join(OPERATIONS)}.")
+    return operations
+
+
+def run_maintenance(
+    db: Session,
+    operations: Iterable[str],
+    dry_run: bool = False,
+    progress: Optional[ImportProgress] = None,
+) -> Dict[str, int]:
+    """Runs (or counts) the given operations in order. Returns {operation: rows}."""
+    progress = progress or ImportProgress(None)
+    first_id, last_id = db.query(func.min(models.MergedPO.id), func.max(models.MergedPO.id)).one()
+    id_span = 0 if dry_run or first_id is None else last_id - first_id + 1
+
+    counts = {}
+    for operation in validate_operations(operations):
+        fixes = _fixes(operation)
+        with progress.phase(operation, total=id_span * len(fixes) or None):
+            counts[operation] = sum(
+                chunked_update(db, predicate, values, progress=progress, dry_run=dry_run)
+                for predicate, values in fixes
+            )
+        logger.info(f"Maintenance {operation}: {counts[operation]} row(s){' (dry run)' if dry_run else ''}.")
+    return counts
+
+
+def apply_site_rule(db: Session, rule: models.SiteAssignmentRule, tbd_project_id: int) -> int:
+    """
+    Moves the TBD merged POs matching `rule` to its internal project, set-based.
+    Same criteria as SiteAssignmentEngine: case-sensitive site code patterns,
+    customer project, publish date window (whole days); empty criteria are ignored.
+    """
+    mp = models.MergedPO
+    criteria = [mp.internal_project_id == tbd_project_id]
+
+    # str.startswith & co. are case-sensitive, MySQL's default collation is not
+    exact_site_code = mp.site_code
+    if db.bind.dialect.name == "mysql":
+        exact_site_code = sa.type_coerce(sa.cast(mp.site_code, mysql.BINARY()), sa.String)
+    for pattern, template in (
+        (rule.starts_with, "{}%"), (rule.ends_with, "%{}"), (rule.contains_str, "%{}%"),
+    ):
+        if pattern:
+            escaped = pattern.replace("/", "//").replace("%", "/%").replace("_", "/_")
+            criteria.append(exact_site_code.like(template.format(escaped), escape="/"))
+
+    if rule.customer_project_id:
+        criteria.append(mp.customer_project_id == rule.customer_project_id)
+    if rule.min_publish_date:
+        criteria.append(mp.publish_date >= rule.min_publish_date)
+    if rule.max_publish_date:
+        criteria.append(mp.publish_date < rule.max_publish_date + timedelta(days=1))
+
+    return chunked_update(db, and_(*criteria), {mp.internal_project_id: rule.internal_project_id})
+
+
+def run_maintenance_job(job_id: int, operations: List[str], dry_run: bool = False) -> None:
+    """Worker entry point for a DB_MAINTENANCE job; progress and counts go to the job row."""
+    db = SessionLocal()
+    progress = ImportProgress(job_id, model=models.ImportJob)
+    try:
+        counts = run_maintenance(db, operations, dry_run=dry_run, progress=progress)
+        progress.finish({"dry_run": dry_run, **counts})
+    finally:
+        db.close()
@@ -0,0 +1,100 @@
+"""
+Service: keyset pagination and cached totals for the merged PO lists.
+
+OFFSET pages get slower the deeper they go, and every page view re-ran the
+filtered COUNT(*). The lists therefore also accept a `cursor`. A cursor is the
+opaque position of the last row served: (publish_date, id) in the lists'
+newest-first order. The next page seeks past it through the
+publish_date index, so every page costs the same.
+
+Totals are cached per filter signature and keyed on the merged_pos and
+internal_projects data generations (services/data_generation.py): the PM scope,
+the project_manager_id filter and the project-name search go through
+internal_projects. Imports, assignments, edits and project changes bump those
+generations, so a total is only recounted after one of the tables has changed.
+"""
+import base64
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query, Session
+
+from .. import models
+from . import data_generation
+
+MAX_CACHED_COUNTS = 2048
+
+COUNT_DEPENDENCIES = (data_generation.MERGED_POS, data_generation.INTERNAL_PROJECTS)
+
+_counts: "OrderedDict[tuple, Tuple[tuple, int]]" = OrderedDict()  # signature -> (generations, total)
+_counts_lock = threading.Lock()
+
+
+def encode_cursor(publish_date: Optional[datetime], row_id: int) -> str:
+    position = [publish_date.isoformat() if publish_date else None, row_id]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        publish_date, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (datetime.fromisoformat(publish_date) if publish_date else None), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+
+def newest_first(query: Query) -> Query:
+    """The lists' order: publish_date DESC (NULLs last, as MySQL sorts them), then id DESC."""
+    mp = models.MergedPO
+    return query.order_by(mp.publish_date.desc(), mp.id.desc())
+
+
+def seek(query: Query, cursor: Optional[str]) -> Query:
+    """Rows after `cursor` in newest_first order (all rows for an empty cursor)."""
+    if not cursor:
+        return query
+    mp = models.MergedPO
+    publish_date, row_id = decode_cursor(cursor)
+    if publish_date is None:
+        return query.filter(mp.publish_date.is_(None), mp.id < row_id)
+    return query.filter(or_(
+        mp.publish_date < publish_date,
+        and_(mp.publish_date == publish_date, mp.id < row_id),
+        mp.publish_date.is_(None),
+    ))
+
+
+def keyset_page(query: Query, cursor: Optional[str], size: int, merged_po=lambda row: row) -> Tuple[List[Any], Optional[str]]:
+    """
+    One page of `query` after `cursor` and the cursor of the next page (None on the last).
+    `merged_po` extracts the MergedPO from a result row when the query returns tuples.
+    """
+    rows = newest_first(seek(query, cursor)).limit(size + 1).all()
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = merged_po(rows[-1])
+    return rows, encode_cursor(last.publish_date, last.id)
+
+
+def cached_count(db: Session, signature: tuple, query: Query) -> int:
+    """query.count(), reused until merged_pos or internal_projects changes. `signature` identifies the filters."""
+    versions = data_generation.generations(db, COUNT_DEPENDENCIES)
+    with _counts_lock:
+        cached = _counts.get(signature)
+        if cached and cached[0] == versions:
+            _counts.move_to_end(signature)
+            return cached[1]
+
+    total = query.order_by(None).count()
+    with _counts_lock:
+        _counts[signature] = (versions, total)
+        _counts.move_to_end(signature)
+        while len(_counts) > MAX_CACHED_COUNTS:
+            _counts.popitem(last=False)
+    return total
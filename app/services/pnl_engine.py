@@ -3,6 +3,7 @@ from datetime import datetime
 import calendar
 from .. import models
 from .java_client import JavaApiClient
+from ..utils.period_filters import period_filter
 from sqlalchemy import and_, case, extract, func, or_
 from datetime import date
 import re
@@ -176,20 +177,14 @@ def generate_draft_pnl_for_month(db: Session, year: int, month: int, generated_b
         models.MergedPO.internal_project_id,
         func.sum(case(
             (
-                and_(
-                    extract('year', models.MergedPO.date_ac_ok) == year,
-                    extract('month', models.MergedPO.date_ac_ok) == month
-                ),
+                period_filter(models.MergedPO.date_ac_ok, year=year, month=month),
                 models.MergedPO.accepted_ac_amount
             ),
             else_=0
         )).label("rev_ac"),
         func.sum(case(
             (
-                and_(
-                    extract('year', models.MergedPO.date_pac_ok) == year,
-                    extract('month', models.MergedPO.date_pac_ok) == month
-                ),
+                period_filter(models.MergedPO.date_pac_ok, year=year, month=month),
                 models.MergedPO.accepted_pac_amount
             ),
             else_=0
@@ -201,14 +196,8 @@ def generate_draft_pnl_for_month(db: Session, year: int, month: int, generated_b
         models.MergedPO.internal_project_id.isnot(None),
         models.MergedPO.internal_control == 1,
         or_(
-            and_(
-                extract('year', models.MergedPO.date_ac_ok) == year,
-                extract('month', models.MergedPO.date_ac_ok) == month
-            ),
-            and_(
-                extract('year', models.MergedPO.date_pac_ok) == year,
-                extract('month', models.MergedPO.date_pac_ok) == month
-            )
+            period_filter(models.MergedPO.date_ac_ok, year=year, month=month),
+            period_filter(models.MergedPO.date_pac_ok, year=year, month=month)
         )
     ).group_by(models.MergedPO.internal_project_id).all()
     
@@ -230,8 +219,7 @@ def generate_draft_pnl_for_month(db: Session, year: int, month: int, generated_b
         models.SBC  # BonDeCommande → SBC (same join path as before)
     ).filter(
         models.BonDeCommande.project_id.isnot(None),
-        extract('year', models.ServiceAcceptance.created_at) == year,
-        extract('month', models.ServiceAcceptance.created_at) == month
+        period_filter(models.ServiceAcceptance.created_at, year=year, month=month)
     ).group_by(
         models.BonDeCommande.project_id,
         models.SBC.sbc_type
@@ -257,8 +245,7 @@ def generate_draft_pnl_for_month(db: Session, year: int, month: int, generated_b
     ).filter(
         models.Expense.project_id.isnot(None),
         models.Expense.status.in_([models.ExpenseStatus.PAID, models.ExpenseStatus.ACKNOWLEDGED]),
-        extract('year', models.Expense.payment_confirmed_at) == year,
-        extract('month', models.Expense.payment_confirmed_at) == month
+        period_filter(models.Expense.payment_confirmed_at, year=year, month=month)
     ).group_by(models.Expense.project_id, models.Expense.exp_type).all()
 
     for exp in caisse_expenses:
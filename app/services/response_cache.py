@@ -0,0 +1,212 @@
+"""
+Service: versioned response cache for the dashboard / summary endpoints.
+
+The dashboard figures only move when merged_pos (imports, acceptances,
+reassignments, internal-control edits) or internal_projects (names, PMs)
+change, yet every page load recomputed them. Most of them are summed from
+financial_rollup, which catches up with merged_pos later (a whole-table rebuild
+waits for the worker), so its refreshes are a dependency as well. `cached` keys an endpoint's
+response by
+
+    endpoint | role scope | parameters
+
+where the scope is the user for the roles whose figures are filtered to their
+own projects (PM / PD) and "global" for everyone else. Each entry carries the
+data generations (services/data_generation.py) it was computed from and is
+served only while they are still current: the write paths bump them, which
+invalidates every entry at once without tracking keys.
+
+Backends (settings.response_cache_backend):
+
+    memory  LRU dict in the process (default; one copy per API worker)
+    redis   shared by all workers (needs the optional `redis` package)
+
+Anything with get / set / clear can be plugged in with `set_backend`. Hit, miss
+and backend-error counters per endpoint are in `stats()`.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..config import settings
+from ..enum import UserRole
+from . import data_generation
+
+logger = logging.getLogger(__name__)
+
+SCOPED_ROLES = {UserRole.PM, UserRole.PD}  # roles whose summaries are filtered to their projects
+DEFAULT_DEPENDENCIES = (
+    data_generation.MERGED_POS, data_generation.INTERNAL_PROJECTS, data_generation.FINANCIAL_ROLLUP,
+)
+KEY_PREFIX = "po-app:response:"
+
+Entry = Tuple[list, Any]  # (data generations, response)
+
+
+class LRUBackend:
+    """In-process LRU with a maximum entry age."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: int = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (stored_at, entry)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            found = self._entries.get(key)
+            if found is None:
+                return None
+            stored_at, entry = found
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Entry) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class RedisBackend:
+    """Shared backend: JSON entries in Redis, expiring after `ttl_seconds`."""
+
+    def __init__(self, url: str, ttl_seconds: int = 3600):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("response_cache_backend=redis needs the `redis` package (pip install redis).") from e
+        self.ttl_seconds = ttl_seconds
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Entry]:
+        raw = self._client.get(KEY_PREFIX + key)
+        if raw is None:
+            return None
+        stored = json.loads(raw)
+        return stored["versions"], stored["value"]
+
+    def set(self, key: str, entry: Entry) -> None:
+        versions, value = entry
+        payload = json.dumps({"versions": list(versions), "value": value}, default=_json_default)
+        self._client.set(KEY_PREFIX + key, payload, ex=self.ttl_seconds)
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(match=KEY_PREFIX + "*"):
+            self._client.delete(key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+_metrics = defaultdict(lambda: {"hits": 0, "misses": 0, "errors": 0})
+_metrics_lock = threading.Lock()
+
+
+def _build_backend():
+    if settings.response_cache_backend == "redis":
+        return RedisBackend(settings.response_cache_redis_url, settings.response_cache_ttl_seconds)
+    if settings.response_cache_backend != "memory":
+        raise ValueError(f"Unknown response_cache_backend '{settings.response_cache_backend}' (memory / redis).")
+    return LRUBackend(settings.response_cache_max_entries, settings.response_cache_ttl_seconds)
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _build_backend()
+        return _backend
+
+
+def set_backend(backend) -> None:
+    """Plugs a backend (get / set / clear) in place of the configured one."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def _count(endpoint: str, outcome: str) -> None:
+    with _metrics_lock:
+        _metrics[endpoint][outcome] += 1
+
+
+def scope_of(user: Optional[models.User]) -> str:
+    if user is not None and user.role in SCOPED_ROLES:
+        return f"user:{user.id}"
+    return "global"
+
+
+def cache_key(endpoint: str, user: Optional[models.User] = None, params: Optional[dict] = None) -> str:
+    return "|".join([endpoint, scope_of(user), json.dumps(params or {}, sort_keys=True, default=_json_default)])
+
+
+def cached(
+    db: Session,
+    endpoint: str,
+    compute: Callable[[], Any],
+    user: Optional[models.User] = None,
+    params: Optional[dict] = None,
+    depends_on=DEFAULT_DEPENDENCIES,
+):
+    """`compute()`, reused while the data generations of `depends_on` are unchanged."""
+    key = cache_key(endpoint, user, params)
+    # Read the versions BEFORE computing: a write landing meanwhile only costs a recompute
+    versions = list(data_generation.generations(db, depends_on))
+    backend = get_backend()
+
+    try:
+        entry = backend.get(key)
+    except Exception:
+        logger.exception(f"Response cache read failed for {endpoint}.")
+        _count(endpoint, "errors")
+        entry = None
+    if entry is not None and list(entry[0]) == versions:
+        _count(endpoint, "hits")
+        return entry[1]
+
+    _count(endpoint, "misses")
+    value = compute()
+    try:
+        backend.set(key, (versions, value))
+    except Exception:
+        logger.exception(f"Response cache write failed for {endpoint}.")
+        _count(endpoint, "errors")
+    return value
+
+
+def stats() -> dict:
+    """Per-endpoint hit / miss / error counters of this process, with the hit ratio."""
+    with _metrics_lock:
+        endpoints = {name: dict(counts) for name, counts in _metrics.items()}
+    for counts in endpoints.values():
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_ratio"] = counts["hits"] / lookups if lookups else 0.0
+    return {"backend": settings.response_cache_backend, "endpoints": endpoints}
+
+
+def clear() -> None:
+    get_backend().clear()
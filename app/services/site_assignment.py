@@ -0,0 +1,197 @@
+"""
+Service: compiled site → internal project assignment engine.
+
+Built once per import instead of re-querying SiteProjectAllocation and
+re-scanning every SiteAssignmentRule for each merged PO line.
+
+Resolution order is unchanged:
+1. Manual override (SiteProjectAllocation for the site)
+2. Rules — the highest rule id whose criteria all match wins
+3. Default (TBD)
+
+Every rule is indexed once, under its most selective criterion:
+- starts_with         → prefix trie walked along the site code
+- ends_with           → trie of reversed suffixes walked along the reversed site code
+- customer_project_id → dict bucket
+- publish date bounds → interval index: the date axis is cut at every rule
+                        bound, each segment keeps the rules covering it
+- anything else       → small unindexed list (contains-only rules)
+A lookup therefore only evaluates the rules whose index key already matches.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy.orm import Session
+
+from .. import models
+
+_TERMINAL = None  # trie key under which the rules ending at a node are stored
+
+
+class _Trie:
+    __slots__ = ("root",)
+
+    def __init__(self):
+        self.root: dict = {}
+
+    def insert(self, key: str, item) -> None:
+        node = self.root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node.setdefault(_TERMINAL, []).append(item)
+
+    def walk(self, text: str) -> Iterator:
+        """Yields every item whose key is a prefix of `text`."""
+        node = self.root
+        for ch in text:
+            node = node.get(ch)
+            if node is None:
+                return
+            yield from node.get(_TERMINAL, ())
+
+
+class _IntervalIndex:
+    """Rules by publish date interval [min, max] (a missing bound is open)."""
+    __slots__ = ("rules", "_starts", "_covering")
+
+    def __init__(self, rules: List["_CompiledRule"]):
+        self.rules = rules
+        bounds = {date.min}
+        for rule in rules:
+            if rule.min_publish_date:
+                bounds.add(rule.min_publish_date)
+            if rule.max_publish_date and rule.max_publish_date < date.max:
+                bounds.add(rule.max_publish_date + timedelta(days=1))
+        # Coverage is constant between two consecutive bounds: check it at each segment start
+        self._starts = sorted(bounds)
+        self._covering = [[rule for rule in rules if rule.covers(start)] for start in self._starts]
+
+    def stab(self, p_date: Optional[date]) -> List["_CompiledRule"]:
+        """The rules whose interval contains `p_date` (all of them without a date)."""
+        if p_date is None:
+            return self.rules
+        return self._covering[bisect_right(self._starts, p_date) - 1]
+
+
+class _CompiledRule:
+    __slots__ = (
+        "id", "starts_with", "ends_with", "contains_str", "customer_project_id",
+        "min_publish_date", "max_publish_date", "internal_project_id",
+    )
+
+    def __init__(self, rule: models.SiteAssignmentRule):
+        self.id = rule.id
+        self.starts_with = rule.starts_with
+        self.ends_with = rule.ends_with
+        self.contains_str = rule.contains_str
+        self.customer_project_id = rule.customer_project_id
+        self.min_publish_date = rule.min_publish_date
+        self.max_publish_date = rule.max_publish_date
+        self.internal_project_id = rule.internal_project_id
+
+    def covers(self, p_date: date) -> bool:
+        if self.min_publish_date and p_date < self.min_publish_date:
+            return False
+        if self.max_publish_date and p_date > self.max_publish_date:
+            return False
+        return True
+
+    def matches(self, site_code: str, customer_project_id: Optional[int], p_date: Optional[date]) -> bool:
+        # A. String Checks (empty / NULL criteria are ignored)
+        if self.starts_with and not site_code.startswith(self.starts_with):
+            return False
+        if self.ends_with and not site_code.endswith(self.ends_with):
+            return False
+        if self.contains_str and self.contains_str not in site_code:
+            return False
+        # B. Context Checks
+        if self.customer_project_id and self.customer_project_id != customer_project_id:
+            return False
+        # C. Date interval (only enforced when the PO has a publish date)
+        return p_date is None or self.covers(p_date)
+
+
+class SiteAssignmentEngine:
+    def __init__(
+        self,
+        allocations: Dict[int, int],
+        rules: Iterable[models.SiteAssignmentRule],
+        tbd_project_id: int,
+    ):
+        self.allocations = allocations
+        self.tbd_project_id = tbd_project_id
+
+        self._prefixes = _Trie()
+        self._suffixes = _Trie()
+        self._by_customer_project: Dict[int, List[_CompiledRule]] = {}
+        dated: List[_CompiledRule] = []
+        self._unindexed: List[_CompiledRule] = []
+
+        for rule in rules:
+            compiled = _CompiledRule(rule)
+            if compiled.starts_with:
+                self._prefixes.insert(compiled.starts_with, compiled)
+            elif compiled.ends_with:
+                self._suffixes.insert(compiled.ends_with[::-1], compiled)
+            elif compiled.customer_project_id:
+                self._by_customer_project.setdefault(compiled.customer_project_id, []).append(compiled)
+            elif compiled.min_publish_date or compiled.max_publish_date:
+                dated.append(compiled)
+            else:
+                self._unindexed.append(compiled)
+        self._by_publish_date = _IntervalIndex(dated)
+
+    @classmethod
+    def from_db(cls, db: Session, tbd_project_id: int) -> "SiteAssignmentEngine":
+        """Two queries: every manual allocation and every rule."""
+        allocations: Dict[int, int] = {}
+        rows = db.query(
+            models.SiteProjectAllocation.site_id,
+            models.SiteProjectAllocation.internal_project_id,
+        ).order_by(models.SiteProjectAllocation.id).all()
+        for site_id, internal_project_id in rows:
+            # The first allocation of a site wins, like the old .first() lookup
+            allocations.setdefault(site_id, internal_project_id)
+
+        rules = db.query(models.SiteAssignmentRule).all()
+        return cls(allocations, rules, tbd_project_id)
+
+    def _candidates(
+        self, site_code: str, customer_project_id: Optional[int], p_date: Optional[date]
+    ) -> Iterator[_CompiledRule]:
+        yield from self._prefixes.walk(site_code)
+        yield from self._suffixes.walk(site_code[::-1])
+        if customer_project_id:
+            yield from self._by_customer_project.get(customer_project_id, ())
+        yield from self._by_publish_date.stab(p_date)
+        yield from self._unindexed
+
+    def resolve(
+        self,
+        site_id: Optional[int],
+        site_code: Optional[str],
+        publish_date,
+        customer_project_id: Optional[int],
+    ) -> int:
+        # 1. Manual Override (Highest Priority)
+        if site_id and site_id in self.allocations:
+            return self.allocations[site_id]
+
+        if not site_code:
+            return self.tbd_project_id
+
+        p_date = publish_date.date() if isinstance(publish_date, datetime) else publish_date
+
+        # 2. Highest matching rule id wins
+        best: Optional[_CompiledRule] = None
+        for rule in self._candidates(site_code, customer_project_id, p_date):
+            if best is not None and rule.id < best.id:
+                continue
+            if rule.matches(site_code, customer_project_id, p_date):
+                best = rule
+
+        # 3. No rule matched -> TBD
+        return best.internal_project_id if best else self.tbd_project_id
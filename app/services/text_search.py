@@ -0,0 +1,153 @@
+"""
+Service: indexed text search behind the merged PO, BC and caisse search boxes.
+
+`ilike('%term%')` has a leading wildcard, so no index applies and every keystroke
+scanned the whole table. On MySQL the searched columns carry FULLTEXT indexes
+built with the ngram parser (alembic d1f3a9c5e7b2): every 2-character sequence is
+indexed, and a quoted phrase in BOOLEAN MODE finds the same substrings `ilike`
+found, through the index.
+
+An entity's search is the UNION of one lookup per table it covers, exposed as a
+subquery of (id, score). The fields are the ones each search box always matched:
+
+    merged_po            po_id / item_description, internal + customer project name
+                         (merged PO list and export)
+    remaining_to_accept  po_no / site_code / item_description
+    bc                   bc_number, SBC short / full name, internal project name, creator / PM name
+    transaction          description, wallet owner name
+
+MATCH needs a FULLTEXT index over exactly its column list, hence one index per
+field set on merged_pos.
+
+`restrict` joins it onto a list query; `search_ids` ranks it for type-ahead.
+User names stay on `ilike` (small table, first + last name concatenated). Terms
+shorter than the ngram size and non-MySQL databases use `ilike` throughout.
+"""
+from typing import List
+
+import sqlalchemy as sa
+from sqlalchemy import func, or_
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import Query, Session
+
+from .. import models
+
+MIN_FULLTEXT_CHARS = 2  # innodb ngram_token_size
+SEARCH_LIMIT = 20
+NAME_SCORE = 1.0        # score of the non-FULLTEXT lookups
+
+ENTITIES = ["merged_po", "bc", "transaction"]  # offered by the type-ahead endpoint
+
+
+def _uses_fulltext(db: Session, term: str) -> bool:
+    return db.bind.dialect.name == "mysql" and len(term) >= MIN_FULLTEXT_CHARS
+
+
+def _text_match(columns, term: str, fulltext: bool):
+    """(condition, score) for `term` appearing in any of `columns`."""
+    if fulltext:
+        # Phrase query: the term's ngrams, adjacent and in order (= substring)
+        score = mysql.match(*columns, against=f'"{term.replace(chr(34), " ")}"').in_boolean_mode()
+        return score, score
+    pattern = f"%{term}%"
+    return or_(*[column.ilike(pattern) for column in columns]), sa.literal(NAME_SCORE)
+
+
+def _hit(id_column, score):
+    return sa.select(id_column.label("id"), score.label("score"))
+
+
+def _user_ids(term: str):
+    user = models.User
+    pattern = f"%{term}%"
+    full_name = func.concat(user.first_name, " ", user.last_name)
+    return sa.select(user.id).where(
+        or_(user.first_name.ilike(pattern), user.last_name.ilike(pattern), full_name.ilike(pattern))
+    )
+
+
+def _merged_po_lookups(term: str, fulltext: bool) -> list:
+    mp, ip, cp = models.MergedPO, models.InternalProject, models.CustomerProject
+    own, own_score = _text_match([mp.po_id, mp.item_description], term, fulltext)
+    internal, internal_score = _text_match([ip.name], term, fulltext)
+    customer, customer_score = _text_match([cp.name], term, fulltext)
+    return [
+        _hit(mp.id, own_score).where(own),
+        _hit(mp.id, internal_score).join(ip, mp.internal_project_id == ip.id).where(internal),
+        _hit(mp.id, customer_score).join(cp, mp.customer_project_id == cp.id).where(customer),
+    ]
+
+
+def _remaining_to_accept_lookups(term: str, fulltext: bool) -> list:
+    mp = models.MergedPO
+    own, own_score = _text_match([mp.po_no, mp.site_code, mp.item_description], term, fulltext)
+    return [_hit(mp.id, own_score).where(own)]
+
+
+def _bc_lookups(term: str, fulltext: bool) -> list:
+    bc, sbc, ip = models.BonDeCommande, models.SBC, models.InternalProject
+    number, number_score = _text_match([bc.bc_number], term, fulltext)
+    sbc_name, sbc_score = _text_match([sbc.short_name, sbc.name], term, fulltext)
+    project, project_score = _text_match([ip.name], term, fulltext)
+    users = _user_ids(term)
+    return [
+        _hit(bc.id, number_score).where(number),
+        _hit(bc.id, sbc_score).join(sbc, bc.sbc_id == sbc.id).where(sbc_name),
+        _hit(bc.id, project_score).join(ip, bc.project_id == ip.id).where(project),
+        _hit(bc.id, sa.literal(NAME_SCORE)).where(or_(
+            bc.creator_id.in_(users),
+            bc.project_id.in_(sa.select(ip.id).where(ip.project_manager_id.in_(users))),
+        )),
+    ]
+
+
+def _transaction_lookups(term: str, fulltext: bool) -> list:
+    tx, caisse = models.Transaction, models.Caisse
+    description, description_score = _text_match([tx.description], term, fulltext)
+    return [
+        _hit(tx.id, description_score).where(description),
+        _hit(tx.id, sa.literal(NAME_SCORE))
+        .join(caisse, tx.caisse_id == caisse.id)
+        .where(caisse.user_id.in_(_user_ids(term))),
+    ]
+
+
+LOOKUPS = {
+    "merged_po": _merged_po_lookups,
+    "remaining_to_accept": _remaining_to_accept_lookups,
+    "bc": _bc_lookups,
+    "transaction": _transaction_lookups,
+}
+
+
+def hits(db: Session, entity: str, term: str):
+    """Subquery (id, score) of the `entity` rows matching `term`, one row per id."""
+    if entity not in LOOKUPS:
+        raise ValueError(f"Unknown search entity '{entity}'. Known: {', '.join(LOOKUPS)}.")
+    term = term.strip()
+    lookups = LOOKUPS[entity](term, _uses_fulltext(db, term))
+    matches = sa.union_all(*lookups).subquery("matches")
+    return (
+        sa.select(matches.c.id, func.max(matches.c.score).label("score"))
+        .group_by(matches.c.id)
+        .subquery("search_hits")
+    )
+
+
+def restrict(db: Session, query: Query, entity: str, term: str, id_column) -> Query:
+    """`query` limited to the rows whose `id_column` matches `term`."""
+    found = hits(db, entity, term)
+    return query.join(found, found.c.id == id_column)
+
+
+def search_ids(db: Session, entity: str, term: str, limit: int = SEARCH_LIMIT) -> List[dict]:
+    """Best matches first: [{"id", "score"}], for type-ahead."""
+    if not term or not term.strip():
+        return []
+    found = hits(db, entity, term)
+    rows = db.execute(
+        sa.select(found.c.id, found.c.score)
+        .order_by(found.c.score.desc(), found.c.id.desc())
+        .limit(limit)
+    )
+    return [{"id": row.id, "score": float(row.score or 0)} for row in rows]
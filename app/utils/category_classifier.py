@@ -0,0 +1,151 @@
+"""
+Item description → PO category classification.
+
+`deduce_category` is the reference, one-description-at-a-time rule set.
+`deduce_categories` gives exactly the same answers for a whole column: it
+classifies each distinct description once (exports repeat the same few
+thousand descriptions across hundreds of thousands of lines) and finds every
+keyword with a single precompiled regex pass instead of 60+ substring scans.
+`category_case` is the same rule set as a SQL CASE expression, for set-based
+re-classification inside the database.
+"""
+import re
+from typing import List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, case, func, or_
+
+
+# Priority order matters: the first category with a keyword hit wins
+CATEGORY_KEYWORDS = {
+    "Transport": [
+        "transport", "distance<", "km<", "vehicle", "tractor", "driver",
+        "delivery", "logistics", "shipping", "mobilization"
+    ],
+    "Survey": [
+        "survey", "tssr", "tss", "site report", "los ", "level a", "level b"
+    ],
+    "Civil Work": [
+        "civil work", "concrete", "masonry", "painting", "wall opening",
+        "excavation", "foundation", "steel structure", "fencing", "shelter"
+    ],
+    "Material": [
+        "connector", "jumper", "pvc", "bolt", "screw", "packaging",
+        "battery", "cabinet", "rack", "antenna", "cable", "feeder"
+    ],
+    "Service": [
+        "install", "swap", "dismantle", "commissioning", "integration",
+        "reconfiguration", "expansion", "upgrade", "maintenance",
+        "site engineer", "fsc", "rigger", "technical", "work order",
+        "acceptance", "testing", "alignment", "configuration"
+    ]
+}
+
+# Equipment-only descriptions usually imply Service
+EQUIPMENT_KEYWORDS = ["rru", "bbu", "aau", "bts", "msan", "olt", "wdm", "microwave", "mw "]
+
+_EQUIPMENT = "__equipment__"
+
+
+def deduce_category(description: str) -> str:
+    """
+    Guaranteed to return a non-null category string.
+    Priority: Transport -> Survey -> Civil Work -> Material -> Service -> TBD
+    """
+    if not description or not isinstance(description, str) or not description.strip():
+        return "TBD"
+
+    desc = description.lower()
+
+    # 1. Primary Keyword Check
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(k in desc for k in keywords):
+            # Exception: Material + Install = Service
+            if category == "Material" and "install" in desc:
+                return "Service"
+            return category
+
+    # 2. Equipment-only descriptions usually imply Service
+    if any(k in desc for k in EQUIPMENT_KEYWORDS):
+        return "Service"
+
+    # 3. Final Catch-all
+    return "TBD"
+
+
+# --- Batch classifier -------------------------------------------------------
+
+_KEYWORD_GROUP = {kw: category for category, keywords in CATEGORY_KEYWORDS.items() for kw in keywords}
+_KEYWORD_GROUP.update({kw: _EQUIPMENT for kw in EQUIPMENT_KEYWORDS})
+
+# A zero-width lookahead reports a keyword at every offset (overlaps included).
+# At a given offset the longest alternative wins, so a keyword that is a prefix of
+# a longer keyword in ANOTHER group would be hidden; refuse such a table outright.
+for _short in _KEYWORD_GROUP:
+    for _long in _KEYWORD_GROUP:
+        if _long != _short and _long.startswith(_short) and _KEYWORD_GROUP[_long] != _KEYWORD_GROUP[_short]:
+            raise ValueError(f"Category keyword '{_short}' is shadowed by '{_long}' in another category.")
+
+_KEYWORD_PATTERN = re.compile(
+    "(?=(" + "|".join(re.escape(kw) for kw in sorted(_KEYWORD_GROUP, key=len, reverse=True)) + "))"
+)
+_PRIORITY = list(CATEGORY_KEYWORDS)
+
+
+def _classify(description) -> str:
+    """Single-pass equivalent of deduce_category."""
+    if not description or not isinstance(description, str) or not description.strip():
+        return "TBD"
+
+    found = {m.group(1) for m in _KEYWORD_PATTERN.finditer(description.lower())}
+    if not found:
+        return "TBD"
+
+    groups = {_KEYWORD_GROUP[kw] for kw in found}
+    for category in _PRIORITY:
+        if category in groups:
+            if category == "Material" and "install" in found:
+                return "Service"
+            return category
+
+    return "Service" if _EQUIPMENT in groups else "TBD"
+
+
+def deduce_categories(descriptions: Union[pd.Series, Sequence]) -> Union[pd.Series, List[str]]:
+    """
+    Batch version of deduce_category.
+    A Series comes back as a Series on the same index; any other sequence as a list.
+    Each distinct description is classified once.
+    """
+    codes, uniques = pd.factorize(pd.Series(descriptions, dtype=object) if not isinstance(descriptions, pd.Series) else descriptions)
+    # factorize maps None/NaN to -1, which lands on the trailing "TBD"
+    labels = np.array([_classify(value) for value in uniques] + ["TBD"], dtype=object)
+    result = labels[codes]
+
+    if isinstance(descriptions, pd.Series):
+        return pd.Series(result, index=descriptions.index, dtype=object)
+    return result.tolist()
+
+
+# --- SQL classifier ---------------------------------------------------------
+
+def category_case(description_column):
+    """
+    deduce_category as a SQL CASE over `description_column`.
+    NULL and blank descriptions contain no keyword, so they fall through to "TBD".
+    """
+    desc = func.lower(description_column)
+
+    def any_of(keywords):
+        # No keyword contains a LIKE wildcard, so no escaping is needed
+        return or_(*[desc.like(f"%{kw}%") for kw in keywords])
+
+    whens = []
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if category == "Material":
+            # Exception: Material + Install = Service
+            whens.append((and_(any_of(keywords), desc.like("%install%")), "Service"))
+        whens.append((any_of(keywords), category))
+    whens.append((any_of(EQUIPMENT_KEYWORDS), "Service"))
+    return case(*whens, else_="TBD")
@@ -0,0 +1,65 @@
+"""
+Content fingerprints for import de-duplication.
+
+- `save_upload_with_sha256` copies an uploaded file to disk and hashes it in the
+  same pass, so identical re-uploads can be recognised without reading twice.
+- `row_fingerprints` gives every staged Excel line a short digest of its
+  business columns. Values are canonicalised first (1 == 1.0, NaN == None,
+  timestamps as ISO strings) so the same line hashes the same way whatever
+  dtype pandas happened to infer for its chunk.
+"""
+import hashlib
+import math
+from datetime import date, datetime
+from typing import BinaryIO, Sequence
+
+import numpy as np
+import pandas as pd
+
+_COPY_BUFFER = 1024 * 1024
+_FIELD_SEPARATOR = "\x1f"
+
+
+def save_upload_with_sha256(source: BinaryIO, destination: str) -> str:
+    """Streams `source` into `destination` and returns the file's SHA-256 hex digest."""
+    digest = hashlib.sha256()
+    with open(destination, "wb") as buffer:
+        while True:
+            block = source.read(_COPY_BUFFER)
+            if not block:
+                break
+            digest.update(block)
+            buffer.write(block)
+    return digest.hexdigest()
+
+
+def canonical_value(value) -> str:
+    """Stable text form of a cell value: 1 and 1.0 agree, NaN/None/NaT are empty."""
+    if value is None or value is pd.NaT or value is pd.NA:
+        return ""
+    if isinstance(value, (float, np.floating)):
+        if math.isnan(value):
+            return ""
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    return str(value).strip()
+
+
+def row_fingerprints(df: pd.DataFrame, columns: Sequence[str]) -> pd.Series:
+    """
+    32-char hex digest per row over `columns` (missing columns count as empty).
+    Returned on the DataFrame's index.
+    """
+    present = [c for c in columns if c in df.columns]
+    missing = len(columns) - len(present)
+    values = df[present].itertuples(index=False, name=None)
+
+    digests = []
+    for row in values:
+        parts = [canonical_value(v) for v in row]
+        parts.extend([""] * missing)
+        digests.append(hashlib.blake2b(_FIELD_SEPARATOR.join(parts).encode("utf-8"), digest_size=16).hexdigest())
+    return pd.Series(digests, index=df.index, dtype=object)
@@ -0,0 +1,89 @@
+"""
+Streaming reader for large Huawei Excel exports.
+
+`pd.read_excel` materialises the whole workbook (plus pandas' per-cell object
+overhead) before the first row can be written, which is what blew up worker
+memory on the monthly PO exports. This reader walks the first sheet with
+openpyxl in read-only mode and yields fixed-size DataFrames, so peak memory is
+bounded by `chunk_size` rather than by the file.
+"""
+from typing import Iterator, List, Optional
+
+import openpyxl
+import pandas as pd
+
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _header_names(header_row) -> List[str]:
+    """Mimic pandas' header handling: blank headers become 'Unnamed: <idx>'."""
+    names = []
+    for idx, value in enumerate(header_row):
+        if value is None or (isinstance(value, str) and not value.strip()):
+            names.append(f"Unnamed: {idx}")
+        else:
+            names.append(str(value).strip() if isinstance(value, str) else str(value))
+    return names
+
+
+def iter_excel_chunks(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yields the first sheet of `file_path` as DataFrames of at most `chunk_size` rows.
+    The first row is used as the header (same as pd.read_excel). Fully empty rows are skipped.
+    Legacy .xls files are not supported by openpyxl and fall back to pandas.
+    """
+    if file_path.lower().endswith(".xls"):
+        df = pd.read_excel(file_path)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size].copy()
+        return
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+
+        header = None
+        for row in rows:
+            if any(v is not None for v in row):
+                header = _header_names(row)
+                break
+        if header is None:
+            return
+
+        width = len(header)
+        buffer = []
+        for row in rows:
+            if not any(v is not None for v in row):
+                continue
+            # read-only sheets can report ragged rows; pad/trim to the header width
+            values = list(row[:width])
+            if len(values) < width:
+                values.extend([None] * (width - len(values)))
+            buffer.append(values)
+
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+
+def estimate_excel_rows(file_path: str) -> Optional[int]:
+    """
+    Data rows of the first sheet according to the workbook's stored dimension
+    (header excluded). Cheap, but only an estimate: blank rows are counted and some
+    writers omit the dimension, in which case None is returned.
+    """
+    if file_path.lower().endswith(".xls"):
+        return None
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        max_row = workbook.worksheets[0].max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
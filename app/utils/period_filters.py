@@ -0,0 +1,113 @@
+"""
+Sargable period predicates.
+
+`extract('year', col) == y`, `func.week(col, 3) == w` or `func.date(col) >= d`
+wrap the column in a function, so MySQL cannot use an index on it and every
+period dashboard scans the whole table. `period_filter` expresses the same
+periods as half-open ranges on the bare column:
+
+    period_filter(MergedPO.date_ac_ok, year=2025, month=6)
+        -> date_ac_ok >= '2025-06-01' AND date_ac_ok < '2025-07-01'
+
+Inputs combine as an intersection, exactly like the ANDed predicates they
+replace: year, month (needs year), ISO week (MySQL WEEK(col, 3), needs year; the
+calendar-year days of that week number, as before) and an inclusive
+start_date / end_date (date objects or ISO "YYYY-MM-DD" strings).
+"""
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple, Union
+
+import sqlalchemy as sa
+from sqlalchemy import and_, false, or_
+
+Range = Tuple[Optional[date], Optional[date]]  # [start, end); None = unbounded
+
+
+def _intersect(a: Range, b: Range) -> Optional[Range]:
+    starts = [d for d in (a[0], b[0]) if d is not None]
+    ends = [d for d in (a[1], b[1]) if d is not None]
+    start = max(starts) if starts else None
+    end = min(ends) if ends else None
+    if start is not None and end is not None and start >= end:
+        return None
+    return start, end
+
+
+def _week_ranges(year: int, week: int) -> List[Range]:
+    """Days of `year` whose ISO week number is `week`, as contiguous ranges (at most two)."""
+    ranges: List[Range] = []
+    day, end_of_year = date(year, 1, 1), date(year + 1, 1, 1)
+    while day < end_of_year:
+        if day.isocalendar()[1] == week:
+            if ranges and ranges[-1][1] == day:
+                ranges[-1] = (ranges[-1][0], day + timedelta(days=1))
+            else:
+                ranges.append((day, day + timedelta(days=1)))
+        day += timedelta(days=1)
+    return ranges
+
+
+def _as_date(value: Union[date, str, None]) -> Optional[date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value.date() if isinstance(value, datetime) else value
+
+
+def period_ranges(
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    week: Optional[int] = None,
+    start_date: Union[date, str, None] = None,
+    end_date: Union[date, str, None] = None,
+) -> List[Range]:
+    """The period as a list of disjoint [start, end) date ranges; [] when it is empty."""
+    if (month or week) and not year:
+        raise ValueError("month and week filters need a year.")
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+
+    ranges: List[Range] = [(None, None)]
+    constraints: List[List[Range]] = []
+    if year:
+        constraints.append([(date(year, 1, 1), date(year + 1, 1, 1))])
+    if month:
+        next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        constraints.append([(date(year, month, 1), next_month)])
+    if week:
+        constraints.append(_week_ranges(year, week))
+    if start_date or end_date:
+        constraints.append([(start_date, end_date + timedelta(days=1) if end_date else None)])
+
+    for allowed in constraints:
+        ranges = [r for a in ranges for b in allowed for r in [_intersect(a, b)] if r is not None]
+    return ranges
+
+
+def _bound(column, value: date):
+    # DateTime columns compare against midnight of the day
+    if isinstance(column.type, sa.DateTime) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+def period_filter(
+    column,
+    year: Optional[int] = None,
+    month: Optional[int] = None,
+    week: Optional[int] = None,
+    start_date: Union[date, str, None] = None,
+    end_date: Union[date, str, None] = None,
+):
+    """WHERE / CASE condition selecting the rows of `column` inside the period."""
+    clauses = []
+    for start, end in period_ranges(year, month, week, start_date, end_date):
+        bounds = []
+        if start is not None:
+            bounds.append(column >= _bound(column, start))
+        if end is not None:
+            bounds.append(column < _bound(column, end))
+        clauses.append(and_(*bounds) if bounds else column.isnot(None))
+    if not clauses:
+        return false()
+    return clauses[0] if len(clauses) == 1 else or_(*clauses)
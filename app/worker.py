@@ -0,0 +1,196 @@
+"""
+Import worker pool — runs the jobs queued in `import_jobs`, away from the API workers.
+
+    python -m app.worker
+
+Starts `settings.import_worker_concurrency` worker processes. Each one loops:
+claim a job (lease), run its handler while a heartbeat thread renews the lease,
+settle it. A process that dies stops heart-beating; the job it was running is
+taken over by another worker once its lease expires. A worker whose heartbeat
+finds the lease gone aborts its handler at the next chunk and settles nothing.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+
+from . import crud
+from .config import settings
+from .database import SessionLocal, engine
+from .enum import JobType
+from .services import acceptance_sync, financial_rollup, job_queue, maintenance
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+# job_type -> callable(**payload)
+JOB_HANDLERS = {
+    JobType.PO_IMPORT: crud.process_po_file_background,
+    JobType.ACCEPTANCE_IMPORT: crud.process_acceptance_file_background,
+}
+
+# job_type -> callable(job_id, **payload); maintenance jobs record progress on their job row
+MAINTENANCE_HANDLERS = {
+    JobType.HARD_SYNC_ACCEPTANCES: acceptance_sync.run_hard_sync_job,
+    JobType.DB_MAINTENANCE: maintenance.run_maintenance_job,
+}
+
+
+def run_one(worker_id: str) -> bool:
+    """Claims and runs a single job. Returns False when the queue had nothing for us."""
+    db = SessionLocal()
+    try:
+        job = job_queue.claim_next_job(db, worker_id)
+        if job is None:
+            return False
+        job_id, job_type, payload = job.id, job.job_type, dict(job.payload)
+    finally:
+        db.close()
+
+    logger.info(f"Job {job_id} ({job_type.value}) claimed by {worker_id}.")
+    stop_heartbeat = threading.Event()
+    lease_lost = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job_id, worker_id, stop_heartbeat, lease_lost),
+        name=f"heartbeat-{job_id}", daemon=True,
+    )
+    heartbeat.start()
+    try:
+        with job_queue.lease(lease_lost):
+            if job_type in MAINTENANCE_HANDLERS:
+                MAINTENANCE_HANDLERS[job_type](job_id, **payload)
+            else:
+                JOB_HANDLERS[job_type](**payload)
+    except job_queue.LeaseLost:
+        # The worker that took the job over owns its state now
+        logger.warning(f"Job {job_id}: aborted by {worker_id} after losing its lease.")
+        return True
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+        _settle(job_queue.fail_job, job_id, worker_id, f"{e}\n{traceback.format_exc()}", str(e))
+        _refresh_rollup()  # chunks committed before the failure
+        return True
+    finally:
+        stop_heartbeat.set()
+        heartbeat.join()
+
+    if lease_lost.is_set():
+        # Finished after the lease expired: the new owner runs it again and settles it
+        logger.warning(f"Job {job_id}: finished by {worker_id} after losing its lease; not settling.")
+        return True
+    _settle(job_queue.complete_job, job_id, worker_id)
+    logger.info(f"Job {job_id} done.")
+    _refresh_rollup()
+    return True
+
+
+def _refresh_rollup() -> None:
+    """
+    Folds pending merged_pos changes into financial_rollup, whole-table rebuilds included
+    (the summary readers leave those to the worker).
+    """
+    db = SessionLocal()
+    try:
+        financial_rollup.refresh(db, rebuild_all=True)
+    except Exception:
+        # The next idle poll retries
+        logger.exception("Financial rollup refresh failed.")
+    finally:
+        db.close()
+
+
+def _settle(settle_fn, job_id: int, worker_id: str, *args) -> None:
+    db = SessionLocal()
+    try:
+        settle_fn(db, job_id, worker_id, *args)
+    finally:
+        db.close()
+
+
+def _heartbeat(job_id: int, worker_id: str, stop: threading.Event, lost: threading.Event) -> None:
+    """
+    Renews the job lease until `stop` is set. Runs in a thread next to the handler.
+    Sets `lost` (which aborts the handler) once the job turns out to be owned by another worker.
+    """
+    while not stop.wait(settings.import_job_heartbeat_seconds):
+        db = SessionLocal()
+        try:
+            if not job_queue.renew_lease(db, job_id, worker_id):
+                logger.error(f"Job {job_id}: lease lost by {worker_id}; another worker owns it now.")
+                lost.set()
+                return
+        except Exception:
+            # A missed beat is fine as long as the next one lands before the lease expires
+            logger.exception(f"Job {job_id}: heartbeat failed.")
+        finally:
+            db.close()
+
+
+def _worker_loop(slot: int) -> None:
+    # Connections inherited from the parent must not be shared across processes
+    engine.dispose(close=False)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{slot}"
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True  # finish the current job, then exit
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    logger.info(f"Worker {worker_id} started.")
+    while not stopping:
+        try:
+            if not run_one(worker_id):
+                # Idle: pick up rollup changes made outside the jobs (API writes, maintenance)
+                _refresh_rollup()
+                time.sleep(settings.import_worker_poll_seconds)
+        except Exception:
+            # DB hiccup while claiming/settling: back off and keep the process alive
+            logger.exception(f"Worker {worker_id}: unexpected error.")
+            time.sleep(settings.import_worker_poll_seconds)
+    logger.info(f"Worker {worker_id} stopped.")
+
+
+def main() -> None:
+    concurrency = max(1, settings.import_worker_concurrency)
+    processes = {}
+    stopping = False
+
+    def _start(slot: int) -> None:
+        process = multiprocessing.Process(target=_worker_loop, args=(slot,), name=f"import-worker-{slot}")
+        process.start()
+        processes[slot] = process
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM: children finish their current job
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    logger.info(f"Starting {concurrency} import worker(s).")
+    for slot in range(concurrency):
+        _start(slot)
+
+    while not stopping:
+        for slot, process in list(processes.items()):
+            if not process.is_alive() and not stopping:
+                logger.warning(f"Worker slot {slot} exited with code {process.exitcode}; restarting.")
+                _start(slot)
+        time.sleep(1)
+
+    for process in processes.values():
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark + equivalence check: per-row AC/PAC loop vs compute_acceptance_updates.
+
+Run from the backend directory:
+    python bench_acceptance_amounts.py            # 100k acceptance rows
+    python bench_acceptance_amounts.py 20000      # custom size
+
+The reference below is the iterrows() loop process_acceptances_by_ids used to run
+on MergedPO objects. Fails loudly if the vectorized engine disagrees on any field.
+No database or .env needed.
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.services.acceptance_amounts import AMOUNT_COLUMNS, compute_acceptance_updates
+
+TERMS = ["AC PAC 100%", "AC1 80 | PAC 20", "UNKNOWN", None]
+
+
+def reference_loop(history_df: pd.DataFrame, merged_po_map: dict) -> None:
+    """The historical per-row logic, verbatim (category handling aside)."""
+    for index, row in history_df.iterrows():
+        po_id = row['po_id']
+        if po_id in merged_po_map:
+            merged_po = merged_po_map[po_id]
+            latest_qty = row['acceptance_qty']
+            raw_processed_date = row['application_processed_date']
+            shipment_no = row['shipment_no']
+
+            unit_price = merged_po.unit_price or 0
+            req_qty = merged_po.requested_qty or 0
+
+            final_processed_date = None
+            if latest_qty > 0 and pd.notna(raw_processed_date):
+                date_obj = raw_processed_date.date()
+                if date_obj == date(2026, 1, 1):
+                    final_processed_date = date(2025, 12, 31)
+                else:
+                    final_processed_date = date_obj
+
+            agg_acceptance_qty = max(0, min(latest_qty, req_qty))
+            payment_term = merged_po.payment_term
+
+            if shipment_no == 1:
+                if agg_acceptance_qty > 0:
+                    merged_po.total_ac_amount = unit_price * req_qty * 0.80
+                    merged_po.accepted_ac_amount = unit_price * agg_acceptance_qty * 0.80
+                    merged_po.date_ac_ok = final_processed_date
+                    if payment_term == "AC PAC 100%":
+                        merged_po.total_pac_amount = unit_price * req_qty * 0.20
+                        merged_po.accepted_pac_amount = unit_price * agg_acceptance_qty * 0.20
+                        merged_po.date_pac_ok = final_processed_date
+                else:
+                    merged_po.accepted_ac_amount = 0.0
+                    merged_po.date_ac_ok = None
+                    if payment_term == "AC PAC 100%":
+                        merged_po.accepted_pac_amount = 0.0
+                        merged_po.date_pac_ok = None
+            elif shipment_no == 2:
+                if payment_term == "AC1 80 | PAC 20":
+                    if agg_acceptance_qty > 0:
+                        merged_po.total_pac_amount = unit_price * req_qty * 0.20
+                        merged_po.accepted_pac_amount = unit_price * agg_acceptance_qty * 0.20
+                        merged_po.date_pac_ok = final_processed_date
+                    else:
+                        merged_po.accepted_pac_amount = 0.0
+                        merged_po.date_pac_ok = None
+
+
+def synthetic(rows: int, seed: int = 7):
+    rnd = random.Random(seed)
+    lines = max(rows // 2, 1)
+    merged = []
+    for i in range(lines):
+        merged.append({
+            "id": i + 1,
+            "po_id": f"PO{i // 5}-{i % 5 + 1}",
+            "unit_price": rnd.choice([None, 0.0, round(rnd.uniform(1, 5000), 2)]),
+            "requested_qty": rnd.choice([None, 0.0, 1.0, float(rnd.randint(1, 40)), rnd.uniform(0, 10)]),
+            "payment_term": rnd.choice(TERMS),
+            "total_ac_amount": rnd.choice([None, 12.5]),
+            "accepted_ac_amount": rnd.choice([None, 3.0]),
+            "date_ac_ok": rnd.choice([None, date(2024, 5, 1)]),
+            "total_pac_amount": rnd.choice([None, 7.0]),
+            "accepted_pac_amount": rnd.choice([None, 1.0]),
+            "date_pac_ok": rnd.choice([None, date(2024, 6, 1)]),
+        })
+
+    base = datetime(2025, 12, 20)
+    history, seen = [], set()
+    while len(history) < rows:
+        line = rnd.randrange(lines + lines // 10)  # ~10% without a merged PO
+        shipment = rnd.choice([1, 1, 2, 2, 3])
+        if (line, shipment) in seen:
+            continue
+        seen.add((line, shipment))
+        history.append({
+            "po_id": f"PO{line // 5}-{line % 5 + 1}",
+            "shipment_no": float(shipment),
+            "acceptance_qty": rnd.choice([float("nan"), -5.0, 0.0, 1.0, float(rnd.randint(1, 60)), rnd.uniform(0, 10)]),
+            "application_processed_date": rnd.choice([
+                pd.NaT, datetime(2026, 1, 1, 8, 30), base + timedelta(days=rnd.randint(0, 40), hours=rnd.randint(0, 23)),
+            ]),
+        })
+    history_df = pd.DataFrame(history)
+    history_df["application_processed_date"] = pd.to_datetime(history_df["application_processed_date"])
+    return history_df, pd.DataFrame(merged)
+
+
+def same(a, b) -> bool:
+    return (a is None and b is None) or (a is not None and b is not None and a == b)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    history_df, merged_df = synthetic(rows)
+    print(f"\n=== AC/PAC engine benchmark: {len(history_df)} acceptance rows, {len(merged_df)} merged POs ===")
+
+    objects = {
+        r["po_id"]: SimpleNamespace(**r)
+        for r in merged_df.astype(object).where(merged_df.notna(), None).to_dict("records")
+    }
+    start = time.perf_counter()
+    reference_loop(history_df, objects)
+    t_loop = time.perf_counter() - start
+    print(f"  {'per-row iterrows loop':<32} {t_loop * 1000:10.1f} ms")
+
+    start = time.perf_counter()
+    updates = compute_acceptance_updates(history_df, merged_df)
+    t_vec = time.perf_counter() - start
+    print(f"  {'compute_acceptance_updates':<32} {t_vec * 1000:10.1f} ms")
+
+    touched = set(history_df["po_id"]) & set(objects)
+    mismatches = []
+    if set(updates.index) != touched:
+        mismatches.append(("<touched rows>", len(touched), len(updates)))
+    for po_id, row in updates.iterrows():
+        for column in AMOUNT_COLUMNS:
+            expected, got = getattr(objects[po_id], column), row[column]
+            if not same(expected, got):
+                mismatches.append((f"{po_id}.{column}", expected, got))
+
+    if mismatches:
+        print(f"\nFAILED: {len(mismatches)} mismatching values, first ones:")
+        for where, expected, got in mismatches[:10]:
+            print(f"  {where}: loop={expected!r} vectorized={got!r}")
+        sys.exit(1)
+
+    print(f"\n  identical results on {len(updates)} merged POs, speed-up x{t_loop / t_vec:.1f}")
+
+
+if __name__ == "__main__":
+    main()
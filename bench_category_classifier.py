@@ -0,0 +1,76 @@
+"""
+Benchmark: per-row deduce_category vs batch deduce_categories.
+
+Run from the backend directory:
+    python bench_category_classifier.py                    # synthetic descriptions
+    python bench_category_classifier.py path/to/PO.xlsx    # real 'Item Description' column
+
+Fails loudly if the two classifiers disagree on any description.
+No database or .env needed.
+"""
+
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.utils.category_classifier import (
+    CATEGORY_KEYWORDS, EQUIPMENT_KEYWORDS, deduce_category, deduce_categories,
+)
+
+
+def synthetic_descriptions(rows: int = 200_000, distinct: int = 3_000) -> pd.Series:
+    """Huawei exports repeat a few thousand descriptions across the whole file."""
+    rnd = random.Random(42)
+    vocabulary = [k for kws in CATEGORY_KEYWORDS.values() for k in kws] + EQUIPMENT_KEYWORDS
+    vocabulary += ["5G", "NR", "Site", "Lot", "per unit", "LTE", "3 sectors", "Project"]
+    pool = []
+    for _ in range(distinct):
+        words = rnd.sample(vocabulary, rnd.randint(1, 5))
+        text = " ".join(words)
+        pool.append(text.upper() if rnd.random() < 0.3 else text.title())
+    pool += [None, "", "   "]
+    return pd.Series([rnd.choice(pool) for _ in range(rows)])
+
+
+def load_descriptions(path: str) -> pd.Series:
+    df = pd.read_excel(path, usecols=["Item Description"])
+    return df["Item Description"]
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<32} {elapsed * 1000:10.1f} ms")
+    return result, elapsed
+
+
+def main():
+    descriptions = load_descriptions(sys.argv[1]) if len(sys.argv) > 1 else synthetic_descriptions()
+    print(f"\n=== deduce_category benchmark: {len(descriptions)} rows, "
+          f"{descriptions.nunique(dropna=False)} distinct ===")
+
+    per_row, t_row = timed("per-row deduce_category", lambda: [deduce_category(d) for d in descriptions])
+    batch, t_batch = timed("batch deduce_categories", lambda: deduce_categories(descriptions))
+
+    mismatches = [
+        (desc, expected, got)
+        for desc, expected, got in zip(descriptions, per_row, batch)
+        if expected != got
+    ]
+    if mismatches:
+        print(f"\nFAILED: {len(mismatches)} mismatching rows, first ones:")
+        for desc, expected, got in mismatches[:10]:
+            print(f"  {desc!r}: per-row={expected!r} batch={got!r}")
+        sys.exit(1)
+
+    print(f"\n  identical results, speed-up x{t_row / t_batch:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Benchmark + equivalence check: per-month yearly chart vs the single rollup read.
+
+Run from the backend directory:
+    python bench_yearly_chart.py              # 50k merged POs
+    python bench_yearly_chart.py 200000       # custom size
+
+The reference below is get_yearly_chart_data as it used to run: a UNION query
+for the active months, then one get_financial_summary_by_period per month.
+Seeds an in-memory SQLite database; the .env is only read for the app settings.
+Fails loudly if the two disagree for an admin, a PM or a PD.
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+from sqlalchemy import create_engine, distinct, event, extract, insert, union_all
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import crud, models
+from app.enum import AssignmentStatus, UserRole
+from app.services import financial_rollup
+from app.utils.period_filters import period_filter
+
+YEARS = [2023, 2024, 2025]
+
+
+def reference_chart(db, year: int, user=None):
+    """The historical implementation, verbatim."""
+    base_query = db.query(models.MergedPO)
+    base_query = base_query.filter(models.MergedPO.assignment_status == models.AssignmentStatus.APPROVED)
+    if user and user.role in [models.UserRole.PM, models.UserRole.PD]:
+        base_query = base_query.join(models.CustomerProject).join(models.InternalProject).filter(
+            models.InternalProject.project_manager_id == user.id
+        )
+
+    month_col = extract('month', models.MergedPO.publish_date).label("month_num")
+    po_months = base_query.with_entities(month_col).filter(period_filter(models.MergedPO.publish_date, year=year))
+    ac_months = base_query.with_entities(
+        extract('month', models.MergedPO.date_ac_ok).label("month_num")
+    ).filter(period_filter(models.MergedPO.date_ac_ok, year=year))
+    pac_months = base_query.with_entities(
+        extract('month', models.MergedPO.date_pac_ok).label("month_num")
+    ).filter(period_filter(models.MergedPO.date_pac_ok, year=year))
+
+    all_months_query = union_all(po_months, ac_months, pac_months).subquery()
+    active_months = [row[0] for row in db.query(distinct(all_months_query.c.month_num)).all()]
+
+    monthly_data = []
+    for month in active_months:
+        if not month: continue
+        summary = crud.get_financial_summary_by_period(db=db, year=year, month=month, user=user)
+        total_paid = (summary.get("total_accepted_ac", 0) or 0) + (summary.get("total_accepted_pac", 0) or 0)
+        monthly_data.append({
+            "month": month,
+            "total_po_value": summary.get("total_po_value", 0) or 0,
+            "total_paid": total_paid
+        })
+    return sorted(monthly_data, key=lambda x: x['month'])
+
+
+def seed(engine, rows: int, seed: int = 22) -> None:
+    rnd = random.Random(seed)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [
+            {"id": i, "first_name": "U", "last_name": str(i), "username": f"u{i}", "email": f"u{i}@example.com",
+             "hashed_password": "x", "role": UserRole.PD if i == 2 else UserRole.PM}
+            for i in range(1, 11)
+        ])
+        conn.execute(insert(models.CustomerProject.__table__), [{"id": i, "name": f"CP-{i}"} for i in range(1, 11)])
+        conn.execute(insert(models.InternalProject.__table__), [
+            {"id": i, "name": f"IP-{i}", "project_manager_id": rnd.choice([None] + list(range(1, 11)))}
+            for i in range(1, 61)
+        ])
+        merged = []
+        for i in range(1, rows + 1):
+            published = datetime(2023, 1, 1) + timedelta(days=rnd.randint(0, 3 * 365), hours=rnd.randint(0, 23))
+            merged.append({
+                "id": i,
+                "po_id": f"PO{i}",
+                "customer_project_id": rnd.randint(1, 10),
+                "internal_project_id": rnd.choice([None] + list(range(1, 61))),
+                "assignment_status": rnd.choice([AssignmentStatus.APPROVED] * 8 + [AssignmentStatus.PENDING_APPROVAL]),
+                "publish_date": None if rnd.random() < 0.01 else published,
+                "line_amount_hw": rnd.choice([None, round(rnd.uniform(100, 10_000), 2)]),
+                "accepted_ac_amount": rnd.choice([None, 0.0, round(rnd.uniform(0, 8_000), 2)]),
+                "accepted_pac_amount": rnd.choice([None, 0.0, round(rnd.uniform(0, 2_000), 2)]),
+                "date_ac_ok": rnd.choice([None, published.date() + timedelta(days=rnd.randint(10, 200))]),
+                "date_pac_ok": rnd.choice([None, None, published.date() + timedelta(days=rnd.randint(100, 300))]),
+            })
+        for start in range(0, len(merged), 5000):
+            conn.execute(insert(models.MergedPO.__table__), merged[start:start + 5000])
+        conn.execute(insert(models.FinancialRollupDirty.__table__), [{"full_rebuild": True}])
+
+
+def timed(engine, fn):
+    statements = []
+    listener = lambda *args: statements.append(1)
+    event.listen(engine, "before_cursor_execute", listener)
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    event.remove(engine, "before_cursor_execute", listener)
+    return result, elapsed, len(statements)
+
+
+def rounded(chart):
+    return [(p["month"], round(p["total_po_value"], 4), round(p["total_paid"], 4)) for p in chart]
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(engine)
+    seed(engine, rows)
+    db = sessionmaker(bind=engine)()
+    print(f"\n=== Yearly chart benchmark: {rows} merged POs, years {YEARS} ===")
+
+    _, t_build, _ = timed(engine, lambda: financial_rollup.refresh(db, rebuild_all=True))
+    print(f"  {'initial rollup build':<32} {t_build * 1000:10.1f} ms")
+
+    users = [("admin", None), ("PM", db.get(models.User, 1)), ("PD", db.get(models.User, 2))]
+    mismatches, t_old, t_new, q_old, q_new = [], 0.0, 0.0, 0, 0
+    for year in YEARS:
+        for who, user in users:
+            expected, elapsed, queries = timed(engine, lambda: reference_chart(db, year, user))
+            t_old, q_old = t_old + elapsed, q_old + queries
+            got, elapsed, queries = timed(engine, lambda: crud.get_yearly_chart_data(db, year, user))
+            t_new, q_new = t_new + elapsed, q_new + queries
+            if rounded(expected) != rounded(got):
+                mismatches.append((year, who, rounded(expected), rounded(got)))
+
+    calls = len(YEARS) * len(users)
+    print(f"  {'union + per-month summaries':<32} {t_old * 1000 / calls:10.1f} ms/call {q_old / calls:6.1f} queries/call")
+    print(f"  {'single rollup read':<32} {t_new * 1000 / calls:10.1f} ms/call {q_new / calls:6.1f} queries/call")
+
+    if mismatches:
+        print(f"\nFAILED: {len(mismatches)} mismatching charts, first ones:")
+        for year, who, expected, got in mismatches[:5]:
+            print(f"  {year} {who}:\n    old={expected}\n    new={got}")
+        sys.exit(1)
+
+    print(f"\n  identical charts for {calls} (year, role) pairs, speed-up x{t_old / t_new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+EXPLAIN regression test for the merged_pos indexes (alembic c0e2a8f4b6d5).
+
+Seeds a scratch MySQL 8 schema, runs the dashboard / list queries listed in
+CASES through the real crud functions, and EXPLAINs every statement they send
+that reads merged_pos. Fails when merged_pos is read with a full table scan
+(EXPLAIN type ALL). Also checks that the FULLTEXT (ngram) searches of
+services/text_search.py find exactly the rows their `ilike` fallback finds.
+
+Needs a DISPOSABLE database (its tables are dropped and re-created); the name
+must contain "test". Skipped when the variable is not set:
+
+    EXPLAIN_TEST_DATABASE_URL=mysql+pymysql://root:@localhost/po_app_explain_test \
+        python test_merged_po_indexes.py
+"""
+
+import os
+import random
+import sys
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(__file__), ".env"))
+
+import sqlalchemy as sa
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.enum import AssignmentStatus, UserRole
+from app.services import pnl_engine, text_search
+
+TEST_DATABASE_URL = os.getenv("EXPLAIN_TEST_DATABASE_URL")
+
+SEED_MERGED_POS = 40_000
+SEED_PROJECTS = 400
+SEED_PMS = 40
+YEAR, MONTH = 2025, 6
+
+
+def seed(engine) -> dict:
+    """Realistic skew: almost everything APPROVED / controlled / categorised."""
+    rnd = random.Random(16)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [
+            {"id": i, "first_name": "PM", "last_name": str(i), "username": f"pm{i}",
+             "email": f"pm{i}@example.com", "hashed_password": "x", "role": UserRole.PM}
+            for i in range(1, SEED_PMS + 1)
+        ])
+        conn.execute(insert(models.CustomerProject.__table__), [
+            {"id": i, "name": f"CP-{i}"} for i in range(1, 51)
+        ])
+        conn.execute(insert(models.InternalProject.__table__), [
+            {"id": i, "name": f"IP-{i}", "project_manager_id": rnd.randint(1, SEED_PMS)}
+            for i in range(1, SEED_PROJECTS + 1)
+        ])
+
+        start = datetime(2021, 1, 1)
+        rows = []
+        for i in range(1, SEED_MERGED_POS + 1):
+            published = start + timedelta(days=rnd.randint(0, 5 * 365), hours=rnd.randint(0, 23))
+            accepted = published.date() + timedelta(days=rnd.randint(10, 200))
+            rows.append({
+                "id": i,
+                "po_id": f"PO{i // 10}-{i % 10 + 1}",
+                "po_no": f"PO{i // 10}",
+                "po_line_no": i % 10 + 1,
+                "customer_project_id": rnd.randint(1, 50),
+                "internal_project_id": rnd.randint(1, SEED_PROJECTS),
+                "site_code": f"SITE{rnd.randint(1, 8000):05d}",
+                "item_description": "install rru",
+                "category": "TBD" if rnd.random() < 0.03 else rnd.choice(["Service", "Material", "Transport"]),
+                "assignment_status": AssignmentStatus.PENDING_APPROVAL if rnd.random() < 0.03 else AssignmentStatus.APPROVED,
+                "internal_control": 0 if rnd.random() < 0.02 else 1,
+                "publish_date": published,
+                "line_amount_hw": rnd.uniform(100, 10_000),
+                "accepted_ac_amount": rnd.uniform(0, 8_000),
+                "accepted_pac_amount": rnd.uniform(0, 2_000),
+                "date_ac_ok": accepted if rnd.random() < 0.5 else None,
+                "date_pac_ok": accepted + timedelta(days=90) if rnd.random() < 0.3 else None,
+            })
+        for i in range(0, len(rows), 5000):
+            conn.execute(insert(models.MergedPO.__table__), rows[i:i + 5000])
+        conn.exec_driver_sql("ANALYZE TABLE merged_pos, internal_projects, users")
+    return {"project_id": 7, "pm_id": 3, "site_code": "SITE00042", "po_no": "PO1234"}
+
+
+def draft_pnl(db, seeded):
+    # Revenue comes from merged_pos; the Java closing data is irrelevant here
+    with mock.patch.object(pnl_engine.JavaApiClient, "get_monthly_closing_data", return_value=None):
+        pnl_engine.generate_draft_pnl_for_month(db, YEAR, MONTH, generated_by_id=seeded["pm_id"])
+
+
+# name -> callable(db, seeded) exercising one crud access path
+CASES = {
+    "filtered list: internal project": lambda db, s: crud.get_filtered_merged_pos(
+        db, internal_project_id=s["project_id"]).all(),
+    "filtered list: TBD category": lambda db, s: crud.get_filtered_merged_pos(db, category="TBD").all(),
+    "filtered list: site code": lambda db, s: crud.get_filtered_merged_pos(db, site_code=s["site_code"]).all(),
+    "filtered list: search": lambda db, s: crud.get_filtered_merged_pos(db, search=s["po_no"]).all(),
+    "remaining to accept: search": lambda db, s: crud.get_remaining_to_accept_paginated(
+        db, search=s["site_code"][:7]),
+    "filtered list: publish date range": lambda db, s: crud.get_filtered_merged_pos(
+        db, start_date=date(YEAR, MONTH, 1), end_date=date(YEAR, MONTH, 10)).all(),
+    # Summaries and the PM matrices read financial_rollup; aging reads its boundary months here
+    "aging analysis": lambda db, s: crud.get_aging_analysis(db),
+    # Pending assignments (ix_merged_pos_status_assigned)
+    "pending approvals: PM sites": lambda db, s: crud.get_pending_sites_for_pm(db, s["pm_id"]),
+    "pending approvals: auto-approve": lambda db, s: crud.auto_approve_old_assignments(db),
+    "draft P&L revenue": draft_pnl,
+}
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "EXPLAIN_TEST_DATABASE_URL not set")
+class MergedPOIndexTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        url = make_url(TEST_DATABASE_URL)
+        if "test" not in (url.database or ""):
+            raise RuntimeError(f"Refusing to drop tables in '{url.database}': use a *test* database.")
+        cls.engine = create_engine(url)
+        models.Base.metadata.drop_all(cls.engine)
+        models.Base.metadata.create_all(cls.engine)
+        cls.seeded = seed(cls.engine)
+        cls.Session = sessionmaker(bind=cls.engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+
+    def _statements(self, case):
+        """Every SELECT reading merged_pos that `case` sends, with its DBAPI parameters."""
+        captured = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and "merged_pos" in statement:
+                captured.append((statement, parameters))
+
+        event.listen(self.engine, "before_cursor_execute", capture)
+        db = self.Session()
+        try:
+            case(db, self.seeded)
+        finally:
+            db.close()
+            event.remove(self.engine, "before_cursor_execute", capture)
+        return captured
+
+    def _full_scans(self, statement, parameters):
+        raw = self.engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.execute("EXPLAIN " + statement, parameters)
+            columns = [c[0] for c in cursor.description]
+            plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            raw.close()
+        return [step for step in plan if step["table"] == "merged_pos" and step["type"] == "ALL"]
+
+    def test_no_full_scan_on_merged_pos(self):
+        for name, case in CASES.items():
+            with self.subTest(name):
+                statements = self._statements(case)
+                self.assertTrue(statements, f"{name}: no query on merged_pos was issued")
+                for statement, parameters in statements:
+                    scans = self._full_scans(statement, parameters)
+                    self.assertFalse(scans, f"{name}: full scan of merged_pos\n{statement}\n{scans}")
+
+
+    def test_fulltext_search_matches_ilike(self):
+        # "install" holds the ngram stopwords "a" and "i"; short and mixed-case terms too
+        terms = ["rru", "install", "INSTALL RRU", "SITE0004", "PO123", "IP-17", "CP-4", "-1", "a"]
+        db = self.Session()
+        try:
+            for entity, lookups in text_search.LOOKUPS.items():
+                for term in terms:
+                    with self.subTest(entity=entity, term=term):
+                        found = text_search.hits(db, entity, term)
+                        indexed = {row.id for row in db.execute(sa.select(found.c.id))}
+                        scanned = {row.id for row in db.execute(
+                            sa.union(*[sa.select(sub.c.id) for sub in [
+                                lookup.subquery() for lookup in lookups(term, fulltext=False)
+                            ]])
+                        )}
+                        self.assertEqual(indexed, scanned)
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)